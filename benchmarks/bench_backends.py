@@ -0,0 +1,57 @@
+"""Benchmarks frames/sec and per-frame latency of the inference backends
+
+Runs every backend that can be created in this environment on synthetic
+640x480 webcam frames. The ONNX backend needs an exported model; create one
+with ``python -m rps.gameplay.backends`` (add ``--int8`` for the quantized
+variant).
+
+Run with ``python benchmarks/bench_backends.py``.
+"""
+import os
+import time
+
+import numpy as np
+
+from rps import constants
+from rps.gameplay.backends import FramePreprocessor, OnnxBackend, UltralyticsBackend
+
+
+def benchmark(predict_fn, frames: list, warmup: int = 5) -> tuple[float, float, float]:
+    """Returns frames/sec and median and 95th percentile latency in milliseconds"""
+    for frame in frames[:warmup]:
+        predict_fn(frame)
+    latencies = []
+    for frame in frames:
+        start = time.perf_counter()
+        predict_fn(frame)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1e3
+    return 1e3 / latencies.mean(), np.median(latencies), np.percentile(latencies, 95)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, size=(480, 640, 3), dtype=np.uint8) for _ in range(100)]
+    int8_path = os.path.splitext(constants.onnx_model_path)[0] + "_int8.onnx"
+
+    cases = [
+        ("preprocessing only", lambda: FramePreprocessor()),
+        ("ultralytics (PyTorch)", lambda: UltralyticsBackend()),
+        ("onnx", lambda: OnnxBackend(constants.onnx_model_path)),
+        ("onnx int8", lambda: OnnxBackend(int8_path)),
+    ]
+
+    print(f"{'backend':>22} {'frames/sec':>11} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for name, create in cases:
+        try:
+            backend = create()
+        except Exception as e:
+            print(f"{name:>22}  skipped ({type(e).__name__}: {str(e)[:80]})")
+            continue
+        predict_fn = backend if isinstance(backend, FramePreprocessor) else backend.predict_probs
+        fps, p50, p95 = benchmark(predict_fn, frames)
+        print(f"{name:>22} {fps:>11.1f} {p50:>9.2f} {p95:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
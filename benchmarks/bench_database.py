@@ -0,0 +1,96 @@
+"""Benchmarks the "latest rounds of a game" query on a large rounds table
+
+Fills a scratch SQLite database with `--rows` rounds spread over `--games`
+games, then times ``WHERE game_id = ? ORDER BY timestamp DESC LIMIT n`` (the
+query behind `get_round_history` and the dashboard) without the
+``(game_id, timestamp)`` index, and again after migrating the database and
+connecting with the tuned pragmas.
+
+Run with ``python benchmarks/bench_database.py [--rows 10000000]``.
+"""
+import argparse
+from datetime import datetime, timedelta
+import os
+import tempfile
+import time
+import timeit
+
+import numpy as np
+from sqlalchemy import text
+
+from rps.constants import PLAYER_CHOICES, RoundOutcome
+from rps.database.engine import create_engine
+from rps.database.migrate import create_missing_indexes
+from rps.database.models import Base
+
+QUERY = text("SELECT * FROM rounds WHERE game_id = :game_id ORDER BY timestamp DESC LIMIT :n")
+
+
+def fill_rounds(engine, n_rows: int, n_games: int, chunk_size: int = 500_000) -> None:
+    rng = np.random.default_rng(0)
+    choice_names = np.array([choice.name for choice in PLAYER_CHOICES])
+    outcome_names = np.array([outcome.name for outcome in RoundOutcome])
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO games (game_id, player1_name, player1_type, player1_strategy, "
+            "player2_name, player2_type, player2_strategy) VALUES (?, 'p1', 'MACHINE', 'RANDOM', "
+            "'p2', 'MACHINE', 'LEARN')",
+            [(game_id,) for game_id in range(1, n_games + 1)])
+        for offset in range(0, n_rows, chunk_size):
+            n = min(chunk_size, n_rows - offset)
+            game_ids = rng.integers(1, n_games + 1, size=n)
+            choices = rng.integers(0, len(choice_names), size=(2, n))
+            outcomes = rng.integers(0, len(outcome_names), size=n)
+            timestamps = [str(start + timedelta(seconds=offset + i)) for i in range(n)]
+            connection.exec_driver_sql(
+                "INSERT INTO rounds (timestamp, player1_choice, player2_choice, outcome, game_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                list(zip(timestamps, choice_names[choices[0]].tolist(), choice_names[choices[1]].tolist(),
+                         outcome_names[outcomes].tolist(), game_ids.tolist())))
+
+
+def time_query(engine, n_games: int, n: int, number: int) -> float:
+    game_ids = iter(np.random.default_rng(1).integers(1, n_games + 1, size=number).tolist())
+    with engine.connect() as connection:
+        def query() -> None:
+            connection.execute(QUERY, {"game_id": next(game_ids), "n": n}).fetchall()
+        return timeit.timeit(query, number=number) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=24, help="Rounds per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_uri = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        engine = create_engine(database_uri, sqlite_pragmas=None)
+        Base.metadata.create_all(engine)
+        for index in Base.metadata.tables["rounds"].indexes:
+            index.drop(engine)  # Start from the old, unindexed schema
+
+        start = time.perf_counter()
+        fill_rounds(engine, args.rows, args.games)
+        print(f"Inserted {args.rows:,} rounds in {time.perf_counter() - start:.1f} s")
+
+        unindexed = time_query(engine, args.games, args.limit, number=5)
+        engine.dispose()
+
+        engine = create_engine(database_uri)
+        start = time.perf_counter()
+        create_missing_indexes(engine)
+        print(f"Migrated (created index) in {time.perf_counter() - start:.1f} s")
+        indexed = time_query(engine, args.games, args.limit, number=1000)
+        engine.dispose()
+
+    print(f"{'schema':>10} {'query (ms)':>11}")
+    print(f"{'no index':>10} {unindexed*1e3:>11.3f}")
+    print(f"{'indexed':>10} {indexed*1e3:>11.3f}")
+    print(f"speedup: {unindexed/indexed:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Benchmarks import time of the gameplay modules
+
+Each import runs in a fresh interpreter. ``rps.gameplay.game`` should import
+without loading torch, torchvision or ultralytics; those are only imported
+when the model is loaded for a human player.
+
+Run with ``python benchmarks/bench_import.py``.
+"""
+import subprocess
+import sys
+
+HEAVY_MODULES = ("torch", "torchvision", "ultralytics")
+
+CASES = [
+    ("import rps.gameplay.game", "import rps.gameplay.game"),
+    ("import rps.gameplay.classify", "import rps.gameplay.classify"),
+    ("classify.get_backend()", "import rps.gameplay.classify as c; c.get_backend()"),
+]
+
+
+def time_import(statement: str, repeat: int = 3) -> tuple[float, list]:
+    """Best wall time in seconds of running `statement` in a new interpreter, and the heavy modules it loaded"""
+    code = ("import sys, time; start = time.perf_counter(); "
+            f"{statement}; "
+            "elapsed = time.perf_counter() - start; "
+            f"print(elapsed, *(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    best = float("inf")
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if result.returncode != 0:
+            return float("nan"), [result.stderr.strip().splitlines()[-1]]
+        elapsed, *loaded = result.stdout.strip().splitlines()[-1].split()
+        best = min(best, float(elapsed))
+    return best, loaded
+
+
+def main() -> None:
+    print(f"{'statement':>30} {'time (s)':>10}  heavy modules loaded")
+    for name, statement in CASES:
+        elapsed, loaded = time_import(statement)
+        print(f"{name:>30} {elapsed:>10.3f}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
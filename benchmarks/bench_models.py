@@ -0,0 +1,82 @@
+"""Benchmarks per-prediction latency of the models on long round histories
+
+Compares the int8 choice-code path in `rps.gameplay.models` with the
+DataFrame operations the models used before (``iloc`` lookups and
+``value_counts()`` on the ``player1_choice`` column), and the vectorized
+backtests with calling `predict` once per backtest window.
+
+Run with ``python benchmarks/bench_models.py``.
+"""
+import random
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from rps.codes import encode_choices
+from rps.constants import PlayerChoice, PLAYER_CHOICES
+from rps.gameplay.history import RoundHistory
+from rps.gameplay.models import (MostFrequentChoiceModel, PreviousChoiceModel, RPSModel, beats, default_models,
+                                 get_round_scores)
+
+
+def dataframe_previous_choice(history_df: pd.DataFrame) -> PlayerChoice:
+    return beats(PlayerChoice[history_df.iloc[0].player1_choice])
+
+
+def dataframe_most_frequent(history_df: pd.DataFrame) -> PlayerChoice:
+    choice_counts = history_df.player1_choice.value_counts()
+    return beats(PlayerChoice[choice_counts.index[0]])
+
+
+def time_call(func, *args, number: int = 200) -> float:
+    """Mean seconds per call"""
+    return timeit.timeit(lambda: func(*args), number=number) / number
+
+
+def main() -> None:
+    rng = random.Random(0)
+    previous_model = PreviousChoiceModel()
+    frequent_model = MostFrequentChoiceModel()
+
+    print(f"{'rounds':>10} {'model':>16} {'DataFrame (us)':>16} {'int8 array (us)':>16} {'speedup':>8}")
+    for n_rounds in [24, 1_000, 100_000]:
+        choices = rng.choices(PLAYER_CHOICES, k=n_rounds)
+        history_df = pd.DataFrame({"player1_choice": [c.name for c in choices]})
+        round_history = RoundHistory(n_rounds)
+        round_history.extend(encode_choices(choices)[::-1])
+        codes = round_history.recent()
+
+        cases = [
+            ("Previous Choice", dataframe_previous_choice, previous_model.predict),
+            ("Most Frequent", dataframe_most_frequent, frequent_model.predict),
+        ]
+        for name, df_func, array_func in cases:
+            df_time = time_call(df_func, history_df)
+            array_time = time_call(array_func, codes)
+            print(f"{n_rounds:>10} {name:>16} {df_time*1e6:>16.1f} {array_time*1e6:>16.1f} "
+                  f"{df_time/array_time:>7.1f}x")
+
+        # Scoring a backtest: DataFrame.apply over rows vs one array expression
+        pred_codes = np.roll(codes, 1)
+        results_df = pd.DataFrame({"pred_choice": [PlayerChoice(c) for c in pred_codes],
+                                   "true_choice": choices})
+        df_time = time_call(lambda: results_df.apply(
+            lambda row: (row.true_choice.value - row.pred_choice.value + 1) % 3 - 1, axis=1), number=3)
+        array_time = time_call(get_round_scores, pred_codes, codes)
+        print(f"{n_rounds:>10} {'Round scores':>16} {df_time*1e6:>16.1f} {array_time*1e6:>16.1f} "
+              f"{df_time/array_time:>7.1f}x")
+
+    print()
+    print(f"{'window':>10} {'model':>24} {'looped (ms)':>12} {'vectorized (ms)':>16} {'speedup':>8}")
+    for n in [12, 1_000, 5_000]:
+        codes = encode_choices(rng.choices(PLAYER_CHOICES, k=2*n))
+        for model in default_models():
+            looped_time = time_call(RPSModel._backtest, model, codes, n, number=3)
+            vectorized_time = time_call(model.backtest, codes, n, number=3)
+            print(f"{n:>10} {model.name:>24} {looped_time*1e3:>12.2f} {vectorized_time*1e3:>16.2f} "
+                  f"{looped_time/vectorized_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Benchmarks CPU time to prepare one preview frame for display
+
+Compares the previous path (copy the frame, rasterize both text overlays,
+upscale to `constants.IMAGE_SIZE`) with `Renderer` (reuse the display buffer,
+blend the cached instruction text and leave scaling to the window). The
+``cv2.imshow`` call itself is not included, so this runs headless.
+
+Run with ``python benchmarks/bench_render.py``.
+"""
+import timeit
+
+import cv2
+import numpy as np
+
+from rps import constants
+from rps.gameplay.render import Renderer
+
+
+def previous_path(frame: np.array) -> np.array:
+    display = frame.copy()
+    height = display.shape[0]
+    cv2.putText(display, 'Your choice: ROCK (0.93)', (10, 50), constants.font, constants.choice_font_scale,
+                constants.choice_font_color, constants.choice_font_thickness, constants.font_line_type)
+    cv2.putText(display, 'Press SPACE to select choice, q to quit', (10, height-10),
+                constants.font, 1, constants.choice_font_color, 2, constants.font_line_type)
+    return cv2.resize(display, constants.IMAGE_SIZE, interpolation=cv2.INTER_LINEAR)
+
+
+def renderer_path(frame: np.array, display: np.array, renderer: Renderer) -> np.array:
+    np.copyto(display, frame)
+    height = display.shape[0]
+    renderer.text(display, 'Your choice: ROCK (0.93)', (10, 50), constants.choice_font_scale,
+                  constants.choice_font_color, constants.choice_font_thickness, cache=False)
+    renderer.text(display, 'Press SPACE to select choice, q to quit', (10, height-10),
+                  1, constants.choice_font_color, 2)
+    return display
+
+
+def main() -> None:
+    number = 200
+    print(f"{'frame size':>12} {'previous (ms)':>14} {'renderer (ms)':>14} {'speedup':>8}")
+    for width, height in [(640, 480), (1280, 720), (1920, 1080)]:
+        frame = np.random.default_rng(0).integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        display = np.empty_like(frame)
+        renderer = Renderer()
+
+        previous = timeit.timeit(lambda: previous_path(frame), number=number) / number
+        new = timeit.timeit(lambda: renderer_path(frame, display, renderer), number=number) / number
+        print(f"{f'{width}x{height}':>12} {previous*1e3:>14.3f} {new*1e3:>14.3f} {previous/new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Choice codes shared by the game and the database
+
+Choices are stored as int8 codes equal to the `PlayerChoice` enum values, so
+the models and the aggregates can work on plain NumPy arrays instead of
+DataFrames.
+"""
+from typing import Iterable
+
+import numpy as np
+
+from rps.constants import PlayerChoice
+
+
+CHOICE_DTYPE = np.int8
+
+# Lookup from choice code to PlayerChoice; avoids Enum value lookups in the hot path
+CHOICES_BY_CODE = tuple(PlayerChoice(code) for code in range(len(PlayerChoice)))
+
+
+def encode_choices(choices: Iterable) -> np.ndarray:
+    """Converts choice names (e.g. "ROCK") or PlayerChoice values to an array of choice codes"""
+    codes = [PlayerChoice[c].value if isinstance(c, str) else c.value for c in choices]
+    return np.array(codes, dtype=CHOICE_DTYPE)
+
+
+def decode_choice(code: int) -> PlayerChoice:
+    return CHOICES_BY_CODE[code]
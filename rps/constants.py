@@ -14,15 +14,61 @@ models_dir = os.path.join(CURRENT_DIR, "..", "models")
 # model_path = os.path.join(models_dir, "yolov8n_tfdata.pt")
 model_path = os.path.join(models_dir, "yolov8n_original_data.pt")
 # model_path = os.path.join(models_dir, "yolov8n_combined.pt")
+onnx_model_path = os.path.splitext(model_path)[0] + ".onnx"  # Created by `python -m rps.gameplay.backends`
+MODEL_IMAGE_SIZE = 320
 
 # Database
+STORAGE_BACKEND = "sql"  # "sql" (the database at DATABASE_URI) or "memory" (nothing is persisted)
 DATABASE_URI = os.path.join("sqlite:///rps.db")
+# SQLite connection pragmas: write-ahead logging, fewer fsyncs and memory-mapped reads. None for defaults
+SQLITE_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL", "mmap_size": 256 * 1024**2}
+DATABASE_POOL_SIZE = 5  # Connections kept open per database
+DATABASE_MAX_OVERFLOW = 10  # Extra connections allowed under load
+SQLITE_BUSY_TIMEOUT = 30  # Seconds to wait for another connection's write lock before failing
+WRITE_BEHIND = True  # Persist rounds on a background thread instead of during the round
+WRITE_BATCH_SIZE = 50  # Max. rounds written per transaction
+WRITE_FLUSH_INTERVAL = 2.0  # Max. seconds spent collecting a backlog of rounds into one transaction
+WRITE_RETRY_INTERVAL = 1.0  # Seconds between attempts to write rounds after a failed write
+WRITE_MAX_PENDING = 10000  # Max. unwritten rounds kept after failed writes; the oldest are dropped
+ROUND_NOTIFY_ADDRESS = "/tmp/rps-rounds.sock"  # Unix socket stored rounds are announced on; None to disable
+
+# Dashboard
+DASHBOARD_RECENT_ROUNDS = 10  # Rounds shown in the recent choices plots
+DASHBOARD_POLL_INTERVAL = 3.0  # Seconds between refreshes if round notifications aren't available
+# Seconds between refreshes with round notifications, for rounds stored without them (e.g. bulk imports)
+DASHBOARD_FALLBACK_POLL_INTERVAL = 30.0
+DASHBOARD_CACHE_SIZE = 256  # Query results shared by the dashboard's sessions
+DASHBOARD_CACHE_TTL = 60.0  # Seconds a shared query result is kept
+DASHBOARD_SERIES_CACHE_SIZE = 8  # Games whose whole win percentage series is kept in memory
+DASHBOARD_MAX_POINTS = 2000  # Max. points of the win percentage plot; longer series are downsampled
+DASHBOARD_DOWNSAMPLING = "lttb"  # "lttb" (keeps the line's shape) or "minmax" (keeps every spike)
+LEADERBOARD_SIZE = 50  # Games on the leaderboard
+LEADERBOARD_MIN_ROUNDS = 10  # Rounds a game needs to be on the leaderboard
+LEADERBOARD_MAX_TIME_BUCKETS = 100  # Max. bars in the choices-over-time plot
+LEADERBOARD_REFRESH_INTERVAL = 10.0  # Seconds between leaderboard refreshes
 
 # Image properties
 WINDOW_NAME = "Rock, Paper, Scissors"
 IMAGE_SIZE = (int(1920*2), int(1080*2))
 VIDEO_SOURCE = 0  # may need to toggle this to get the webcam
 
+# Inference
+INFERENCE_BACKEND = "ultralytics"  # "ultralytics" (PyTorch checkpoint), "onnx" (ONNX Runtime) or "server"
+ONNX_PROVIDERS = ["CPUExecutionProvider"]  # e.g. ["OpenVINOExecutionProvider"] with onnxruntime-openvino
+INFERENCE_MAX_RATE = 10  # Max. classifier inferences per second; None for no limit
+PIPELINED_INFERENCE = True  # Run inference on a worker thread so the preview isn't blocked
+SMOOTHING_WINDOW = 5  # Number of recent frames to smooth predictions over
+SMOOTHING_METHOD = "mean"  # "mean", "ema" or "vote"
+MIN_CONFIDENCE = 0.6  # Smoothed confidence required to select a choice
+AUTO_COMMIT_FRAMES = None  # Select a choice once stable for this many frames; None to require SPACE
+FRAME_READ_TIMEOUT = 0.03  # Max. seconds to wait for a camera frame, so the preview window stays responsive
+
+# Shared inference server (INFERENCE_BACKEND = "server")
+INFERENCE_SERVER_ADDRESS = "/tmp/rps-inference.sock"  # Unix socket the server listens on
+INFERENCE_SERVER_BACKEND = "onnx"  # Backend the server runs its batches through
+INFERENCE_MAX_BATCH_SIZE = 8  # Max. frames per model call
+INFERENCE_MAX_WAIT = 0.005  # Max. seconds to wait for more frames before running a batch
+
 # Drawing and text
 font = cv2.FONT_HERSHEY_SIMPLEX
 font_line_type = cv2.LINE_AA
@@ -34,6 +80,7 @@ outcome_font_color_lose = (0, 0, 255)
 outcome_font_color_draw = (255, 50, 50)
 outcome_font_scale = 5
 outcome_font_thickness = 14
+LOW_CONFIDENCE_MESSAGE_TIME = 1.5  # Seconds a rejected SPACE press shows the low confidence message
 
 
 class RoundOutcome(Enum):
@@ -0,0 +1,186 @@
+"""Per-game aggregates, maintained as rounds are added
+
+Three tables summarize each game so that readers don't have to scan
+`rounds`:
+
+- ``choice_counts``: how often each player made each choice
+- ``choice_transitions``: how often each player followed one choice with another
+- ``round_stats``: the cumulative win/loss/draw counts and win_pct after every round
+
+`DatabaseClient.add_rounds_by_game_id` updates them in the transaction
+that adds the rounds. `backfill_aggregates` rebuilds them from `rounds`, for
+databases created before the aggregates existed and for bulk inserts that
+bypass the client.
+"""
+from collections import Counter
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import Table, delete, insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Row
+from sqlalchemy.orm import Session
+
+from rps.codes import CHOICES_BY_CODE
+from rps.constants import PlayerChoice, RoundOutcome
+from rps.database.models import ChoiceCount, ChoiceTransition, GameStats, Round, RoundStats
+
+
+PLAYERS = (1, 2)
+CHOICE_NAMES = [choice.name for choice in CHOICES_BY_CODE]
+
+# INSERT ... ON CONFLICT DO UPDATE constructs by dialect; MySQL's is ON DUPLICATE KEY UPDATE
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+def current_round_stats(game_stats: GameStats) -> RoundStats:
+    """Cumulative stats after the last round counted in `game_stats`; `round_id` is left to the caller"""
+    return RoundStats(
+        game_id=game_stats.game_id,
+        round_number=game_stats.win_count + game_stats.loss_count + game_stats.draw_count,
+        win_count=game_stats.win_count,
+        loss_count=game_stats.loss_count,
+        draw_count=game_stats.draw_count,
+        win_pct=game_stats.win_pct
+    )
+
+
+def update_choice_aggregates(session: Session, game_id: int, rounds: Iterable[Round],
+                             previous_round: Optional[Row]) -> None:
+    """Counts the choices and choice transitions of new rounds of a game
+
+    Parameters
+    ----------
+    session : Session
+        Session of the transaction that adds the rounds
+    game_id : int
+        Game the rounds belong to
+    rounds : Iterable[Round]
+        The new rounds, in the order they were played
+    previous_round : Row, optional
+        Choices of the round played before the new ones (see
+        `rps.database.queries.LAST_ROUND_CHOICES`); None for a new game
+    """
+    choice_counts = Counter()
+    transition_counts = Counter()
+    previous = (None, None) if previous_round is None else \
+        (previous_round.player1_choice, previous_round.player2_choice)
+    for round in rounds:
+        choices = (round.player1_choice, round.player2_choice)
+        for player, choice, previous_choice in zip(PLAYERS, choices, previous):
+            choice_counts[player, choice] += 1
+            if previous_choice is not None:
+                transition_counts[player, previous_choice, choice] += 1
+        previous = choices
+
+    # At most a few rows per game are touched, whatever the number of rounds
+    _add_counts(session, ChoiceCount.__table__, ["game_id", "player", "choice"], [
+        {"game_id": game_id, "player": player, "choice": choice, "count": count}
+        for (player, choice), count in choice_counts.items()
+    ])
+    _add_counts(session, ChoiceTransition.__table__, ["game_id", "player", "previous_choice", "next_choice"], [
+        {"game_id": game_id, "player": player, "previous_choice": previous_choice, "next_choice": next_choice,
+         "count": count}
+        for (player, previous_choice, next_choice), count in transition_counts.items()
+    ])
+
+
+def _add_counts(session: Session, table: Table, key_columns: list, rows: list) -> None:
+    """Inserts count rows, or adds their counts to the existing rows with the same key
+
+    A single upsert statement, so concurrent writers to a game don't lose
+    each other's increments.
+    """
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect == "mysql":
+        statement = mysql_insert(table)
+        statement = statement.on_duplicate_key_update(count=table.c.count + statement.inserted.count)
+    elif dialect in UPSERT_INSERTS:
+        statement = UPSERT_INSERTS[dialect](table)
+        statement = statement.on_conflict_do_update(index_elements=key_columns,
+                                                    set_={"count": table.c.count + statement.excluded.count})
+    else:
+        raise ValueError(f"Counting aggregates is not supported on {dialect} databases")
+    session.execute(statement, rows)
+
+
+def _game_aggregates(game_id: int, round_ids: np.ndarray, choices: np.ndarray, outcomes: np.ndarray) -> tuple:
+    """Aggregate rows for all rounds of one game
+
+    `choices` holds both players' choice codes, shape ``(2, n_rounds)``, and
+    `outcomes` the `RoundOutcome` values, both in the order the rounds were played.
+    """
+    n_choices = len(CHOICE_NAMES)
+    choice_rows = []
+    transition_rows = []
+    for player, codes in zip(PLAYERS, choices):
+        counts = np.bincount(codes, minlength=n_choices)
+        choice_rows += [{"game_id": game_id, "player": player, "choice": CHOICE_NAMES[code], "count": count}
+                        for code, count in enumerate(counts.tolist()) if count]
+        transitions = np.bincount(codes[:-1] * n_choices + codes[1:], minlength=n_choices**2)
+        transition_rows += [{"game_id": game_id, "player": player, "previous_choice": CHOICE_NAMES[i // n_choices],
+                             "next_choice": CHOICE_NAMES[i % n_choices], "count": count}
+                            for i, count in enumerate(transitions.tolist()) if count]
+
+    win_count = np.cumsum(outcomes == RoundOutcome.WIN.value)
+    loss_count = np.cumsum(outcomes == RoundOutcome.LOSS.value)
+    draw_count = np.cumsum(outcomes == RoundOutcome.DRAW.value)
+    decisive_count = win_count + loss_count
+    win_pct = np.divide(win_count, decisive_count, out=np.zeros(len(outcomes)), where=decisive_count > 0)
+    round_stats_rows = [
+        {"round_id": round_id, "game_id": game_id, "round_number": number, "win_count": wins,
+         "loss_count": losses, "draw_count": draws, "win_pct": pct}
+        for round_id, number, wins, losses, draws, pct in zip(
+            round_ids.tolist(), range(1, len(outcomes) + 1), win_count.tolist(), loss_count.tolist(),
+            draw_count.tolist(), win_pct.tolist())
+    ]
+    return choice_rows, transition_rows, round_stats_rows
+
+
+def backfill_aggregates(connection: Connection, game_ids: Optional[Iterable[int]] = None) -> int:
+    """Rebuilds the aggregates of games from their rounds
+
+    Parameters
+    ----------
+    connection : Connection
+        Connection to the database, in the transaction that should include the update
+    game_ids : Iterable[int], optional
+        Games to rebuild. All games with rounds if not given
+
+    Returns
+    -------
+    int
+        Number of games rebuilt
+    """
+    rounds = Round.__table__
+    choice_codes = {choice.name: choice.value for choice in PlayerChoice}
+    outcome_codes = {outcome.name: outcome.value for outcome in RoundOutcome}
+    aggregate_tables = [ChoiceCount.__table__, ChoiceTransition.__table__, RoundStats.__table__]
+
+    if game_ids is None:
+        game_ids = connection.execute(select(rounds.c.game_id).distinct()).scalars().all()
+    n_games = 0
+    for game_id in game_ids:
+        rows = connection.execute(
+            select(rounds.c.round_id, rounds.c.player1_choice, rounds.c.player2_choice, rounds.c.outcome)
+            .where(rounds.c.game_id == game_id)
+            .order_by(rounds.c.timestamp, rounds.c.round_id)
+        ).all()
+        for table in aggregate_tables:
+            connection.execute(delete(table).where(table.c.game_id == game_id))
+        if not rows:
+            continue
+        round_ids, player1_choices, player2_choices, outcomes = zip(*rows)
+        choices = np.array([[choice_codes[c] for c in player1_choices],
+                            [choice_codes[c] for c in player2_choices]], dtype=np.int64)
+        outcomes = np.array([outcome_codes[o] for o in outcomes], dtype=np.int8)
+        for table, table_rows in zip(aggregate_tables,
+                                     _game_aggregates(game_id, np.array(round_ids), choices, outcomes)):
+            if table_rows:
+                connection.execute(insert(table), table_rows)
+        n_games += 1
+    return n_games
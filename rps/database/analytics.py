@@ -0,0 +1,105 @@
+"""Cross-game summaries for the leaderboard page
+
+Everything here is read from the per-game stats and aggregates (see
+`rps.database.aggregates`), never from `rounds`, so the cost depends on the
+number of games rather than on the number of rounds played. Results are
+column arrays, ready for a `ColumnDataSource`.
+"""
+import numpy as np
+from sqlalchemy.engine import Engine
+
+from rps.database.aggregates import CHOICE_NAMES
+from rps.database.queries import HUMAN_CHOICE_COUNTS, LEADERBOARD, STRATEGY_OUTCOME_COUNTS, fetch_arrays
+
+
+# Widths of the time buckets of `choice_distribution`, narrowest first
+BUCKET_WIDTHS = [np.timedelta64(1, "h"), np.timedelta64(1, "D"), np.timedelta64(7, "D"), np.timedelta64(30, "D"),
+                 np.timedelta64(365, "D")]
+
+
+def _win_pct(win_count: np.ndarray, loss_count: np.ndarray) -> np.ndarray:
+    """Wins out of decisive rounds, 0 without any"""
+    decisive_count = win_count + loss_count
+    return np.divide(win_count, decisive_count, out=np.zeros(len(win_count)), where=decisive_count > 0)
+
+
+def leaderboard(engine: Engine, n: int, min_rounds: int = 1) -> dict:
+    """The `n` games with at least `min_rounds` rounds in which player 1 did best, best first
+
+    Returns
+    -------
+    dict
+        Arrays of ``rank``, ``game_id``, ``created_time``, the player names,
+        ``player2_strategy``, ``rounds_count``, the outcome counts and ``win_pct``
+    """
+    data = fetch_arrays(engine, LEADERBOARD, n=int(n), min_rounds=int(min_rounds))
+    data["rank"] = np.arange(len(data["game_id"])) + 1
+    return data
+
+
+def strategy_performance(engine: Engine) -> dict:
+    """Games, rounds and player 1 win percentage against each player 2 strategy
+
+    The win percentage is over all decisive rounds against the strategy, so
+    long games weigh more than short ones.
+    """
+    data = fetch_arrays(engine, STRATEGY_OUTCOME_COUNTS)
+    for name in ("games_count", "win_count", "loss_count", "draw_count"):
+        data[name] = data[name].astype(np.int64)
+    data["rounds_count"] = data["win_count"] + data["loss_count"] + data["draw_count"]
+    data["win_pct"] = _win_pct(data["win_count"], data["loss_count"])
+    return data
+
+
+def _buckets(start: np.datetime64, end: np.datetime64, max_buckets: int) -> tuple:
+    """Start and width of at most `max_buckets` equal buckets covering `start` to `end`
+
+    Uses the narrowest of the `BUCKET_WIDTHS` that is wide enough, with
+    buckets starting on the hour or at midnight.
+    """
+    for width in BUCKET_WIDTHS:
+        unit = "h" if width < np.timedelta64(1, "D") else "D"
+        origin = start.astype(f"datetime64[{unit}]").astype(start.dtype)
+        if (end - origin) // width < max_buckets:
+            return origin, width
+    span_seconds = int((end - start) // np.timedelta64(1, "s"))
+    return start, np.timedelta64(span_seconds // max_buckets + 1, "s")
+
+
+def choice_distribution(engine: Engine, max_buckets: int = 100) -> dict:
+    """Share of each choice among human player choices, over time
+
+    Rounds are counted at the time their game was created, in at most
+    `max_buckets` buckets of equal width, so the size of the result doesn't
+    grow with the time covered.
+
+    Returns
+    -------
+    dict
+        Arrays of the buckets' ``start``, ``end`` and ``rounds_count``, with
+        the number (e.g. ``ROCK``) and share (e.g. ``ROCK_share``) of each
+        choice. Empty buckets are left out
+    """
+    data = fetch_arrays(engine, HUMAN_CHOICE_COUNTS)
+    n_choices = len(CHOICE_NAMES)
+    if len(data["game_id"]) == 0:
+        result = {name: np.array([], dtype="datetime64[s]") for name in ("start", "end")}
+        result.update({name: np.array([], dtype=np.int64) for name in ["rounds_count"] + CHOICE_NAMES})
+        result.update({f"{name}_share": np.array([]) for name in CHOICE_NAMES})
+        return result
+
+    times = data["created_time"].astype("datetime64[s]")
+    origin, width = _buckets(times.min(), times.max(), max_buckets)
+    buckets = (times - origin) // width
+    choices = np.array([CHOICE_NAMES.index(choice) for choice in data["choice"]])
+    counts = np.bincount(buckets * n_choices + choices, weights=data["count"],
+                         minlength=(buckets.max() + 1) * n_choices).reshape(-1, n_choices).astype(np.int64)
+
+    used = np.flatnonzero(counts.sum(axis=1))
+    counts = counts[used]
+    rounds_count = counts.sum(axis=1)
+    result = {"start": origin + used * width, "end": origin + (used + 1) * width, "rounds_count": rounds_count}
+    for i, name in enumerate(CHOICE_NAMES):
+        result[name] = counts[:, i]
+        result[f"{name}_share"] = counts[:, i] / rounds_count
+    return result
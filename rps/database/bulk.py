@@ -0,0 +1,271 @@
+"""Bulk export and import of game history in columnar files
+
+Tables are streamed in fixed-size chunks, so neither direction loads a whole
+table into memory. Choice and outcome columns are stored as int8 codes (the
+`PlayerChoice` and `RoundOutcome` values) rather than strings. Files are
+written as Parquet or Arrow IPC if pyarrow is installed, and as compressed
+NPZ parts otherwise:
+
+    <directory>/<table>.parquet
+    <directory>/<table>.arrow
+    <directory>/<table>/part-00000.npz, part-00001.npz, ...
+
+Imports use Core executemany inserts and keep the exported primary keys, so
+they are meant for an empty database. The aggregates derived from rounds
+(see `rps.database.aggregates`) are rebuilt after an import rather than exported.
+
+Run with
+    python -m rps.database.bulk export DIRECTORY [--uri sqlite:///rps.db] [--format parquet]
+    python -m rps.database.bulk import DIRECTORY [--uri sqlite:///rps.db]
+"""
+import argparse
+import glob
+import logging
+import os
+from typing import Iterator, Optional
+
+import numpy as np
+from sqlalchemy import Column, DateTime, Float, Integer, Table, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from rps.constants import DATABASE_URI, PlayerChoice, RoundOutcome
+from rps.database.aggregates import backfill_aggregates
+from rps.database.models import Base
+
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("games", "game_stats", "rounds")  # In insertion order
+FORMATS = ("parquet", "arrow", "npz")
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+CHUNK_SIZE = 100_000
+
+# Columns stored as int8 codes of these enum values; NULL_CODE for NULL
+ENCODED_COLUMNS = {
+    "player1_choice": PlayerChoice,
+    "player2_choice": PlayerChoice,
+    "outcome": RoundOutcome,
+}
+CODE_DTYPE = np.int8
+NULL_CODE = np.iinfo(CODE_DTYPE).min  # Not -1, which is RoundOutcome.LOSS
+
+
+def default_format() -> str:
+    """Parquet if pyarrow is installed, NPZ otherwise"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "npz"
+    return "parquet"
+
+
+def _to_array(column: Column, values: list) -> np.ndarray:
+    """Converts the values of a column chunk to a NumPy array"""
+    if column.name in ENCODED_COLUMNS:
+        enum = ENCODED_COLUMNS[column.name]
+        codes = {member.name: member.value for member in enum}
+        codes[None] = NULL_CODE
+        return np.array([codes[value] for value in values], dtype=CODE_DTYPE)
+    if isinstance(column.type, DateTime):
+        return np.array(values, dtype="datetime64[us]")  # NULL becomes NaT
+    if isinstance(column.type, Integer):
+        if None in values:
+            return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        return np.array(values, dtype=np.int64)
+    if isinstance(column.type, Float):
+        return np.array(values, dtype=np.float64)  # NULL becomes NaN
+    return np.array(["" if value is None else value for value in values], dtype=str)
+
+
+def _to_values(column: Column, array: np.ndarray) -> list:
+    """Converts a column chunk read from a file back to Python values for inserting"""
+    if column.name in ENCODED_COLUMNS:
+        enum = ENCODED_COLUMNS[column.name]
+        names = {member.value: member.name for member in enum}
+        names[NULL_CODE] = None
+        return [names[code] for code in array.tolist()]
+    if isinstance(column.type, DateTime):
+        return array.astype("datetime64[us]").tolist()  # NaT becomes None
+    if array.dtype.kind == "f":
+        values = array.tolist()
+        nulls = np.isnan(array)
+        if nulls.any():
+            values = [None if null else value for value, null in zip(values, nulls.tolist())]
+        if isinstance(column.type, Integer):
+            values = [None if value is None else int(value) for value in values]
+        return values
+    return array.tolist()
+
+
+def iter_table_chunks(engine: Engine, table: Table, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Streams a table in primary key order as chunks of ``{column name: array}``"""
+    statement = select(table).order_by(*table.primary_key.columns)
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=chunk_size).execute(statement)
+        for rows in result.partitions():
+            columns = zip(*rows)
+            yield {column.name: _to_array(column, list(values)) for column, values in zip(table.columns, columns)}
+
+
+def _table_path(directory: str, table_name: str, fmt: str) -> str:
+    if fmt == "npz":
+        return os.path.join(directory, table_name)
+    return os.path.join(directory, table_name + EXTENSIONS[fmt])
+
+
+def _write_chunks(chunks: Iterator[dict], path: str, fmt: str) -> int:
+    """Writes chunks to a file (or NPZ part directory) and returns the number of rows"""
+    n_rows = 0
+    if fmt == "npz":
+        os.makedirs(path, exist_ok=True)
+        for part, chunk in enumerate(chunks):
+            np.savez_compressed(os.path.join(path, f"part-{part:05d}.npz"), **chunk)
+            n_rows += len(next(iter(chunk.values())))
+        return n_rows
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            batch = pa.record_batch(list(chunk.values()), names=list(chunk))
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema) if fmt == "parquet" else \
+                    pa.ipc.new_file(path, batch.schema)
+            writer.write_batch(batch)
+            n_rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+
+def _read_chunks(path: str, fmt: str, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Reads the chunks written by `_write_chunks`"""
+    if fmt == "npz":
+        for part_path in sorted(glob.glob(os.path.join(path, "part-*.npz"))):
+            with np.load(part_path) as part:
+                yield {name: part[name] for name in part.files}
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == "parquet":
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_size)
+    else:
+        reader = pa.ipc.open_file(path)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for batch in batches:
+        yield {name: column.to_numpy(zero_copy_only=False)
+               for name, column in zip(batch.schema.names, batch.columns)}
+
+
+def export_database(engine: Engine, directory: str, fmt: Optional[str] = None,
+                    chunk_size: int = CHUNK_SIZE) -> dict:
+    """Exports the games, game_stats and rounds tables to `directory`
+
+    Returns
+    -------
+    dict
+        Number of rows exported per table
+    """
+    fmt = fmt or default_format()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for table_name in TABLES:
+        table = Base.metadata.tables[table_name]
+        path = _table_path(directory, table_name, fmt)
+        counts[table_name] = _write_chunks(iter_table_chunks(engine, table, chunk_size), path, fmt)
+        logger.info(f"Exported {counts[table_name]} rows from {table_name} to {path}")
+    return counts
+
+
+def _detect_format(directory: str) -> str:
+    for fmt in FORMATS:
+        if os.path.exists(_table_path(directory, TABLES[0], fmt)):
+            return fmt
+    raise FileNotFoundError(f"No exported tables found in {directory}")
+
+
+def _sqlite_datetimes(array: np.ndarray) -> list:
+    """Formats datetimes the way SQLAlchemy stores them in SQLite"""
+    strings = np.char.replace(np.datetime_as_string(array.astype("datetime64[us]"), unit="us"), "T", " ")
+    nulls = np.isnat(array)
+    return [None if null else string for string, null in zip(strings.tolist(), nulls.tolist())] \
+        if nulls.any() else strings.tolist()
+
+
+def _insert_chunk(connection: Connection, table: Table, chunk: dict) -> int:
+    """Inserts a chunk with one executemany call and returns the number of rows"""
+    columns = [table.columns[name] for name in chunk]
+    if connection.dialect.name == "sqlite":
+        # SQLAlchemy's per-row parameter processing costs more than the inserts themselves, so
+        # hand the rows straight to the driver, with datetimes formatted like SQLAlchemy would
+        values = [_sqlite_datetimes(chunk[column.name]) if isinstance(column.type, DateTime)
+                  else _to_values(column, chunk[column.name]) for column in columns]
+        names = ", ".join(column.name for column in columns)
+        placeholders = ", ".join("?" * len(columns))
+        connection.exec_driver_sql(f"INSERT INTO {table.name} ({names}) VALUES ({placeholders})",
+                                   list(zip(*values)))
+    else:
+        values = [_to_values(column, chunk[column.name]) for column in columns]
+        names = [column.name for column in columns]
+        connection.execute(insert(table), [dict(zip(names, row)) for row in zip(*values)])
+    return len(values[0])
+
+
+def import_database(engine: Engine, directory: str, fmt: Optional[str] = None,
+                    chunk_size: int = CHUNK_SIZE) -> dict:
+    """Imports tables exported by `export_database`, one transaction per table, and rebuilds the aggregates
+
+    Returns
+    -------
+    dict
+        Number of rows imported per table
+    """
+    fmt = fmt or _detect_format(directory)
+    Base.metadata.create_all(engine)
+    counts = {}
+    for table_name in TABLES:
+        table = Base.metadata.tables[table_name]
+        path = _table_path(directory, table_name, fmt)
+        counts[table_name] = 0
+        if not os.path.exists(path):
+            logger.info(f"No rows of {table_name} exported to {path}")
+            continue
+        with engine.begin() as connection:
+            for chunk in _read_chunks(path, fmt, chunk_size):
+                counts[table_name] += _insert_chunk(connection, table, chunk)
+        logger.info(f"Imported {counts[table_name]} rows into {table_name} from {path}")
+    with engine.begin() as connection:
+        n_games = backfill_aggregates(connection)
+    logger.info(f"Rebuilt the aggregates of {n_games} games")
+    return counts
+
+
+def main() -> None:
+    from rps.database.engine import create_engine
+
+    parser = argparse.ArgumentParser(description="Bulk export and import of game history")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory")
+    parser.add_argument("--uri", default=DATABASE_URI, help="Database to export from or import into")
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="File format. Exports default to parquet if pyarrow is installed, otherwise npz")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    engine = create_engine(args.uri)
+    if args.command == "export":
+        counts = export_database(engine, args.directory, args.format, args.chunk_size)
+    else:
+        counts = import_database(engine, args.directory, args.format, args.chunk_size)
+    print(", ".join(f"{table_name}: {count} rows" for table_name, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Process-wide caches of query results
+
+Every browser session of the dashboard runs `rps/main.py` separately, so
+sessions showing the same game would each run the same queries. A
+`QueryCache` shared by the whole process (see `get_cache`) lets them run a
+query once and share the result: concurrent misses of one key wait for the
+first caller's query instead of running their own.
+
+`RoundSeries` keeps a game's per-round cumulative stats in NumPy arrays,
+loaded once and then extended with new rounds only, for plots that need a
+whole series (see `get_series`).
+
+Cached values are shared, so callers must not modify them.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+import numpy as np
+from sqlalchemy.engine import Engine
+
+from rps import constants
+from rps.database.queries import ROUND_STATS_SERIES, fetch_arrays
+
+
+class QueryCache:
+    """Thread-safe LRU cache with a time to live and single-flight loading
+
+    Parameters
+    ----------
+    max_entries : int
+        Number of values kept; the least recently used value is evicted first
+    ttl : float
+        Seconds a value is kept after it was loaded
+
+    Example
+    -------
+        cache = QueryCache()
+        data = cache.get(("rounds", game_id, round_number), lambda: load_rounds(game_id, round_number))
+    """
+
+    def __init__(self, max_entries: int = constants.DASHBOARD_CACHE_SIZE,
+                 ttl: float = constants.DASHBOARD_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key: (expiry time, value), least recently used first
+        self._loading = {}  # key: Future of the value being loaded
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """Returns the value cached for `key`, calling `load` to get it on a miss
+
+        If another thread is already loading `key`, waits for its value (or
+        its exception) instead of calling `load`. Exceptions are not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            future = self._loading.get(key)
+            loading = future is None
+            if loading:
+                future = self._loading[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if not loading:
+            return future.result()
+
+        try:
+            value = load()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[key]
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RoundSeries:
+    """Round numbers and cumulative win percentage after each round of a game, in growable arrays
+
+    Thread-safe. `update` reads only the rounds stored since the last update
+    (from ``round_stats``, see `rps.database.aggregates`), so the whole
+    series is read from the database once.
+    """
+
+    def __init__(self, engine: Engine, game_id: int, capacity: int = 1024) -> None:
+        self.engine = engine
+        self.game_id = game_id
+        self._rounds = np.empty(capacity, dtype=np.int64)
+        self._win_pct = np.empty(capacity, dtype=np.float64)
+        self._length = 0
+        self._lock = threading.Lock()
+
+    def update(self) -> int:
+        """Appends the rounds stored since the last update and returns the number of rounds"""
+        with self._lock:
+            new = fetch_arrays(self.engine, ROUND_STATS_SERIES, game_id=self.game_id, after_round=self._length)
+            n_new = len(new["round_number"])
+            if self._length + n_new > len(self._rounds):
+                capacity = max(2 * len(self._rounds), self._length + n_new)
+                for name in ("_rounds", "_win_pct"):
+                    array = getattr(self, name)
+                    grown = np.empty(capacity, dtype=array.dtype)
+                    grown[:self._length] = array[:self._length]
+                    setattr(self, name, grown)
+            self._rounds[self._length:self._length + n_new] = new["round_number"]
+            self._win_pct[self._length:self._length + n_new] = new["win_pct"]
+            self._length += n_new
+            return self._length
+
+    def arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """Read-only views of the round numbers and win percentages"""
+        with self._lock:
+            rounds = self._rounds[:self._length]
+            win_pct = self._win_pct[:self._length]
+        rounds.flags.writeable = False
+        win_pct.flags.writeable = False
+        return rounds, win_pct
+
+    def __len__(self) -> int:
+        return self._length
+
+
+# Caches by name and series by database and game, shared within a process
+_caches = {}
+_series = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def get_cache(name: str) -> QueryCache:
+    """Returns the process's cache called `name`, creating it with the default settings"""
+    with _registry_lock:
+        if name not in _caches:
+            _caches[name] = QueryCache()
+        return _caches[name]
+
+
+def get_series(engine: Engine, game_id: int) -> RoundSeries:
+    """Returns the process's series of a game, keeping the `DASHBOARD_SERIES_CACHE_SIZE` most recently used"""
+    key = (str(engine.url), game_id)
+    with _registry_lock:
+        if key not in _series:
+            _series[key] = RoundSeries(engine, game_id)
+        _series.move_to_end(key)
+        while len(_series) > constants.DASHBOARD_SERIES_CACHE_SIZE:
+            _series.popitem(last=False)
+        return _series[key]
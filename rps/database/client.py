@@ -1,79 +1,234 @@
-from sqlalchemy import create_engine, select
-from sqlalchemy.orm import Session
+from typing import Iterator, Optional
 
-from rps.constants import DATABASE_URI, RoundOutcome
-from rps.database.models import Base, Game, Round, GameStats
+import numpy as np
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import selectinload
 
+from rps.codes import encode_choices
+from rps.constants import DATABASE_URI, PlayerChoice
+from rps.database.aggregates import CHOICE_NAMES, PLAYERS, current_round_stats, update_choice_aggregates
+from rps.database.engine import get_engine, get_session_factory
+from rps.database.migrate import migrate
+from rps.database.models import Game, Round, GameStats
+from rps.database.notify import FOR_DATABASE, get_publisher, notify_address_for
+from rps.database.queries import (CHOICE_COUNTS, CHOICE_HISTORY, CHOICE_TRANSITIONS, LAST_ROUND_CHOICES,
+                                  ROUND_STATS_SERIES, fetch_arrays)
+from rps.database.storage import GameStorage, update_game_stats
 
-class DatabaseClient:
 
-    def __init__(self, database_uri: str = DATABASE_URI) -> None:
-        self.database_uri = database_uri
-        self.engine = create_engine(self.database_uri)
-        self.create_tables()
+PAGE_SIZE = 1000
+ROUND_ORDERINGS = ("round_id", "timestamp")
+
+
+class DatabaseClient(GameStorage):
+    """Reads and writes games and rounds in a SQLAlchemy database
+
+    Clients are cheap: all clients of a database share one engine and
+    connection pool (see `rps.database.engine.get_engine`), and every method
+    runs in its own short-lived session. Returned objects are detached from
+    their session; a game's stats are loaded with it, other relationships
+    are not.
 
-        # Keep a session open
-        self.session = Session(self.engine)
+    Rounds added through the client are announced to the dashboard on
+    `notify_address`, by default only for the dashboard's database (see
+    `rps.database.notify`); pass None not to announce them.
+    """
+
+    def __init__(self, database_uri: str = DATABASE_URI,
+                 notify_address: Optional[str] = FOR_DATABASE) -> None:
+        self.database_uri = database_uri
+        self.engine = get_engine(self.database_uri)
+        self.session_factory = get_session_factory(self.database_uri)
+        if notify_address is FOR_DATABASE:
+            notify_address = notify_address_for(database_uri)
+        self.notify_address = notify_address
+        self.publisher = None if notify_address is None else get_publisher(notify_address)
 
     def close(self) -> None:
-        self.session.close()
+        """Kept for compatibility; sessions are closed after each call and the engine is shared"""
+        pass
 
     def create_tables(self) -> None:
-        Base.metadata.create_all(self.engine)
+        """Creates missing tables and indexes; kept for compatibility, as `get_engine` already does"""
+        migrate(self.engine)
 
     def insert_game(self, game: Game) -> None:
         game.game_stats = GameStats()
-        self.session.add(game)
-        self.session.commit()
+        with self.session_factory.begin() as session:
+            session.add(game)
 
     def select_game(self, game_id: int) -> Game:
-        statement = select(Game).where(Game.game_id == game_id)
-        result = self.session.scalars(statement).one()
+        statement = select(Game).where(Game.game_id == game_id).options(selectinload(Game.game_stats))
+        with self.session_factory() as session:
+            result = session.scalars(statement).one()
         return result
 
     def select_most_recent_game(self) -> Game:
-        """Retrieves game with mimimum created time"""
-        stmt = select(Game).order_by(Game.created_time.desc()).limit(1)
-        result = self.session.scalars(stmt).one()
+        """Retrieves game with maximum created time; the latest inserted game wins ties"""
+        stmt = (select(Game).order_by(Game.created_time.desc(), Game.game_id.desc()).limit(1)
+                .options(selectinload(Game.game_stats)))
+        with self.session_factory() as session:
+            result = session.scalars(stmt).one()
         return result
 
     def select_all_games(self) -> list:
         statement = select(Game)
-        results = self.session.scalars(statement).all()
+        with self.session_factory() as session:
+            results = session.scalars(statement).all()
         return results
 
     def select_all_rounds(self) -> list:
         statement = select(Round)
-        results = self.session.scalars(statement).all()
+        with self.session_factory() as session:
+            results = session.scalars(statement).all()
         return results
 
     def select_rounds_by_game_id(self, game_id: int) -> None:
         statement = select(Round).where(Round.game_id == game_id)
-        results = self.session.scalars(statement).all()
+        with self.session_factory() as session:
+            results = session.scalars(statement).all()
         return results
 
+    def iter_games(self, page_size: int = PAGE_SIZE, as_tuples: bool = False) -> Iterator:
+        """Streams all games in `game_id` order, one page at a time
+
+        See `iter_rounds`.
+        """
+        entity = Game.__table__ if as_tuples else Game
+        yield from self._iter_pages(entity, [Game.__table__.c.game_id], [], page_size, as_tuples)
+
+    def iter_rounds(self, game_id: Optional[int] = None, order_by: str = "round_id", page_size: int = PAGE_SIZE,
+                    as_tuples: bool = False) -> Iterator:
+        """Streams rounds, optionally of a single game, one page at a time
+
+        Unlike the ``select_*`` methods, this keeps memory flat however many
+        rounds there are. Pages are fetched with keyset pagination (each page
+        starts after the last key of the previous one, so no OFFSET scans),
+        in a session that is closed after the page, so nothing accumulates
+        across pages.
+
+        Parameters
+        ----------
+        game_id : int, optional
+            Only stream the rounds of this game
+        order_by : str
+            "round_id", or "timestamp" (ties broken by `round_id`)
+        page_size : int
+            Number of rounds per query
+        as_tuples : bool
+            Yield read-only Core rows instead of `Round` objects, which is
+            cheaper for consumers that only read the values
+
+        Yields
+        ------
+        Round or sqlalchemy.Row
+            Detached `Round` objects, or rows of the rounds table
+        """
+        if order_by not in ROUND_ORDERINGS:
+            raise ValueError(f"Unknown round ordering: {order_by}")
+        entity = Round.__table__ if as_tuples else Round
+        table = Round.__table__
+        key_columns = [table.c.round_id] if order_by == "round_id" else [table.c.timestamp, table.c.round_id]
+        filters = [] if game_id is None else [table.c.game_id == game_id]
+        yield from self._iter_pages(entity, key_columns, filters, page_size, as_tuples)
+
+    def _iter_pages(self, entity, key_columns: list, filters: list, page_size: int, as_tuples: bool) -> Iterator:
+        """Keyset pagination of `entity` in ascending order of `key_columns`"""
+        last_key = None
+        while True:
+            statement = select(entity).where(*filters)
+            if last_key is not None:
+                statement = statement.where(_after(key_columns, last_key))
+            statement = statement.order_by(*key_columns).limit(page_size)
+            statement = statement.execution_options(yield_per=min(page_size, PAGE_SIZE))
+
+            n_rows = 0
+            if as_tuples:
+                with self.engine.connect() as connection:
+                    for row in connection.execute(statement):
+                        n_rows += 1
+                        last_key = tuple(row._mapping[column] for column in key_columns)
+                        yield row
+            else:
+                with self.session_factory() as session:
+                    for item in session.scalars(statement):
+                        n_rows += 1
+                        last_key = tuple(getattr(item, column.key) for column in key_columns)
+                        yield item
+            if n_rows < page_size:
+                return
+
     def add_round_by_game_id(self, round: Round, game_id: int) -> None:
-        statement = select(Game).where(Game.game_id == game_id)
-        game = self.session.scalars(statement).one()
-        game.rounds.append(round)
-        self.session.commit()
+        """Adds a round to a game; see `add_rounds_by_game_id`"""
+        return self.add_rounds_by_game_id([round], game_id)
+
+    def add_rounds_by_game_id(self, rounds: list, game_id: int) -> None:
+        """Adds several rounds to a game and updates its stats and aggregates in one transaction
+
+        `rounds` must be in the order they were played, after any rounds
+        already stored. See `rps.database.aggregates`. Once committed, the
+        new number of rounds is announced to the dashboard.
+        """
+        statement = select(GameStats).where(GameStats.game_id == game_id)
+        with self.session_factory.begin() as session:
+            game_stats = session.scalars(statement).one()
+            previous_round = session.execute(LAST_ROUND_CHOICES, {"game_id": game_id}).first()
+            round_stats = []
+            for round in rounds:
+                round.game_id = game_id
+                update_game_stats(game_stats, round)
+                round_stats.append(current_round_stats(game_stats))
+            session.add_all(rounds)
+            session.flush()  # Assigns the round ids
+            for round, stats in zip(rounds, round_stats):
+                stats.round_id = round.round_id
+            session.add_all(round_stats)
+            update_choice_aggregates(session, game_id, rounds, previous_round)
+            round_number = game_stats.win_count + game_stats.loss_count + game_stats.draw_count
+        if self.publisher is not None and rounds:
+            self.publisher.publish(game_id, round_number)
 
     def add_round_to_game(self, game: Game, round: Round) -> None:
-        game.rounds.append(round)
-        self._update_game_stats(game, round)
-        self.session.commit()
-
-    def _update_game_stats(self, game: Game, round: Round) -> None:
-        if round.outcome == RoundOutcome.WIN.name:
-            game.game_stats.win_count += 1
-        elif round.outcome == RoundOutcome.LOSS.name:
-            game.game_stats.loss_count += 1
-        else:
-            game.game_stats.draw_count += 1
-
-        wins = game.game_stats.win_count
-        losses = game.game_stats.loss_count
-        if wins == 0:
-            game.game_stats.win_pct = 0.0
-        else:
-            game.game_stats.win_pct = wins / (wins + losses)
+        """Adds a round to a game and updates the game's stats in the database"""
+        self.add_rounds_by_game_id([round], game.game_id)
+
+    def select_choice_history(self, game_id: int, n: int) -> np.ndarray:
+        with self.engine.connect() as connection:
+            choices = connection.execute(CHOICE_HISTORY, {"game_id": game_id, "n": n}).scalars().all()
+        return encode_choices(choices)
+
+    def select_choice_counts(self, game_id: int) -> np.ndarray:
+        """Choice counts of a game, indexed by ``[player - 1, choice code]``"""
+        counts = np.zeros((len(PLAYERS), len(CHOICE_NAMES)), dtype=np.int64)
+        with self.engine.connect() as connection:
+            for player, choice, count in connection.execute(CHOICE_COUNTS, {"game_id": game_id}):
+                counts[player - 1, PlayerChoice[choice].value] = count
+        return counts
+
+    def select_transition_counts(self, game_id: int) -> np.ndarray:
+        """Choice transition counts of a game, indexed by ``[player - 1, previous choice code, next choice code]``"""
+        counts = np.zeros((len(PLAYERS), len(CHOICE_NAMES), len(CHOICE_NAMES)), dtype=np.int64)
+        with self.engine.connect() as connection:
+            for player, previous_choice, next_choice, count in connection.execute(
+                    CHOICE_TRANSITIONS, {"game_id": game_id}):
+                counts[player - 1, PlayerChoice[previous_choice].value, PlayerChoice[next_choice].value] = count
+        return counts
+
+    def select_round_stats(self, game_id: int, after_round: int = 0) -> dict:
+        """Cumulative stats after each round of a game, from round ``after_round + 1`` on
+
+        Returns
+        -------
+        dict
+            Arrays of ``round_number``, ``round_id``, ``win_count``,
+            ``loss_count``, ``draw_count`` and ``win_pct``, in round order
+        """
+        return fetch_arrays(self.engine, ROUND_STATS_SERIES, game_id=game_id, after_round=after_round)
+
+
+def _after(key_columns: list, key: tuple):
+    """Condition selecting rows whose key sorts after `key`, e.g. ``a > x OR (a = x AND b > y)``"""
+    column, value = key_columns[0], key[0]
+    if len(key_columns) == 1:
+        return column > value
+    return or_(column > value, and_(column == value, _after(key_columns[1:], key[1:])))
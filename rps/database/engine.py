@@ -0,0 +1,98 @@
+"""SQLAlchemy engine creation, with SQLite tuning, and the shared engine registry
+
+Each database URI gets one engine per process (see `get_engine`), with one
+connection pool that all clients, the dashboard and background writers
+share. Sessions are short-lived and opened per unit of work.
+"""
+import threading
+from typing import Optional
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from rps.constants import (DATABASE_MAX_OVERFLOW, DATABASE_POOL_SIZE, DATABASE_URI, SQLITE_BUSY_TIMEOUT,
+                           SQLITE_PRAGMAS)
+from rps.database.migrate import migrate
+
+
+def create_engine(database_uri: str = DATABASE_URI, sqlite_pragmas: Optional[dict] = SQLITE_PRAGMAS,
+                  **kwargs) -> Engine:
+    """Creates an engine, setting `sqlite_pragmas` on every new SQLite connection
+
+    The default pragmas switch the database to write-ahead logging (readers
+    don't block the writer), sync to disk at checkpoints rather than on every
+    commit, and memory-map the database file for reads. Other keyword
+    arguments are passed to `sqlalchemy.create_engine`.
+    """
+    engine = sqlalchemy.create_engine(database_uri, **kwargs)
+    if engine.dialect.name == "sqlite" and sqlite_pragmas:
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+            cursor = dbapi_connection.cursor()
+            for name, value in sqlite_pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+    return engine
+
+
+# Engines and session factories by database URI, created on first use
+_engines = {}
+_session_factories = {}
+_registry_lock = threading.Lock()
+
+
+def _pool_options(database_uri: str) -> dict:
+    url = make_url(database_uri)
+    if url.get_backend_name() != "sqlite":
+        return {"pool_size": DATABASE_POOL_SIZE, "max_overflow": DATABASE_MAX_OVERFLOW, "pool_pre_ping": True}
+    if url.database in (None, "", ":memory:"):
+        # An in-memory database lives in a single connection, so every thread must share that connection
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    # sqlite3's timeout is its busy timeout: wait for a concurrent writer instead of raising "database is locked"
+    return {"pool_size": DATABASE_POOL_SIZE, "max_overflow": DATABASE_MAX_OVERFLOW,
+            "connect_args": {"timeout": SQLITE_BUSY_TIMEOUT}}
+
+
+def get_engine(database_uri: str = DATABASE_URI) -> Engine:
+    """Returns the shared engine for a database, creating it and its schema on first use
+
+    Thread-safe. The database is migrated to the current schema (see
+    `rps.database.migrate.migrate`) once per URI, when its engine is created.
+    """
+    engine = _engines.get(database_uri)
+    if engine is not None:
+        return engine
+    with _registry_lock:
+        if database_uri not in _engines:
+            engine = create_engine(database_uri, SQLITE_PRAGMAS, **_pool_options(database_uri))
+            migrate(engine)
+            _session_factories[database_uri] = sessionmaker(engine, expire_on_commit=False)
+            _engines[database_uri] = engine
+        return _engines[database_uri]
+
+
+def get_session_factory(database_uri: str = DATABASE_URI) -> sessionmaker:
+    """Returns the session factory for a database
+
+    Sessions don't expire objects on commit, so objects stay readable after
+    their session is closed.
+
+    Example
+    -------
+        with get_session_factory(uri).begin() as session:
+            session.add(game)
+    """
+    get_engine(database_uri)
+    return _session_factories[database_uri]
+
+
+def dispose_engines() -> None:
+    """Closes all pooled connections and empties the registry, e.g. after forking"""
+    with _registry_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _session_factories.clear()
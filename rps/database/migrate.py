@@ -0,0 +1,93 @@
+"""Brings existing databases up to date with the models
+
+`Base.metadata.create_all` only creates missing tables, so indexes added to
+existing tables have to be created separately, and aggregate tables added to
+a database that already has rounds have to be filled. `get_engine` does this
+on start-up; to migrate a database explicitly, run
+    python -m rps.database.migrate [--uri sqlite:///rps.db] [--rebuild-aggregates]
+"""
+import argparse
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from rps.constants import DATABASE_URI
+from rps.database.aggregates import backfill_aggregates
+from rps.database.models import Base, ChoiceCount, ChoiceTransition, RoundStats
+
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_TABLES = [model.__tablename__ for model in (ChoiceCount, ChoiceTransition, RoundStats)]
+
+
+def create_missing_indexes(engine: Engine) -> list:
+    """Creates the model indexes that are missing from existing tables
+
+    Returns
+    -------
+    list
+        Names of the created indexes
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                logger.info(f"Creating index {index.name} on {table.name}")
+                index.create(engine)
+                created.append(index.name)
+
+    if created and engine.dialect.name == "sqlite":
+        # Let the query planner see the new indexes' statistics
+        with engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+    return created
+
+
+def migrate(engine: Engine, rebuild_aggregates: bool = False) -> list:
+    """Creates missing tables and indexes, and fills new aggregate tables from existing rounds
+
+    Parameters
+    ----------
+    engine : Engine
+        Database to migrate
+    rebuild_aggregates : bool
+        Rebuild the aggregates of all games even if their tables already existed
+
+    Returns
+    -------
+    list
+        Names of the created indexes
+    """
+    existing_tables = set(inspect(engine).get_table_names())
+    Base.metadata.create_all(engine)
+    created = create_missing_indexes(engine)
+    if rebuild_aggregates or ("rounds" in existing_tables and not existing_tables.issuperset(AGGREGATE_TABLES)):
+        with engine.begin() as connection:
+            n_games = backfill_aggregates(connection)
+        logger.info(f"Filled the aggregates of {n_games} games")
+    return created
+
+
+def main() -> None:
+    from rps.database.engine import create_engine
+
+    parser = argparse.ArgumentParser(description="Migrate a database to the current schema")
+    parser.add_argument("--uri", default=DATABASE_URI, help="Database to migrate")
+    parser.add_argument("--rebuild-aggregates", action="store_true",
+                        help="Rebuild the aggregates of all games from their rounds")
+    args = parser.parse_args()
+
+    engine = create_engine(args.uri)
+    created = migrate(engine, args.rebuild_aggregates)
+    print(f"Created indexes: {', '.join(created) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import DateTime, String, ForeignKey, Integer, Float
+from sqlalchemy import DateTime, String, ForeignKey, Index, Integer, Float
 from sqlalchemy.sql import func
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import Mapped
@@ -36,6 +36,8 @@ class Game(Base):
 
 class Round(Base):
     __tablename__ = "rounds"
+    # Serves "rounds of a game, most recent first" (see `rps.database.migrate` for existing databases)
+    __table_args__ = (Index("ix_rounds_game_id_timestamp", "game_id", "timestamp"),)
 
     round_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -68,3 +70,52 @@ class GameStats(Base):
     def __repr__(self) -> str:
         return f"GameStats(id={self.game_stat_id!r}, game_id={self.game_id!r}), " \
                f"win_pct={self.win_pct})"
+
+
+# Aggregates maintained incrementally as rounds are added (see `rps.database.aggregates`)
+
+class ChoiceCount(Base):
+    """Number of times a player made a choice in a game"""
+    __tablename__ = "choice_counts"
+
+    game_id: Mapped[int] = mapped_column(ForeignKey("games.game_id"), primary_key=True)
+    player: Mapped[int] = mapped_column(Integer, primary_key=True)  # 1 or 2
+    choice: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+    def __repr__(self) -> str:
+        return f"ChoiceCount(game_id={self.game_id!r}, player={self.player!r}, " \
+               f"choice={self.choice!r}, count={self.count!r})"
+
+
+class ChoiceTransition(Base):
+    """Number of times a player followed one choice with another in a game"""
+    __tablename__ = "choice_transitions"
+
+    game_id: Mapped[int] = mapped_column(ForeignKey("games.game_id"), primary_key=True)
+    player: Mapped[int] = mapped_column(Integer, primary_key=True)  # 1 or 2
+    previous_choice: Mapped[str] = mapped_column(String, primary_key=True)
+    next_choice: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+    def __repr__(self) -> str:
+        return f"ChoiceTransition(game_id={self.game_id!r}, player={self.player!r}, " \
+               f"{self.previous_choice!r} -> {self.next_choice!r}, count={self.count!r})"
+
+
+class RoundStats(Base):
+    """Cumulative game stats after each round"""
+    __tablename__ = "round_stats"
+    __table_args__ = (Index("ix_round_stats_game_id_round_number", "game_id", "round_number"),)
+
+    round_id: Mapped[int] = mapped_column(ForeignKey("rounds.round_id"), primary_key=True)
+    game_id: Mapped[int] = mapped_column(ForeignKey("games.game_id"))
+    round_number: Mapped[int] = mapped_column(Integer)  # 1 for the first round of the game
+    win_count: Mapped[int] = mapped_column(Integer)
+    loss_count: Mapped[int] = mapped_column(Integer)
+    draw_count: Mapped[int] = mapped_column(Integer)
+    win_pct: Mapped[float] = mapped_column(Float)
+
+    def __repr__(self) -> str:
+        return f"RoundStats(round_id={self.round_id!r}, game_id={self.game_id!r}, " \
+               f"round_number={self.round_number!r}, win_pct={self.win_pct!r})"
@@ -0,0 +1,234 @@
+"""Notifications of stored rounds, from the games to the dashboard
+
+`DatabaseClient` publishes ``(game_id, round_number)`` after every
+transaction that adds rounds to a game, `round_number` being the number of
+rounds the game now has. The dashboard server listens on a Unix socket with
+one `RoundListener` per process and passes the notifications to its
+subscribers, so every browser session updates as soon as a round is stored
+instead of polling the database.
+
+Only rounds of the dashboard's database are announced by default (see
+`notify_address_for`). Publishing never blocks or fails a game: without a listener, notifications
+are dropped, and the publisher retries connecting at most once per
+`reconnect_interval`.
+"""
+import logging
+from multiprocessing.connection import Client, Connection, Listener
+import os
+import socket
+import threading
+import time
+from typing import Callable, Optional
+
+from rps import constants
+
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_INTERVAL = 1.0  # Seconds between attempts to connect to a listener
+
+# Default notify address of clients and writers: see `notify_address_for`
+FOR_DATABASE = object()
+
+
+def notify_address_for(database_uri: str) -> Optional[str]:
+    """Address the rounds stored in a database are announced on
+
+    Only rounds of the dashboard's database (`DATABASE_URI`) are announced,
+    so other databases (e.g. simulations, imports and tests) don't send the
+    dashboard game ids it doesn't have.
+    """
+    return constants.ROUND_NOTIFY_ADDRESS if database_uri == constants.DATABASE_URI else None
+
+
+class RoundPublisher:
+    """Sends round notifications to the `RoundListener` on `address`, if there is one
+
+    Thread-safe; one connection per publisher.
+    """
+
+    def __init__(self, address: str = constants.ROUND_NOTIFY_ADDRESS,
+                 reconnect_interval: float = RECONNECT_INTERVAL) -> None:
+        self.address = address
+        self.reconnect_interval = reconnect_interval
+        self._connection = None
+        self._next_attempt = 0.0
+        self._lock = threading.Lock()
+
+    def publish(self, game_id: int, round_number: int) -> bool:
+        """Announces that a game has `round_number` rounds; returns whether a listener got it"""
+        with self._lock:
+            if self._connection is None:
+                now = time.monotonic()
+                if now < self._next_attempt:
+                    return False
+                try:
+                    self._connection = Client(self.address, family="AF_UNIX")
+                except OSError:
+                    self._next_attempt = now + self.reconnect_interval
+                    return False
+            try:
+                self._connection.send((game_id, round_number))
+            except OSError:
+                # The listener went away; try a new one later
+                self._connection.close()
+                self._connection = None
+                self._next_attempt = time.monotonic() + self.reconnect_interval
+                return False
+            return True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class RoundListener:
+    """Receives round notifications on a Unix socket and calls the subscribers with them
+
+    One thread accepts publishers and one thread per publisher receives
+    their notifications. Subscribers are called on those threads, so they
+    must be thread-safe and quick (e.g. schedule work on a Bokeh document
+    with ``add_next_tick_callback``).
+
+    Parameters
+    ----------
+    address : str
+        Unix socket to listen on; a stale socket file is replaced, but a
+        socket another listener is using is not
+
+    Example
+    -------
+        with RoundListener() as listener:
+            listener.subscribe(lambda game_id, round_number: print(game_id, round_number))
+    """
+
+    def __init__(self, address: str = constants.ROUND_NOTIFY_ADDRESS) -> None:
+        self.address = address
+        self._subscribers = []
+        self._subscribers_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._listener = None
+        self._accept_thread = None
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        self.notifications_received = 0
+
+    def subscribe(self, callback: Callable[[int, int], None]) -> None:
+        """Calls ``callback(game_id, round_number)`` for every notification"""
+        with self._subscribers_lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[int, int], None]) -> None:
+        with self._subscribers_lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def start(self) -> "RoundListener":
+        """Starts listening; raises OSError if another listener is using the socket"""
+        if self._listener is not None:
+            return self
+        if os.path.exists(self.address):
+            try:
+                Client(self.address, family="AF_UNIX").close()
+            except OSError:
+                os.unlink(self.address)  # Left behind by a listener that didn't stop cleanly
+            else:
+                raise OSError(f"Another round listener is using {self.address}")
+        self._stopped.clear()
+        self._listener = Listener(self.address, family="AF_UNIX")
+        self._accept_thread = threading.Thread(target=self._accept, name="RoundListener-accept", daemon=True)
+        self._accept_thread.start()
+        logger.info(f"Listening for round notifications on {self.address}")
+        return self
+
+    def _accept(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                break
+            if self._stopped.is_set():
+                conn.close()  # The wake-up connection from stop()
+                break
+            with self._connections_lock:
+                self._connections.add(conn)
+            threading.Thread(target=self._receive, args=(conn,), name="RoundListener-publisher",
+                             daemon=True).start()
+
+    def _receive(self, conn: Connection) -> None:
+        try:
+            while not self._stopped.is_set():
+                game_id, round_number = conn.recv()
+                self.notifications_received += 1
+                self._notify(game_id, round_number)
+        except (EOFError, OSError):
+            pass  # The publisher disconnected
+        finally:
+            with self._connections_lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    def _notify(self, game_id: int, round_number: int) -> None:
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(game_id, round_number)
+            except Exception:
+                logger.exception("Round notification subscriber failed")
+
+    def stop(self) -> None:
+        """Stops listening, disconnects publishers and removes the socket"""
+        self._stopped.set()
+        if self._listener is not None:
+            # Closing the listener does not interrupt a blocking accept(), so connect to wake it up
+            Client(self.address, family="AF_UNIX").close()
+            self._accept_thread.join()
+            self._listener.close()
+            self._listener = None
+        with self._connections_lock:
+            for conn in self._connections:
+                # Closing a connection that another thread is receiving on breaks that thread, so shut
+                # the socket down instead; the receiving thread then sees EOF and closes the connection
+                with socket.fromfd(conn.fileno(), socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.shutdown(socket.SHUT_RDWR)
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def __enter__(self) -> "RoundListener":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+# Publishers and the listener by address, shared within a process
+_publishers = {}
+_listeners = {}
+_registry_lock = threading.Lock()
+
+
+def get_publisher(address: str = constants.ROUND_NOTIFY_ADDRESS) -> RoundPublisher:
+    """Returns the process's publisher for `address`"""
+    with _registry_lock:
+        if address not in _publishers:
+            _publishers[address] = RoundPublisher(address)
+        return _publishers[address]
+
+
+def get_listener(address: str = constants.ROUND_NOTIFY_ADDRESS) -> Optional[RoundListener]:
+    """Returns the process's started listener for `address`, starting it on first use
+
+    Returns None if the listener can't be started, e.g. because another
+    process is listening on `address`.
+    """
+    with _registry_lock:
+        if address not in _listeners:
+            try:
+                _listeners[address] = RoundListener(address).start()
+            except OSError as e:
+                logger.warning(f"Not listening for round notifications: {e}")
+                _listeners[address] = None
+        return _listeners[address]
@@ -0,0 +1,125 @@
+"""Parameterized Core queries shared by the game and the dashboard
+
+Statements are built once, with bound parameters for every value, so
+SQLAlchemy compiles each of them once and reuses the cached compilation,
+and no value is ever formatted into the SQL text. Pass the values when
+executing, e.g. ``fetch_arrays(engine, ROUND_HISTORY, game_id=1, n=10)``.
+"""
+import numpy as np
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+
+from rps.constants import PlayerType
+from rps.database.models import ChoiceCount, ChoiceTransition, Game, GameStats, Round, RoundStats
+
+
+games = Game.__table__
+rounds = Round.__table__
+game_stats = GameStats.__table__
+choice_counts = ChoiceCount.__table__
+choice_transitions = ChoiceTransition.__table__
+round_stats = RoundStats.__table__
+
+# The last `n` rounds of a game, most recent first
+ROUND_HISTORY = (select(rounds)
+                 .where(rounds.c.game_id == bindparam("game_id"))
+                 .order_by(rounds.c.timestamp.desc(), rounds.c.round_id.desc())
+                 .limit(bindparam("n")))
+
+# Player 1 choices of the last `n` rounds of a game, most recent first
+CHOICE_HISTORY = (select(rounds.c.player1_choice)
+                  .where(rounds.c.game_id == bindparam("game_id"))
+                  .order_by(rounds.c.timestamp.desc(), rounds.c.round_id.desc())
+                  .limit(bindparam("n")))
+
+# Outcomes of all rounds of a game, in the order they were played
+GAME_OUTCOMES = (select(rounds.c.outcome)
+                 .where(rounds.c.game_id == bindparam("game_id"))
+                 .order_by(rounds.c.timestamp, rounds.c.round_id))
+
+# Outcome counts of a game
+GAME_OUTCOME_COUNTS = (select(game_stats.c.win_count, game_stats.c.loss_count, game_stats.c.draw_count,
+                              (game_stats.c.win_count + game_stats.c.loss_count + game_stats.c.draw_count)
+                              .label("games_count"))
+                       .where(game_stats.c.game_id == bindparam("game_id")))
+
+# Choices and outcomes of the last `n` rounds of a game, most recent first
+RECENT_CHOICES = (select(rounds.c.timestamp, rounds.c.player1_choice.label("p1"),
+                         rounds.c.player2_choice.label("p2"), rounds.c.outcome)
+                  .where(rounds.c.game_id == bindparam("game_id"))
+                  .order_by(rounds.c.timestamp.desc(), rounds.c.round_id.desc())
+                  .limit(bindparam("n")))
+
+# Both players' choices in the last round of a game
+LAST_ROUND_CHOICES = (select(rounds.c.player1_choice, rounds.c.player2_choice)
+                      .where(rounds.c.game_id == bindparam("game_id"))
+                      .order_by(rounds.c.timestamp.desc(), rounds.c.round_id.desc())
+                      .limit(1))
+
+# Choice counts of a game, per player
+CHOICE_COUNTS = (select(choice_counts.c.player, choice_counts.c.choice, choice_counts.c.count)
+                 .where(choice_counts.c.game_id == bindparam("game_id")))
+
+# Choice transition counts of a game, per player
+CHOICE_TRANSITIONS = (select(choice_transitions.c.player, choice_transitions.c.previous_choice,
+                             choice_transitions.c.next_choice, choice_transitions.c.count)
+                      .where(choice_transitions.c.game_id == bindparam("game_id")))
+
+# Cumulative stats after each round of a game played after round `after_round`, in order
+ROUND_STATS_SERIES = (select(round_stats.c.round_number, round_stats.c.round_id, round_stats.c.win_count,
+                             round_stats.c.loss_count, round_stats.c.draw_count, round_stats.c.win_pct)
+                      .where(round_stats.c.game_id == bindparam("game_id"),
+                             round_stats.c.round_number > bindparam("after_round"))
+                      .order_by(round_stats.c.round_number))
+
+# Cumulative stats and choices of rounds `after_round` + 1 to `until_round` of a game, in order
+ROUND_UPDATES = (select(round_stats.c.round_number, round_stats.c.round_id, round_stats.c.win_count,
+                        round_stats.c.loss_count, round_stats.c.draw_count, round_stats.c.win_pct,
+                        rounds.c.player1_choice.label("p1"), rounds.c.player2_choice.label("p2"), rounds.c.outcome)
+                 .join_from(round_stats, rounds, round_stats.c.round_id == rounds.c.round_id)
+                 .where(round_stats.c.game_id == bindparam("game_id"),
+                        round_stats.c.round_number > bindparam("after_round"),
+                        round_stats.c.round_number <= bindparam("until_round"))
+                 .order_by(round_stats.c.round_number))
+
+# Cross-game summaries, read from the per-game stats and aggregates rather than from the rounds
+
+# Changes whenever a game or a round is added; both maxima are primary key lookups
+SUMMARY_VERSION = select(select(func.max(games.c.game_id)).scalar_subquery().label("game_id"),
+                         select(func.max(rounds.c.round_id)).scalar_subquery().label("round_id"))
+
+# The `n` games with at least `min_rounds` rounds in which player 1 did best
+_rounds_count = (game_stats.c.win_count + game_stats.c.loss_count + game_stats.c.draw_count).label("rounds_count")
+LEADERBOARD = (select(games.c.game_id, games.c.created_time, games.c.player1_name, games.c.player2_name,
+                      games.c.player2_strategy, _rounds_count, game_stats.c.win_count, game_stats.c.loss_count,
+                      game_stats.c.draw_count, game_stats.c.win_pct)
+               .join_from(games, game_stats, games.c.game_id == game_stats.c.game_id)
+               .where(_rounds_count >= bindparam("min_rounds"))
+               .order_by(game_stats.c.win_pct.desc(), _rounds_count.desc(), games.c.game_id)
+               .limit(bindparam("n")))
+
+# Games and outcome counts by player 2 strategy
+STRATEGY_OUTCOME_COUNTS = (select(games.c.player2_strategy.label("strategy"), func.count().label("games_count"),
+                                  func.sum(game_stats.c.win_count).label("win_count"),
+                                  func.sum(game_stats.c.loss_count).label("loss_count"),
+                                  func.sum(game_stats.c.draw_count).label("draw_count"))
+                           .join_from(games, game_stats, games.c.game_id == game_stats.c.game_id)
+                           .group_by(games.c.player2_strategy)
+                           .order_by(games.c.player2_strategy))
+
+# Choice counts of human players, by game
+HUMAN_CHOICE_COUNTS = (select(games.c.game_id, games.c.created_time, choice_counts.c.choice, choice_counts.c.count)
+                       .join_from(choice_counts, games, choice_counts.c.game_id == games.c.game_id)
+                       .where(choice_counts.c.player == 1, games.c.player1_type == PlayerType.HUMAN.name))
+
+
+def fetch_arrays(engine: Engine, statement: Select, **params) -> dict:
+    """Executes a query and returns its columns as ``{column name: np.ndarray}``"""
+    with engine.connect() as connection:
+        result = connection.execute(statement, params)
+        names = list(result.keys())
+        rows = result.all()
+    if not rows:
+        return {name: np.array([]) for name in names}
+    return {name: np.array(column) for name, column in zip(names, zip(*rows))}
@@ -0,0 +1,154 @@
+"""Storage backends for games and rounds
+
+`GameStorage` is the interface the game and the models use to store games
+and rounds. `DatabaseClient` implements it with SQLAlchemy; `MemoryStorage`
+keeps everything in process memory, backed by arrays, for simulations,
+tests and other headless runs that don't need a database. Select the
+backend with `constants.STORAGE_BACKEND`.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import numpy as np
+
+from rps import constants
+from rps.codes import CHOICE_DTYPE
+from rps.constants import PlayerChoice, RoundOutcome
+from rps.database.models import Game, GameStats, Round
+
+
+def update_game_stats(game_stats: GameStats, round: Round) -> None:
+    """Counts a round's outcome in its game's stats"""
+    if round.outcome == RoundOutcome.WIN.name:
+        game_stats.win_count += 1
+    elif round.outcome == RoundOutcome.LOSS.name:
+        game_stats.loss_count += 1
+    else:
+        game_stats.draw_count += 1
+
+    wins = game_stats.win_count
+    losses = game_stats.loss_count
+    if wins == 0:
+        game_stats.win_pct = 0.0
+    else:
+        game_stats.win_pct = wins / (wins + losses)
+
+
+class GameStorage(ABC):
+    """Stores games, their rounds and their stats"""
+
+    @abstractmethod
+    def insert_game(self, game: Game) -> None:
+        """Stores a new game with empty stats, assigning its `game_id`"""
+        pass
+
+    @abstractmethod
+    def select_game(self, game_id: int) -> Game:
+        """Retrieves a game and its stats; raises if there is no such game"""
+        pass
+
+    @abstractmethod
+    def select_most_recent_game(self) -> Game:
+        """Retrieves the most recently created game and its stats"""
+        pass
+
+    @abstractmethod
+    def add_round_to_game(self, game: Game, round: Round) -> None:
+        """Stores a round of a game and updates the game's stats"""
+        pass
+
+    @abstractmethod
+    def select_choice_history(self, game_id: int, n: int) -> np.ndarray:
+        """Player 1 choice codes of the last `n` rounds of a game, most recent first"""
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class _RoundArrays:
+    """Growable arrays of one game's rounds, in the order they were played"""
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.length = 0
+        self.player1_choices = np.empty(capacity, dtype=CHOICE_DTYPE)
+        self.player2_choices = np.empty(capacity, dtype=CHOICE_DTYPE)
+        self.outcomes = np.empty(capacity, dtype=np.int8)
+        self.timestamps = np.empty(capacity, dtype="datetime64[us]")
+
+    def append(self, player1_choice: int, player2_choice: int, outcome: int, timestamp: datetime) -> None:
+        if self.length == len(self.outcomes):
+            for name in ("player1_choices", "player2_choices", "outcomes", "timestamps"):
+                array = getattr(self, name)
+                grown = np.empty(2 * len(array), dtype=array.dtype)
+                grown[:self.length] = array
+                setattr(self, name, grown)
+        i = self.length
+        self.player1_choices[i] = player1_choice
+        self.player2_choices[i] = player2_choice
+        self.outcomes[i] = outcome
+        self.timestamps[i] = timestamp
+        self.length += 1
+
+
+class MemoryStorage(GameStorage):
+    """Keeps games and rounds in memory; nothing is persisted
+
+    Rounds are stored as int8 choice and outcome codes in per-game arrays,
+    so the choice history is a slice rather than a query.
+    """
+
+    def __init__(self) -> None:
+        self._games = {}
+        self._rounds = {}
+        self._next_game_id = 1
+        self._next_round_id = 1
+
+    def insert_game(self, game: Game) -> None:
+        game.game_id = self._next_game_id
+        self._next_game_id += 1
+        if game.created_time is None:
+            game.created_time = datetime.now()
+        game.game_stats = GameStats(game_id=game.game_id, win_count=0, loss_count=0, draw_count=0, win_pct=0.0)
+        self._games[game.game_id] = game
+        self._rounds[game.game_id] = _RoundArrays()
+
+    def select_game(self, game_id: int) -> Game:
+        if game_id not in self._games:
+            raise KeyError(f"No game with ID {game_id}")
+        return self._games[game_id]
+
+    def select_most_recent_game(self) -> Game:
+        if not self._games:
+            raise KeyError("No games stored")
+        # Games are kept in insertion order; the last one wins ties on created_time
+        return max(reversed(self._games.values()), key=lambda game: game.created_time)
+
+    def add_round_to_game(self, game: Game, round: Round) -> None:
+        game = self.select_game(game.game_id)
+        round.round_id = self._next_round_id
+        self._next_round_id += 1
+        round.game_id = game.game_id
+        if round.timestamp is None:
+            round.timestamp = datetime.now()
+        self._rounds[game.game_id].append(PlayerChoice[round.player1_choice].value,
+                                          PlayerChoice[round.player2_choice].value,
+                                          RoundOutcome[round.outcome].value,
+                                          round.timestamp)
+        update_game_stats(game.game_stats, round)
+
+    def select_choice_history(self, game_id: int, n: int) -> np.ndarray:
+        rounds = self._rounds[game_id]
+        return rounds.player1_choices[max(rounds.length - n, 0):rounds.length][::-1].copy()
+
+
+def create_storage(name: str = constants.STORAGE_BACKEND,
+                   database_uri: str = constants.DATABASE_URI) -> GameStorage:
+    """Creates the "sql" (the database at `database_uri`) or "memory" storage backend"""
+    if name == "sql":
+        from rps.database.client import DatabaseClient
+
+        return DatabaseClient(database_uri)
+    if name == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {name}")
@@ -0,0 +1,173 @@
+"""Write-behind persistence of game rounds"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+
+from rps import constants
+from rps.database.client import DatabaseClient
+from rps.database.models import Round
+from rps.database.notify import FOR_DATABASE
+
+
+logger = logging.getLogger(__name__)
+
+
+class RoundWriter:
+    """Writes a game's rounds to the database on a background thread
+
+    Rounds added with `add` are written as soon as the writer is free, one
+    transaction per batch of the rounds queued by then, so a round played
+    on its own is stored (and announced to the dashboard) right away. Only
+    a backlog is split into batches, of at most `batch_size` rounds or of
+    the rounds taken off the queue within `flush_interval` seconds. The
+    game never waits on the database, so its in-memory state is the
+    authoritative record until the rounds are flushed. Queued rounds are
+    flushed on `close`, and at interpreter exit if the writer was not closed.
+
+    Rounds of a failed write are kept and written again every
+    `retry_interval` seconds, together with any rounds added since. At most
+    `max_pending` of them are kept; older ones are dropped and logged.
+
+    Parameters
+    ----------
+    game_id : int
+        Game the rounds belong to
+    database_uri : str
+        Database to write to
+    batch_size : int
+        Maximum number of rounds per transaction
+    flush_interval : float
+        Maximum number of seconds spent taking a backlog's rounds off the
+        queue before they are written
+    retry_interval : float
+        Seconds between attempts to write the rounds of a failed write
+    max_pending : int
+        Maximum number of unwritten rounds kept after failed writes
+    notify_address : str, optional
+        Where written rounds are announced, by default only for the
+        dashboard's database (see `rps.database.notify`); None not to
+        announce them
+
+    Example
+    -------
+        with RoundWriter(game_id) as writer:
+            writer.add(Round(...))
+    """
+
+    def __init__(self, game_id: int, database_uri: str = constants.DATABASE_URI,
+                 batch_size: int = constants.WRITE_BATCH_SIZE,
+                 flush_interval: float = constants.WRITE_FLUSH_INTERVAL,
+                 retry_interval: float = constants.WRITE_RETRY_INTERVAL,
+                 max_pending: int = constants.WRITE_MAX_PENDING,
+                 notify_address: Optional[str] = FOR_DATABASE) -> None:
+        self.game_id = game_id
+        self.database_uri = database_uri
+        self.notify_address = notify_address
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_pending = max_pending
+        self._queue = queue.Queue()
+        self._pending = []  # Rounds taken off the queue but not written yet
+        self._thread = None
+        self.rounds_written = 0
+        self.batches_written = 0
+        self.rounds_dropped = 0
+
+    def start(self) -> "RoundWriter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="RoundWriter", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def add(self, round: Round) -> None:
+        """Queues a round to be written; does not block"""
+        self._queue.put(round)
+
+    def flush(self) -> None:
+        """Blocks until all rounds added so far are written"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def _run(self) -> None:
+        db_client = DatabaseClient(self.database_uri, notify_address=self.notify_address)
+        try:
+            stopping = False
+            while not stopping:
+                flush_events, stopping = self._next_batch()
+                self._write(db_client)
+                for event in flush_events:
+                    event.set()
+        finally:
+            db_client.close()
+
+    def _next_batch(self) -> tuple[list, bool]:
+        """Moves the next batch of rounds to `_pending`
+
+        Waits for the first round of a batch, or until the rounds of a failed
+        write are due to be retried, then takes only the rounds already
+        queued. Returns the flush events to set once the batch is written,
+        and whether the writer is closing.
+        """
+        try:
+            item = self._queue.get(timeout=self.retry_interval if self._pending else None)
+        except queue.Empty:
+            return [], False
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is None:
+                return [], True
+            if isinstance(item, threading.Event):
+                return [item], False
+            self._pending.append(item)
+            if len(self._pending) >= self.batch_size or time.monotonic() >= deadline:
+                return [], False
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return [], False
+
+    def _write(self, db_client: DatabaseClient) -> None:
+        if not self._pending:
+            return
+        try:
+            db_client.add_rounds_by_game_id(self._pending, self.game_id)
+        except Exception:
+            # The transaction was rolled back; keep the rounds and retry them later
+            logger.exception(f"Failed to write {len(self._pending)} rounds for game {self.game_id}")
+            n_dropped = len(self._pending) - self.max_pending
+            if n_dropped > 0:
+                dropped, self._pending = self._pending[:n_dropped], self._pending[n_dropped:]
+                self.rounds_dropped += n_dropped
+                logger.error(f"Dropped {n_dropped} unwritten rounds for game {self.game_id}, played from "
+                             f"{dropped[0].timestamp} to {dropped[-1].timestamp}")
+            return
+        self.rounds_written += len(self._pending)
+        self.batches_written += 1
+        logger.debug(f"Wrote {len(self._pending)} rounds for game {self.game_id}")
+        self._pending = []
+
+    def close(self) -> None:
+        """Writes all queued rounds and stops the writer thread"""
+        if self._thread is None:
+            return
+        atexit.unregister(self.close)
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self._pending:
+            logger.error(f"{len(self._pending)} rounds for game {self.game_id} could not be written")
+        logger.info(f"Stopped round writer ({self.rounds_written} rounds in {self.batches_written} batches)")
+
+    def __enter__(self) -> "RoundWriter":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,99 @@
+"""Level-of-detail downsampling of long series for plotting
+
+A line plot needs only a few points per pixel of width, so long series are
+reduced to at most `n_out` points of the visible x-range before they are
+sent to the browser, picking points that keep the shape of the line:
+
+- "lttb": Largest-Triangle-Three-Buckets, which keeps the points that
+  contribute most to the line's visual shape
+- "minmax": the lowest and the highest point of each bucket, which keeps
+  every spike
+
+Functions return indices into the series, so that any column can be taken
+at the selected points.
+"""
+from typing import Optional
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the `n_out` points chosen by Largest-Triangle-Three-Buckets
+
+    The first and last points are always kept; the others are split into
+    ``n_out - 2`` buckets of equal size, and each bucket keeps the point
+    forming the largest triangle with the point kept from the previous bucket
+    and the mean of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = selected = 0
+    indices[-1] = n - 1
+    for i in range(n_out - 2):
+        start, end, next_end = edges[i], edges[i + 1], edges[i + 2]
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        # Twice the triangle areas; the constant factor doesn't change the largest
+        areas = np.abs((x[selected] - next_x) * (y[start:end] - y[selected])
+                       - (x[selected] - x[start:end]) * (next_y - y[selected]))
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+    return indices
+
+
+def min_max(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the first and last points and of the lowest and highest point of each of
+    ``(n_out - 2) // 2`` buckets of equal size, in order"""
+    n = len(y)
+    n_buckets = (n_out - 2) // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+    starts = np.linspace(0, n, n_buckets + 1).astype(np.int64)[:-1]
+    bucket_of = np.repeat(np.arange(n_buckets), np.diff(np.append(starts, n)))
+    selected = [np.array([0, n - 1])]
+    for reduce in (np.minimum, np.maximum):
+        extremes = np.flatnonzero(y == reduce.reduceat(y, starts)[bucket_of])
+        _, first = np.unique(bucket_of[extremes], return_index=True)  # The first extreme point of each bucket
+        selected.append(extremes[first])
+    return np.unique(np.concatenate(selected))
+
+
+DOWNSAMPLING_METHODS = {
+    "lttb": lttb,
+    "minmax": lambda x, y, n_out: min_max(y, n_out),
+}
+
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int, x_start: Optional[float] = None,
+               x_end: Optional[float] = None, method: str = "lttb") -> np.ndarray:
+    """Indices of at most `n_out` points of the series between `x_start` and `x_end`
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Sorted x values
+    y : np.ndarray
+        y values
+    n_out : int
+        Maximum number of points to return, plus the two below
+    x_start, x_end : float, optional
+        Visible x-range; the whole series if not given. The nearest point
+        outside each end is included, so the line reaches the plot's edges
+    method : str
+        "lttb" or "minmax"
+
+    Returns
+    -------
+    np.ndarray
+        Increasing indices into `x` and `y`
+    """
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    first = 0 if x_start is None else max(int(np.searchsorted(x, x_start, side="left")) - 1, 0)
+    last = len(x) if x_end is None else min(int(np.searchsorted(x, x_end, side="right")) + 1, len(x))
+    return first + DOWNSAMPLING_METHODS[method](x[first:last], y[first:last], n_out)
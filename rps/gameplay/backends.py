@@ -0,0 +1,261 @@
+"""Inference backends for the hand-gesture classifier
+
+The default backend runs the PyTorch checkpoint through the ultralytics
+`YOLO` wrapper. The ONNX backend runs an exported copy of the same
+checkpoint with ONNX Runtime (optionally through its OpenVINO execution
+provider), with a lean preprocessing path that reuses its buffers between
+frames. The server backend sends frames to a shared, batching inference
+server. Select the backend with `constants.INFERENCE_BACKEND`.
+
+Export the checkpoint with
+    python -m rps.gameplay.backends [--int8] [--dynamic]
+"""
+from abc import ABC, abstractmethod
+import argparse
+import ast
+import logging
+import os
+import threading
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from rps import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBackend(ABC):
+    """Computes class probabilities for a BGR video frame"""
+
+    @abstractmethod
+    def predict_probs(self, frame: np.array) -> np.array:
+        """Class probabilities, ordered like `constants.PLAYER_CHOICES`"""
+        pass
+
+    def predict_probs_batch(self, frames: list) -> np.array:
+        """Class probabilities for several frames, one row per frame
+
+        Backends that can run a batch in one model call override this.
+        """
+        return np.stack([self.predict_probs(frame) for frame in frames])
+
+
+class UltralyticsBackend(InferenceBackend):
+    """Runs the PyTorch checkpoint through the ultralytics `YOLO` wrapper"""
+
+    def __init__(self, model_path: str = constants.model_path, imgsz: int = constants.MODEL_IMAGE_SIZE) -> None:
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.imgsz = imgsz
+
+    def predict_probs(self, frame: np.array) -> np.array:
+        results = self.model(frame, imgsz=self.imgsz, verbose=False)
+        return results[0].probs.data.numpy()
+
+    def predict_probs_batch(self, frames: list) -> np.array:
+        results = self.model(list(frames), imgsz=self.imgsz, verbose=False)
+        return np.stack([result.probs.data.numpy() for result in results])
+
+
+class FramePreprocessor:
+    """Center-crops, resizes and normalizes frames into preallocated buffers
+
+    Produces the same input as ultralytics' classification preprocessing: the
+    largest centered square, resized to ``size x size``, converted to RGB and
+    scaled to [0, 1] in NCHW float32 layout. Buffers are allocated once and
+    reused, so preprocessing a frame does not allocate.
+
+    Parameters
+    ----------
+    size : int
+        Side length of the model input
+    rgb : bool
+        Whether to convert BGR video frames to RGB
+    """
+
+    def __init__(self, size: int = constants.MODEL_IMAGE_SIZE, rgb: bool = True) -> None:
+        self.size = size
+        self.rgb = rgb
+        self._resized = np.empty((size, size, 3), dtype=np.uint8)
+        self._rgb = np.empty((size, size, 3), dtype=np.uint8) if rgb else self._resized
+        self.input = np.empty((1, 3, size, size), dtype=np.float32)
+
+    def __call__(self, frame: np.array, out: Optional[np.array] = None) -> np.array:
+        """Returns the model input for a frame; the array is overwritten by the next call
+
+        If `out` is given, the ``(3, size, size)`` input is written there
+        instead, e.g. into one row of a batch.
+        """
+        height, width = frame.shape[:2]
+        side = min(height, width)
+        top = (height - side) // 2
+        left = (width - side) // 2
+        crop = frame[top:top + side, left:left + side]  # A view, not a copy
+
+        cv2.resize(crop, (self.size, self.size), dst=self._resized, interpolation=cv2.INTER_LINEAR)
+        if self.rgb:
+            cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        if out is None:
+            np.multiply(self._rgb.transpose(2, 0, 1), np.float32(1 / 255), out=self.input[0])
+            return self.input
+        np.multiply(self._rgb.transpose(2, 0, 1), np.float32(1 / 255), out=out)
+        return out
+
+
+class OnnxBackend(InferenceBackend):
+    """Runs an ONNX export of the classifier with ONNX Runtime
+
+    Parameters
+    ----------
+    onnx_path : str
+        Path to the exported model (see `export_onnx`)
+    providers : list
+        ONNX Runtime execution providers, e.g. ``["OpenVINOExecutionProvider"]``
+    """
+
+    def __init__(self, onnx_path: str = constants.onnx_model_path,
+                 providers: list = constants.ONNX_PROVIDERS) -> None:
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.preprocess = FramePreprocessor(size=model_input.shape[-1])
+        # Exports with a dynamic batch dimension (``dynamic=True``) can run several frames per call
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self._batch = np.empty((0,) + self.preprocess.input.shape[1:], dtype=np.float32)
+        self.class_order = self._class_order(self.session.get_modelmeta().custom_metadata_map)
+
+    @staticmethod
+    def _class_order(metadata: dict) -> np.array:
+        """Indices that reorder model outputs to `constants.PLAYER_CHOICES`
+
+        ultralytics stores the class names in the export metadata; if they are
+        missing, the outputs are assumed to already be in the right order.
+        """
+        n_choices = len(constants.PLAYER_CHOICES)
+        if "names" not in metadata:
+            return np.arange(n_choices)
+        names = ast.literal_eval(metadata["names"])
+        index_by_name = {str(name).upper(): int(index) for index, name in names.items()}
+        try:
+            return np.array([index_by_name[choice.name] for choice in constants.PLAYER_CHOICES])
+        except KeyError as e:
+            raise ValueError(f"Model classes {names} do not match player choices") from e
+
+    def predict_probs(self, frame: np.array) -> np.array:
+        outputs = self.session.run(None, {self.input_name: self.preprocess(frame)})
+        return outputs[0][0][self.class_order]
+
+    def predict_probs_batch(self, frames: list) -> np.array:
+        if not self.dynamic_batch:
+            return super().predict_probs_batch(frames)
+        if len(self._batch) < len(frames):
+            self._batch = np.empty((len(frames),) + self._batch.shape[1:], dtype=np.float32)
+        batch = self._batch[:len(frames)]
+        for frame, row in zip(frames, batch):
+            self.preprocess(frame, out=row)
+        outputs = self.session.run(None, {self.input_name: batch})
+        return outputs[0][:, self.class_order]
+
+
+class ServerBackend(InferenceBackend):
+    """Sends frames to a shared inference server (see `rps.gameplay.inference_server`)
+
+    Frames are center-cropped and resized to the model input size before they
+    are sent, so only a small uint8 image crosses the socket. Calls are
+    synchronous; a backend can be shared between threads.
+
+    Parameters
+    ----------
+    address : str
+        Unix socket the server listens on
+    size : int
+        Side length frames are resized to before sending
+    """
+
+    def __init__(self, address: str = constants.INFERENCE_SERVER_ADDRESS,
+                 size: int = constants.MODEL_IMAGE_SIZE) -> None:
+        from multiprocessing.connection import Client
+
+        self.address = address
+        self.conn = Client(address, family="AF_UNIX")
+        self._crop = np.empty((size, size, 3), dtype=np.uint8)
+        self._lock = threading.Lock()
+
+    def predict_probs(self, frame: np.array) -> np.array:
+        height, width = frame.shape[:2]
+        side = min(height, width)
+        top = (height - side) // 2
+        left = (width - side) // 2
+        with self._lock:
+            cv2.resize(frame[top:top + side, left:left + side], self._crop.shape[:2], dst=self._crop,
+                       interpolation=cv2.INTER_LINEAR)
+            self.conn.send(self._crop)
+            probs = self.conn.recv()
+        if isinstance(probs, Exception):
+            raise RuntimeError("Inference server failed to classify frame") from probs
+        return probs
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+BACKENDS = {
+    "ultralytics": UltralyticsBackend,
+    "onnx": OnnxBackend,
+    "server": ServerBackend,
+}
+
+
+def create_backend(name: str = constants.INFERENCE_BACKEND) -> InferenceBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name}")
+    logger.info(f"Creating {name} inference backend")
+    return BACKENDS[name]()
+
+
+def export_onnx(model_path: str = constants.model_path, imgsz: int = constants.MODEL_IMAGE_SIZE,
+                int8: bool = False, dynamic: bool = False) -> str:
+    """Exports the PyTorch checkpoint to ONNX, optionally with INT8 weights
+
+    INT8 export uses ONNX Runtime's dynamic quantization, which needs no
+    calibration data. Set `dynamic` to export with a dynamic batch dimension
+    for batched inference (see `rps.gameplay.inference_server`).
+
+    Returns
+    -------
+    str
+        Path of the exported model
+    """
+    from ultralytics import YOLO
+
+    onnx_path = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=dynamic)
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.splitext(onnx_path)[0] + "_int8.onnx"
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+        onnx_path = int8_path
+    logger.info(f"Exported {model_path} to {onnx_path}")
+    return onnx_path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the hand-gesture classifier to ONNX")
+    parser.add_argument("--model", default=constants.model_path, help="PyTorch checkpoint to export")
+    parser.add_argument("--imgsz", type=int, default=constants.MODEL_IMAGE_SIZE)
+    parser.add_argument("--int8", action="store_true", help="Quantize weights to INT8")
+    parser.add_argument("--dynamic", action="store_true", help="Export with a dynamic batch dimension")
+    args = parser.parse_args()
+    print(export_onnx(args.model, imgsz=args.imgsz, int8=args.int8, dynamic=args.dynamic))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Persistent webcam capture on a background thread"""
+import logging
+import threading
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from rps import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+class VideoStream:
+    """Keeps a video source open and reads it continuously on a background thread
+
+    Only the most recent frame is kept (a single-slot buffer), so consumers
+    never block on ``cap.read()`` and never see stale frames. Frames are read
+    into three reused buffers (one being written, the latest frame, and the
+    frame held by the consumer), so reading does not allocate.
+
+    Parameters
+    ----------
+    source : int or str
+        OpenCV video source, e.g. a webcam index
+
+    Example
+    -------
+        with VideoStream() as stream:
+            frame = stream.read()
+    """
+
+    def __init__(self, source=constants.VIDEO_SOURCE) -> None:
+        self.source = source
+        self.cap = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._new_frame = threading.Condition()
+        self._buffers = [None] * 3
+        self._latest_idx = None  # Buffer holding the most recent frame
+        self._held_idx = None  # Buffer returned by the last read()
+        self._frame_id = 0
+        self._last_read_id = 0
+        self.frames_read = 0
+        self.frames_dropped = 0
+
+    def start(self) -> "VideoStream":
+        """Opens the video source and starts the reader thread"""
+        if self._thread is not None:
+            return self
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Unable to open video source {self.source!r}")
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="VideoStream", daemon=True)
+        self._thread.start()
+        logger.info(f"Started video stream from source {self.source!r}")
+        return self
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            with self._new_frame:
+                idx = next(i for i in range(len(self._buffers)) if i not in (self._latest_idx, self._held_idx))
+            ok, frame = self.cap.read(self._buffers[idx])
+            if not ok:
+                logger.warning("Failed to read frame from video source")
+                self._stopped.set()
+                break
+            self._buffers[idx] = frame  # Only a new array if the frame size changed
+            with self._new_frame:
+                if self._frame_id > self._last_read_id:
+                    # The previous frame was never consumed
+                    self.frames_dropped += 1
+                self._latest_idx = idx
+                self._frame_id += 1
+                self.frames_read += 1
+                self._new_frame.notify_all()
+
+        with self._new_frame:
+            self._new_frame.notify_all()
+
+    def read(self, timeout: Optional[float] = 1.0) -> Optional[np.ndarray]:
+        """Returns the latest frame, waiting for one newer than the last frame read
+
+        Returns None if no new frame arrives within `timeout` seconds or the
+        stream has stopped. The returned frame is only valid until the next
+        call to `read`; copy it to keep it.
+        """
+        with self._new_frame:
+            self._new_frame.wait_for(lambda: self._frame_id > self._last_read_id or self._stopped.is_set(),
+                                     timeout=timeout)
+            if self._frame_id == self._last_read_id:
+                return None
+            self._last_read_id = self._frame_id
+            self._held_idx = self._latest_idx
+            return self._buffers[self._held_idx]
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stopped.is_set()
+
+    def stop(self) -> None:
+        """Stops the reader thread and releases the video source"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        logger.info(f"Stopped video stream ({self.frames_read} frames read, "
+                    f"{self.frames_dropped} dropped)")
+
+    def __enter__(self) -> "VideoStream":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -1,24 +1,52 @@
-from typing import Union
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Optional, Union
 
 import cv2
 import numpy as np
-import torch
-import torchvision.transforms as T
-from ultralytics import YOLO
 
 from rps import constants
+from rps.gameplay.backends import FramePreprocessor, InferenceBackend, create_backend
+from rps.gameplay.capture import VideoStream
+from rps.gameplay.render import Renderer
 
+# torch, torchvision and ultralytics take seconds to import, so they are only
+# imported when a model is actually needed
+if TYPE_CHECKING:
+    import torch
 
-# YOLO model
-model = YOLO(constants.model_path)
 
+logger = logging.getLogger(__name__)
 
-def process_frame(video_frame: np.array) -> torch.tensor:
+# Inference backend, created on first use by get_backend()
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> InferenceBackend:
+    """Returns the configured inference backend, loading the model on first use"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(constants.INFERENCE_BACKEND)
+    return _backend
+
+
+# Preprocessing for process_frame(), built on first use
+_preprocess = None
+
+
+def process_frame(video_frame: np.array) -> "torch.tensor":
     """Preprocesses a video frame before passing to a PyTorch model
 
     May not be required for YOLO models since the model handles this
     stuff internally.
 
+    The frame is center-cropped and resized into preallocated buffers, and
+    the returned tensor shares memory with them, so it is overwritten by the
+    next call.
+
     Parameters
     ----------
     video_frame : np.array
@@ -29,73 +57,372 @@ def process_frame(video_frame: np.array) -> torch.tensor:
     torch.tensor
         The preprocessed frame
     """
-    height, width = video_frame.shape[:2]
-    img = video_frame.copy()
-    # img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    import torch
+
+    global _preprocess
+    if _preprocess is None:
+        _preprocess = FramePreprocessor(size=constants.MODEL_IMAGE_SIZE, rgb=False)
+    return torch.from_numpy(_preprocess(video_frame))
+
+
+def predict_probs(frame: np.array) -> np.array:
+    """Runs the model on a frame and returns the class probabilities
+
+    Probabilities are ordered like `constants.PLAYER_CHOICES`.
+    """
+    return get_backend().predict_probs(frame)
+
+
+class AsyncClassifier:
+    """Runs inference on a worker thread, at its own rate
+
+    The display loop submits every frame without blocking and draws the
+    latest available prediction, so the preview runs at the camera frame rate
+    while inference runs at its own rate. A submitted frame is copied into a
+    reused input buffer only if the worker is free to classify it; frames
+    submitted while the worker is busy are dropped. Results of frames
+    submitted before a `reset` are discarded.
+
+    Parameters
+    ----------
+    predict_fn : Callable[[np.array], np.array]
+        Function returning class probabilities for a frame
+    max_rate : float, optional
+        Maximum number of inferences per second. Unlimited if None
+    """
+
+    def __init__(self, predict_fn: Callable[[np.array], np.array] = predict_probs,
+                 max_rate: Optional[float] = constants.INFERENCE_MAX_RATE) -> None:
+        self.predict_fn = predict_fn
+        self.min_interval = 0.0 if not max_rate else 1.0 / max_rate
+        self._input = None
+        self._pending = False
+        self._busy = False
+        self._latest = None
+        self._generation = 0  # Incremented by reset(); results of older frames are discarded
+        self._stopped = threading.Event()
+        self._frame_ready = threading.Condition()
+        self._thread = None
+        self.frames_submitted = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+
+    def start(self) -> "AsyncClassifier":
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="AsyncClassifier", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, frame: np.array) -> None:
+        """Offers a frame for inference; it is dropped if the worker is busy"""
+        with self._frame_ready:
+            self.frames_submitted += 1
+            if self._busy:
+                self.frames_dropped += 1
+                return
+            if self._pending:
+                # Replace a frame that the worker has not picked up yet
+                self.frames_dropped += 1
+            if self._input is None or self._input.shape != frame.shape:
+                self._input = np.empty_like(frame)
+            np.copyto(self._input, frame)
+            self._pending = True
+            self._frame_ready.notify()
+
+    def reset(self) -> None:
+        """Discards the latest result and any frame being classified, e.g. at the start of a new round"""
+        with self._frame_ready:
+            self._generation += 1
+            if self._pending:
+                self._pending = False
+                self.frames_dropped += 1
+            self._latest = None
+
+    def latest(self) -> Optional[np.array]:
+        """Class probabilities of the most recently classified frame, or None before the first inference"""
+        return self._latest
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            with self._frame_ready:
+                self._frame_ready.wait_for(lambda: self._pending or self._stopped.is_set())
+                if not self._pending:
+                    continue
+                self._pending = False
+                self._busy = True
+                generation = self._generation
+
+            # submit() leaves the input buffer alone while the worker is busy
+            start = time.perf_counter()
+            probs = self.predict_fn(self._input)
+            self.frames_processed += 1
+            with self._frame_ready:
+                if generation == self._generation:
+                    self._latest = probs
+
+            # Throttle to the configured inference rate
+            remaining = self.min_interval - (time.perf_counter() - start)
+            if remaining > 0:
+                self._stopped.wait(remaining)
+            with self._frame_ready:
+                self._busy = False
+
+    @property
+    def metrics(self) -> dict:
+        return {
+            "frames_submitted": self.frames_submitted,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped
+        }
+
+    def stop(self) -> None:
+        self._stopped.set()
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        logger.info(f"Stopped classifier: {self.metrics}")
+
+    def __enter__(self) -> "AsyncClassifier":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
 
-    transforms = T.Compose([
-        T.ToTensor(),
-        T.CenterCrop(min(height, width)),
-        T.Resize(size=(320, 320))
-    ])
 
-    tensor = transforms(img)
-    tensor = tensor[None, :]  # Add the first dimension to the tensor so it's what PyTorch expects
-    return tensor
+class PredictionSmoother:
+    """Smooths per-frame class probabilities over the last few frames
 
+    Probability vectors are kept in a preallocated ring buffer, so updating
+    costs a few small array operations per frame.
 
-def get_choice_from_video() -> tuple[np.array, Union[constants.PlayerChoice, str]]:
+    Parameters
+    ----------
+    window : int
+        Number of recent frames to smooth over
+    method : str
+        "mean" averages the buffered probabilities, "ema" uses an exponential
+        moving average and "vote" takes a majority vote of per-frame choices
+    alpha : float
+        Weight of the newest frame for the "ema" method
+    min_confidence : float
+        Smoothed confidence below which no choice is made
+    stable_frames : int, optional
+        Number of consecutive frames with the same confident choice after
+        which the choice is considered stable (see `is_stable`)
+    """
+
+    METHODS = ("mean", "ema", "vote")
+
+    def __init__(
+            self,
+            window: int = constants.SMOOTHING_WINDOW,
+            method: str = constants.SMOOTHING_METHOD,
+            alpha: float = 0.5,
+            min_confidence: float = constants.MIN_CONFIDENCE,
+            stable_frames: Optional[int] = constants.AUTO_COMMIT_FRAMES
+    ) -> None:
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown smoothing method: {method}")
+        self.window = window
+        self.method = method
+        self.alpha = alpha
+        self.min_confidence = min_confidence
+        self.stable_frames = stable_frames
+
+        n_classes = len(constants.PLAYER_CHOICES)
+        self._buffer = np.zeros((window, n_classes), dtype=np.float32)
+        self._sum = np.zeros(n_classes, dtype=np.float64)
+        self._ema = np.zeros(n_classes, dtype=np.float64)
+        self._votes = np.zeros(n_classes, dtype=np.int64)
+        self.reset()
+
+    def reset(self) -> None:
+        self._buffer[:] = 0
+        self._sum[:] = 0
+        self._ema[:] = 0
+        self._votes[:] = 0
+        self._pos = 0
+        self._count = 0
+        self._stable_count = 0
+        self._last_choice = None
+        self.choice_index = None
+        self.confidence = 0.0
+
+    def update(self, probs: np.array) -> None:
+        """Adds the class probabilities of a new frame"""
+        oldest = self._buffer[self._pos]
+        if self._count == self.window:
+            self._sum -= oldest
+            self._votes[np.argmax(oldest)] -= 1
+        else:
+            self._count += 1
+        oldest[:] = probs
+        self._sum += oldest
+        self._votes[np.argmax(oldest)] += 1
+        self._pos = (self._pos + 1) % self.window
+
+        if self.method == "mean":
+            smoothed = self._sum / self._count
+        elif self.method == "ema":
+            if self._count == 1:
+                self._ema[:] = oldest
+            else:
+                self._ema *= 1 - self.alpha
+                self._ema += self.alpha * oldest
+            smoothed = self._ema
+        else:
+            smoothed = self._votes / self._count
+
+        index = int(np.argmax(smoothed))
+        self.confidence = float(smoothed[index])
+        self.choice_index = index if self.confidence >= self.min_confidence else None
+
+        if self.choice_index is not None and self.choice_index == self._last_choice:
+            self._stable_count += 1
+        else:
+            self._stable_count = 0 if self.choice_index is None else 1
+        self._last_choice = self.choice_index
+
+    @property
+    def choice(self) -> Optional[constants.PlayerChoice]:
+        """Smoothed choice, or None if the smoothed confidence is below `min_confidence`"""
+        return None if self.choice_index is None else constants.PLAYER_CHOICES[self.choice_index]
+
+    @property
+    def is_stable(self) -> bool:
+        """Whether the same confident choice has been made for `stable_frames` frames"""
+        return self.stable_frames is not None and self._stable_count >= self.stable_frames
+
+
+def get_choice_from_video(
+        stream: Optional[VideoStream] = None,
+        classifier: Optional[AsyncClassifier] = None,
+        smoother: Optional[PredictionSmoother] = None,
+        renderer: Optional[Renderer] = None
+) -> tuple[np.array, Union[constants.PlayerChoice, str]]:
     """Get a human rock, paper, or scissors choice from a video stream
 
+    Parameters
+    ----------
+    stream : VideoStream, optional
+        A running video stream to read frames from. If not given, a stream is
+        opened for this call only, which adds the camera start-up time.
+    classifier : AsyncClassifier, optional
+        A running classifier to pipeline inference with. If not given, each
+        frame is classified before it is displayed.
+    smoother : PredictionSmoother, optional
+        Smooths predictions over recent frames. Defaults to one configured
+        from `constants`. If it has `stable_frames` set, a stable choice is
+        committed without waiting for SPACE.
+    renderer : Renderer, optional
+        Draws and shows the preview. Defaults to a new `Renderer`
+
     Returns
     -------
     tuple[np.array, str]
         The image and the player choice value. If the player submitted a valid RPS choice,
         it will be the choic value. If the player chose to quit, the string QUIT is returned.
     """
-    cap = cv2.VideoCapture(constants.VIDEO_SOURCE)
+    if stream is None:
+        with VideoStream() as temporary_stream:
+            return get_choice_from_video(temporary_stream, classifier, smoother, renderer)
+
+    if classifier is not None:
+        classifier.reset()
+    smoother = PredictionSmoother() if smoother is None else smoother
+    smoother.reset()
+    renderer = Renderer() if renderer is None else renderer
 
+    # Display buffer, allocated for the first frame and reused afterwards
+    display = None
+    frame = None
+    last_probs = None
+    low_confidence_until = 0.0  # Time until which the low confidence message is shown
     while True:
-        # Capture the video frame by frame
-        _, frame = cap.read()
-
-        img = frame.copy()  # Copy so that we don't return something with text on it
-        height, _ = frame.shape[:2]
-        # tensor = process_frame(frame)
-
-        # Feed the image to the model and use the max probability as the player choice
-        results = model(frame, imgsz=320)
-        probs = results[0].probs.data.numpy()
-        pred_index = np.argmax(probs)
-        prediction = constants.PLAYER_CHOICES[pred_index]
-
-        # Draw the prediction on the frame
-        cv2.putText(frame, f'Your choice: {prediction.name}', (10, 50),
-                    constants.font,
-                    constants.choice_font_scale,
-                    constants.choice_font_color,
-                    constants.choice_font_thickness,
-                    constants.font_line_type)
-        cv2.putText(frame, 'Press SPACE to select choice, q to quit', (10, height-10),
-                    constants.font, 1, constants.choice_font_color, 2, constants.font_line_type)
-        # Display the resulting frame
-        cv2.namedWindow(constants.WINDOW_NAME, cv2.WINDOW_NORMAL)
-        frame = cv2.resize(frame, constants.IMAGE_SIZE, interpolation=cv2.INTER_LINEAR)
-        cv2.imshow(constants.WINDOW_NAME, frame)
-
-        key = cv2.waitKey(1) & 0xFF
-        if key == 32:
-            # Press SPACE to end the loop and return the current prediction
-            value = prediction
-            break
-        elif key == ord('q'):
-            # Press 'q' to quit
-            value = constants.QUIT
-            break
-
-    # Release the capture object
-    cap.release()
-    # Destroy all the windows
-    cv2.destroyAllWindows()
-
-    return img, value
+        # Get the latest video frame. It is only valid until the next read. Waiting briefly keeps the
+        # window responsive to keys even if the camera stalls
+        new_frame = stream.read(timeout=constants.FRAME_READ_TIMEOUT)
+        if new_frame is None and not stream.running:
+            logger.warning("Video stream stopped. Quitting")
+            return None, constants.QUIT
+        if new_frame is not None:
+            frame = new_frame
+            last_probs = _update_prediction(frame, classifier, smoother, last_probs)
+            display = _draw_preview(renderer, display, frame, smoother, time.monotonic() < low_confidence_until)
+
+        action = _key_action(cv2.waitKey(1) & 0xFF, smoother)
+        if action == SELECT and frame is not None:
+            logger.info(f"Selected {smoother.choice.name} with confidence {smoother.confidence:0.3f}")
+            return frame.copy(), smoother.choice  # The only frame that outlives the loop
+        elif action == constants.QUIT:
+            return None, constants.QUIT
+        elif action == LOW_CONFIDENCE:
+            low_confidence_until = time.monotonic() + constants.LOW_CONFIDENCE_MESSAGE_TIME
+
+
+# Actions for the keys pressed in `get_choice_from_video`, besides `constants.QUIT`
+SELECT = "SELECT"
+LOW_CONFIDENCE = "LOW_CONFIDENCE"
+SPACE_KEY = 32
+
+
+def _update_prediction(frame: np.array, classifier: Optional[AsyncClassifier], smoother: PredictionSmoother,
+                       last_probs: Optional[np.array]) -> Optional[np.array]:
+    """Feeds the newest class probabilities for `frame` to the smoother and returns them"""
+    if classifier is None:
+        probs = predict_probs(frame)
+    else:
+        classifier.submit(frame)
+        probs = classifier.latest()
+        if probs is last_probs:
+            return last_probs  # No new inference since the last frame
+
+    # Use the smoothed max probability as the player choice
+    if probs is not None:
+        smoother.update(probs)
+        logger.debug(f"Smoothed choice: {smoother.choice} (confidence {smoother.confidence:0.3f})")
+    return probs
+
+
+def _draw_preview(renderer: Renderer, display: Optional[np.array], frame: np.array, smoother: PredictionSmoother,
+                  low_confidence: bool) -> np.array:
+    """Shows `frame` with the smoothed prediction; returns the display buffer for the next frame"""
+    # Draw on a copy so that we don't return something with text on it
+    if display is None or display.shape != frame.shape:
+        display = np.empty_like(frame)
+    np.copyto(display, frame)
+    height = display.shape[0]
+    prediction = smoother.choice
+    prediction_name = "..." if prediction is None else f"{prediction.name} ({smoother.confidence:0.2f})"
+
+    # Draw the prediction on the frame
+    renderer.text(display, f'Your choice: {prediction_name}', (10, 50),
+                  constants.choice_font_scale,
+                  constants.choice_font_color,
+                  constants.choice_font_thickness,
+                  cache=False)
+    if low_confidence:
+        renderer.text(display, 'Low confidence: hold your hand steady in view', (10, 110),
+                      1, constants.outcome_font_color_lose, 2)
+    renderer.text(display, 'Press SPACE to select choice, q to quit', (10, height-10),
+                  1, constants.choice_font_color, 2)
+    # Display the resulting frame; the window scales it to the screen
+    renderer.show(display)
+    return display
+
+
+def _key_action(key: int, smoother: PredictionSmoother) -> Optional[str]:
+    """What a key press (or a stable choice) does: SELECT, LOW_CONFIDENCE, QUIT or nothing"""
+    if key == ord('q'):
+        # Press 'q' to quit
+        return constants.QUIT
+    if smoother.choice is not None and (key == SPACE_KEY or smoother.is_stable):
+        # Press SPACE (or hold a stable choice) to select the current prediction
+        return SELECT
+    if key == SPACE_KEY:
+        # No choice is confident enough to select
+        return LOW_CONFIDENCE
+    return None
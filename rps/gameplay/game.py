@@ -1,16 +1,21 @@
 from datetime import datetime
 import logging
 import random
+from typing import Optional
 
 import cv2
 import numpy as np
 
 from rps import constants
 from rps.constants import Player, PlayerChoice, PlayerType, PlayerStrategy, RoundOutcome
-from rps.gameplay.classify import get_choice_from_video
-from rps.gameplay.models import beats, get_prediction
+from rps.gameplay.capture import VideoStream
+from rps.gameplay.classify import AsyncClassifier, PredictionSmoother, get_choice_from_video, get_backend
+from rps.gameplay.models import EnsemblePredictor, beats, get_choice_history
+from rps.gameplay.render import Renderer
 from rps.database.client import DatabaseClient
 from rps.database.models import Game, Round
+from rps.database.storage import GameStorage, create_storage
+from rps.database.writer import RoundWriter
 
 
 logger = logging.getLogger(__name__)
@@ -59,14 +64,16 @@ class RPSRound:
 
 class RPSGame:
 
-    def __init__(self, player1: Player, player2: Player, game_id: int = None) -> None:
+    def __init__(self, player1: Player, player2: Player, game_id: int = None,
+                 storage: Optional[GameStorage] = None) -> None:
         self.player1 = player1
         self.player2 = player2
         self.rounds_played = 0
         self.player1_wins = 0
         self.player2_wins = 0
         self.draws = 0
-        self.db_client = DatabaseClient(constants.DATABASE_URI)
+        # Where games and rounds are stored; `MemoryStorage` skips the database entirely
+        self.storage = storage if storage is not None else create_storage(constants.STORAGE_BACKEND)
 
         if game_id is None:
             self.db_game = Game(
@@ -77,15 +84,56 @@ class RPSGame:
                 player2_type=player1.type.name,
                 player2_strategy=player1.strategy.name
             )
-            self.db_client.insert_game(self.db_game)
+            self.storage.insert_game(self.db_game)
         else:
-            self.db_game = self.db_client.select_game(game_id)
+            self.db_game = self.storage.select_game(game_id)
         logger.info(f"Game ID: {self.db_game.game_id}")
 
+        # Write rounds in the background so the game never waits on the database
+        self.round_writer = None
+        if constants.WRITE_BEHIND and isinstance(self.storage, DatabaseClient):
+            self.round_writer = RoundWriter(self.db_game.game_id, self.storage.database_uri,
+                                            notify_address=self.storage.notify_address).start()
+
+        # Predictor for the LEARN strategy, updated with each round as it is played
+        self.predictor = EnsemblePredictor()
+        if game_id is not None:
+            history = get_choice_history(game_id, n=2*self.predictor.n, storage=self.storage)
+            self.predictor.update_many(history[::-1])
+
+        # Keep the webcam open for the whole game if a human is playing
+        self.video_stream = None
+        self.classifier = None
+        self.smoother = PredictionSmoother()
+        self.renderer = Renderer()
+        if PlayerType.HUMAN in (player1.type, player2.type):
+            self.video_stream = VideoStream(constants.VIDEO_SOURCE).start()
+            get_backend()  # Load the model now rather than on the first frame
+            if constants.PIPELINED_INFERENCE:
+                self.classifier = AsyncClassifier(max_rate=constants.INFERENCE_MAX_RATE).start()
+
+    def close(self) -> None:
+        """Stops the webcam and classifier threads, closes windows and the storage
+
+        Rounds that are still queued for writing are written first.
+        """
+        if self.round_writer is not None:
+            self.round_writer.close()
+            self.round_writer = None
+        if self.classifier is not None:
+            self.classifier.stop()
+            self.classifier = None
+        if self.video_stream is not None:
+            self.video_stream.stop()
+            self.video_stream = None
+        self.renderer.close()
+        self.storage.close()
+
     def get_player_choice(self, player: Player) -> tuple[str, PlayerChoice]:
         """Gets the rock/paper/scissors choice for a player"""
         if player.type == PlayerType.HUMAN:
-            img, player_choice = get_choice_from_video()
+            img, player_choice = get_choice_from_video(self.video_stream, self.classifier, self.smoother,
+                                                       self.renderer)
 
         elif player.type == PlayerType.MACHINE:
             # No image output for the machine
@@ -97,7 +145,7 @@ class RPSGame:
 
             elif player.strategy == PlayerStrategy.LEARN:
                 # Use a "learned" strategy
-                player_choice = get_prediction(self.db_game.game_id)
+                player_choice = self.predictor.predict()
 
             else:
                 raise ValueError(f"Unknown strategy: {player.strategy}")
@@ -145,7 +193,11 @@ class RPSGame:
             player2_choice=player2_choice.name,
             outcome=game_round.outcome.name
         )
-        self.db_client.add_round_to_game(self.db_game, db_round)
+        if self.round_writer is not None:
+            self.round_writer.add(db_round)
+        else:
+            self.storage.add_round_to_game(self.db_game, db_round)
+        self.predictor.update(player1_choice)
 
         # Display the round outcome on the image
         self.display_round_outcome(img, game_round)
@@ -153,6 +205,10 @@ class RPSGame:
         # Print stats
         self.print_stats()
 
+        if img is None:
+            # Nothing was shown, e.g. in a headless machine-vs-machine game
+            return True
+
         # Wait for user input. If player presses 'q', quit; otherwise play again
         key = cv2.waitKey(0) & 0xFF
         if key == ord('q'):
@@ -187,43 +243,36 @@ class RPSGame:
 
         self.rounds_played += 1
 
-        # These lines allow us to center the outcome text horizontally
-        # get boundary of the outcome text
-        outcome_text_size = cv2.getTextSize(outcome_text,
-                                            constants.font,
-                                            constants.outcome_font_scale,
-                                            constants.outcome_font_thickness)[0]
-        # get coords based on boundary
-        outcome_textX = int((img.shape[1] - outcome_text_size[0]) / 2)
-        # outcome_textY = (img.shape[0] + outcome_text_size[1]) / 2
-
         if img is not None:
             height, width = img.shape[:2]
             logger.debug(f"Img shape: {height}, {width}")
-            cv2.putText(img, f"{self.player1.name} choice: {game_round.player1_choice.name}",
-                        (10, 50),
-                        constants.font,
-                        constants.choice_font_scale,
-                        constants.choice_font_color,
-                        constants.choice_font_thickness,
-                        constants.font_line_type)
-            cv2.putText(img, f"{self.player2.name} choice: {game_round.player2_choice.name}",
-                        (10, 120),
-                        constants.font,
-                        constants.choice_font_scale,
-                        constants.choice_font_color,
-                        constants.choice_font_thickness,
-                        constants.font_line_type)
-            cv2.putText(img, outcome_text, (outcome_textX, height - 100),
-                        constants.font,
-                        constants.outcome_font_scale,
-                        outcome_font_color,
-                        constants.outcome_font_thickness,
-                        constants.font_line_type)
-            cv2.putText(img, "Press any key to play again, q to quit", (10, height-10),
-                        constants.font, 1, constants.choice_font_color, 2, constants.font_line_type)
-            img = cv2.resize(img, constants.IMAGE_SIZE, interpolation=cv2.INTER_LINEAR)
-            cv2.imshow(constants.WINDOW_NAME, img)
+
+            # These lines allow us to center the outcome text horizontally
+            # get boundary of the outcome text
+            outcome_text_size = cv2.getTextSize(outcome_text,
+                                                constants.font,
+                                                constants.outcome_font_scale,
+                                                constants.outcome_font_thickness)[0]
+            # get coords based on boundary
+            outcome_textX = int((width - outcome_text_size[0]) / 2)
+
+            self.renderer.text(img, f"{self.player1.name} choice: {game_round.player1_choice.name}",
+                               (10, 50),
+                               constants.choice_font_scale,
+                               constants.choice_font_color,
+                               constants.choice_font_thickness)
+            self.renderer.text(img, f"{self.player2.name} choice: {game_round.player2_choice.name}",
+                               (10, 120),
+                               constants.choice_font_scale,
+                               constants.choice_font_color,
+                               constants.choice_font_thickness)
+            self.renderer.text(img, outcome_text, (outcome_textX, height - 100),
+                               constants.outcome_font_scale,
+                               outcome_font_color,
+                               constants.outcome_font_thickness)
+            self.renderer.text(img, "Press any key to play again, q to quit", (10, height-10),
+                               1, constants.choice_font_color, 2)
+            self.renderer.show(img)
 
     def print_stats(self) -> None:
         """Prints wins and winning percentages"""
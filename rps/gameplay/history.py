@@ -0,0 +1,57 @@
+"""Compact, array-backed storage of round history
+
+Choices are stored as choice codes (see `rps.codes`), so the models can work
+on plain NumPy arrays instead of DataFrames.
+"""
+from typing import Iterable, Optional
+
+import numpy as np
+
+from rps.codes import CHOICE_DTYPE
+
+
+class RoundHistory:
+    """Ring buffer of the most recent choice codes
+
+    Every code is written twice, at ``i`` and ``i + capacity``, so the last
+    ``n <= capacity`` rounds are always a contiguous slice of the buffer and
+    can be returned as views without copying.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum number of rounds to keep
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._buffer = np.zeros(2*capacity, dtype=CHOICE_DTYPE)
+        self._pos = 0  # Slot that the next round is written to
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, code: int) -> None:
+        """Adds the choice code of the latest round"""
+        pos = self._pos
+        self._buffer[pos] = code
+        self._buffer[pos + self.capacity] = code
+        self._pos = (pos + 1) % self.capacity
+        if self._length < self.capacity:
+            self._length += 1
+
+    def extend(self, codes: Iterable[int]) -> None:
+        """Adds several rounds, oldest first"""
+        for code in codes:
+            self.append(code)
+
+    def chronological(self, n: Optional[int] = None) -> np.ndarray:
+        """View of the last `n` rounds (all stored rounds by default), oldest first"""
+        n = self._length if n is None else min(n, self._length)
+        end = self._pos + self.capacity
+        return self._buffer[end - n:end]
+
+    def recent(self, n: Optional[int] = None) -> np.ndarray:
+        """View of the last `n` rounds (all stored rounds by default), most recent first"""
+        return self.chronological(n)[::-1]
@@ -0,0 +1,216 @@
+"""Shared inference server that micro-batches frames from several games
+
+Kiosks on one machine can share a single loaded model: each game connects
+with the "server" backend (`constants.INFERENCE_BACKEND = "server"`) and
+sends frames over a Unix socket. The server collects frames from all
+clients and runs them through the model together, up to `max_batch_size`
+frames per call, waiting at most `max_wait` seconds for a batch to fill.
+Each client gets back the probability vector for its own frame.
+
+Batches only run as one model call with the ultralytics backend or with an
+ONNX export that has a dynamic batch dimension
+(``python -m rps.gameplay.backends --dynamic``).
+
+Run the server with
+    python -m rps.gameplay.inference_server [--backend onnx] [--max-batch-size 8]
+"""
+import argparse
+import logging
+from multiprocessing.connection import Client, Connection, Listener
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Optional
+
+from rps import constants
+from rps.gameplay.backends import InferenceBackend, create_backend
+
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceServer:
+    """Serves class probabilities for frames sent by `ServerBackend` clients
+
+    One thread per client connection receives frames into a shared queue, and
+    a single batching thread runs them through the backend and sends each
+    client its result. Clients send one frame at a time and wait for the
+    result, so a batch holds at most one frame per client.
+
+    Parameters
+    ----------
+    backend : InferenceBackend
+        Backend that runs the batches
+    address : str
+        Unix socket to listen on; a stale socket file is replaced
+    max_batch_size : int
+        Maximum number of frames per model call
+    max_wait : float
+        Maximum number of seconds to wait for more frames after the first
+        frame of a batch arrives
+
+    Example
+    -------
+        with InferenceServer(create_backend("onnx")) as server:
+            server.wait()
+    """
+
+    def __init__(self, backend: InferenceBackend, address: str = constants.INFERENCE_SERVER_ADDRESS,
+                 max_batch_size: int = constants.INFERENCE_MAX_BATCH_SIZE,
+                 max_wait: float = constants.INFERENCE_MAX_WAIT) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.backend = backend
+        self.address = address
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._requests = queue.Queue()
+        self._stopped = threading.Event()
+        self._listener = None
+        self._threads = []
+        self._connections = set()
+        self._client_threads = []
+        self._connections_lock = threading.Lock()
+        self.frames_processed = 0
+        self.batches_processed = 0
+
+    def start(self) -> "InferenceServer":
+        """Starts listening on the socket and processing frames"""
+        if self._listener is not None:
+            return self
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._stopped.clear()
+        self._listener = Listener(self.address, family="AF_UNIX")
+        self._threads = [
+            threading.Thread(target=self._accept, name="InferenceServer-accept", daemon=True),
+            threading.Thread(target=self._run, name="InferenceServer-batch", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Inference server listening on {self.address}")
+        return self
+
+    def _accept(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                break
+            if self._stopped.is_set():
+                conn.close()  # The wake-up connection from stop()
+                break
+            thread = threading.Thread(target=self._receive, args=(conn,), name="InferenceServer-client",
+                                      daemon=True)
+            with self._connections_lock:
+                self._connections.add(conn)
+                self._client_threads = [t for t in self._client_threads if t.is_alive()] + [thread]
+            thread.start()
+
+    def _receive(self, conn: Connection) -> None:
+        logger.info("Inference client connected")
+        try:
+            while not self._stopped.is_set():
+                self._requests.put((conn, conn.recv()))
+        except (EOFError, OSError):
+            logger.info("Inference client disconnected")
+        finally:
+            with self._connections_lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    def _next_batch(self) -> list:
+        """Waits for a frame, then collects more until the batch is full or `max_wait` has passed"""
+        try:
+            batch = [self._requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                # Frames that are already queued are taken without waiting
+                batch.append(self._requests.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                results = self.backend.predict_probs_batch([frame for _, frame in batch])
+            except Exception as e:
+                logger.exception("Inference failed")
+                results = [e] * len(batch)
+            self.frames_processed += len(batch)
+            self.batches_processed += 1
+            for (conn, _), result in zip(batch, results):
+                try:
+                    conn.send(result)
+                except OSError:
+                    pass  # The client disconnected while its frame was queued
+
+    @property
+    def metrics(self) -> dict:
+        return {
+            "frames_processed": self.frames_processed,
+            "batches_processed": self.batches_processed,
+            "mean_batch_size": self.frames_processed / max(self.batches_processed, 1)
+        }
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Blocks until the server is stopped"""
+        self._stopped.wait(timeout)
+
+    def stop(self) -> None:
+        """Stops serving, disconnects clients and removes the socket"""
+        self._stopped.set()
+        if self._listener is not None:
+            # Closing the listener does not interrupt a blocking accept(), so connect to wake it up
+            Client(self.address, family="AF_UNIX").close()
+            self._threads[0].join()
+            self._listener.close()
+            self._listener = None
+        with self._connections_lock:
+            for conn in self._connections:
+                # Closing a connection that another thread is receiving on doesn't reliably wake that
+                # thread, so shut the socket down instead; the receiving thread then sees EOF and closes it
+                with socket.fromfd(conn.fileno(), socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.shutdown(socket.SHUT_RDWR)
+            client_threads, self._client_threads = self._client_threads, []
+        for thread in self._threads + client_threads:
+            thread.join()
+        self._threads = []
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        logger.info(f"Stopped inference server: {self.metrics}")
+
+    def __enter__(self) -> "InferenceServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the hand-gesture classifier to several games")
+    parser.add_argument("--backend", default=constants.INFERENCE_SERVER_BACKEND, help="Backend to run batches on")
+    parser.add_argument("--address", default=constants.INFERENCE_SERVER_ADDRESS, help="Unix socket to listen on")
+    parser.add_argument("--max-batch-size", type=int, default=constants.INFERENCE_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=constants.INFERENCE_MAX_WAIT * 1000)
+    args = parser.parse_args()
+
+    backend = create_backend(args.backend)
+    with InferenceServer(backend, args.address, args.max_batch_size, args.max_wait_ms / 1000) as server:
+        try:
+            server.wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,21 @@
 from abc import ABC, abstractmethod
+from collections import deque
 import logging
 import random
+from typing import Optional
 
 import numpy as np
-import pandas as pd
 
+from rps.codes import CHOICE_DTYPE, decode_choice
 from rps.constants import PlayerChoice, DATABASE_URI, PLAYER_CHOICES
 from rps.database.client import DatabaseClient
+from rps.database.engine import get_engine
+from rps.database.queries import ROUND_HISTORY, fetch_arrays
+from rps.database.storage import GameStorage
+from rps.gameplay.history import RoundHistory
 
 
 logger = logging.getLogger(__name__)
-db_client = DatabaseClient(database_uri=DATABASE_URI)
 
 
 def beats(choice: PlayerChoice):
@@ -32,56 +37,127 @@ def get_round_score(predict_choice: PlayerChoice, actual_choice: PlayerChoice) -
         return 0
 
 
+def get_round_scores(predict_codes: np.ndarray, actual_codes: np.ndarray) -> np.ndarray:
+    """Vectorized `get_round_score` on arrays of choice codes
+
+    ``(actual - predict) % 3`` is 1 when the prediction beats the actual choice,
+    2 when it loses to it and 0 for a draw, which maps to 1, -1 and 0.
+    """
+    diff = actual_codes.astype(np.int64) - predict_codes
+    return (diff + 1) % 3 - 1
+
+
+def ranked_choices(history: np.ndarray) -> np.ndarray:
+    """Choice codes present in the history, ordered like ``value_counts()``
+
+    Sorted by count (descending); ties keep the order of first appearance in
+    the most-recent-first history.
+    """
+    is_code = history == np.arange(len(PLAYER_CHOICES), dtype=CHOICE_DTYPE)[:, None]
+    counts = is_code.sum(axis=1)
+    first_seen = is_code.argmax(axis=1)
+    order = np.lexsort((first_seen, -counts))
+    return order[counts[order] > 0]
+
+
+def window_choice_stats(history: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+    """Choice counts and first-seen positions for every backtest window
+
+    Window ``i`` (``0 <= i < n``) is ``history[i+1:i+n+1]``, i.e. the `n` rounds
+    before round ``i`` in a most-recent-first history. Counts come from
+    differences of cumulative one-hot counts, and first-seen positions from a
+    reverse running minimum of each choice's positions.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Arrays of shape ``(3, n)`` with the number of times each choice code
+        appears in each window and the offset, within the window, of its most
+        recent occurrence (larger than ``n`` when it does not appear)
+    """
+    history = history[:2*n]
+    length = len(history)
+    codes = np.arange(len(PLAYER_CHOICES), dtype=CHOICE_DTYPE)[:, None]
+    one_hot = history == codes
+
+    cum_counts = np.zeros((len(codes), length + 1), dtype=np.int64)
+    np.cumsum(one_hot, axis=1, out=cum_counts[:, 1:])
+    start = np.arange(1, n + 1)
+    counts = cum_counts[:, start + n] - cum_counts[:, start]
+
+    # Position of the next occurrence of each code at or after each index
+    positions = np.where(one_hot, np.arange(length), 2*length)
+    next_seen = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1]
+    first_seen = next_seen[:, start] - start
+    return counts, first_seen
+
+
 class RPSModel(ABC):
+    """Base class for models that predict a choice to beat player 1's next choice
+
+    Models operate on arrays of choice codes (see `rps.codes`)
+    ordered from the most recent round to the oldest.
+    """
 
     def __init__(self, name: str, min_datapoints: int = 5, max_datapoints: int = 10) -> None:
         self.name = name
         self.min_datapoints = min_datapoints
         self.max_datapoints = max_datapoints
-        self.results_df = None
+        self.round_scores = None
         self.score = -100.0  # Set to something very small
 
     @abstractmethod
-    def predict(self, round_history_df: pd.DataFrame) -> PlayerChoice:
+    def predict(self, history: np.ndarray) -> PlayerChoice:
         pass
 
-    def update_results(self, round_history_df: pd.DataFrame) -> None:
+    def backtest(self, history: np.ndarray, n: int) -> np.ndarray:
+        """Predictions for the `n` most recent rounds, each using the `n` rounds before it
+
+        Parameters
+        ----------
+        history : np.ndarray
+            Player 1 choice codes, most recent round first. Must have at least ``2*n`` rounds
+        n : int
+            Number of rounds to backtest, which is also the window size
+
+        Returns
+        -------
+        np.ndarray
+            Predicted choice codes, where element ``i`` is `predict` applied to
+            ``history[i+1:i+n+1]``
+        """
+        if n < self.min_datapoints:
+            return random_codes(n)
+        return self._backtest(history, n)
+
+    def _backtest(self, history: np.ndarray, n: int) -> np.ndarray:
+        """Backtest by calling `predict` once per window; override with a vectorized version"""
+        pred_codes = np.empty(n, dtype=CHOICE_DTYPE)
+        for i in range(n):
+            pred_codes[i] = self.predict(history[i+1:i+n+1]).value
+        return pred_codes
+
+    def update_results(self, history: np.ndarray) -> None:
 
         # Require at least twice the number of minimum data points to
         # get a valid score for the model
-        if len(round_history_df) < 2*self.min_datapoints:
-            logger.debug(f"Round history has only {len(round_history_df)} points. "
+        if len(history) < 2*self.min_datapoints:
+            logger.debug(f"Round history has only {len(history)} points. "
                          f"Setting results for model {self.name} to None")
-            self.results_df = None
+            self.round_scores = None
             return
 
-        results = {
-            "pred_choice": [],
-            "true_choice": []
-        }
-
-        n = np.minimum(np.floor(len(round_history_df) / 2), self.max_datapoints)
-        n = int(n)
+        n = min(len(history) // 2, self.max_datapoints)
         logger.debug(f"Computing model {self.name} history for {n} datapoints")
-        for i in range(n):
-            current_hist_df = round_history_df.iloc[i+1:i+n+1]
-            pred_choice = self.predict(current_hist_df)
-            true_choice = PlayerChoice[round_history_df.iloc[i].player1_choice]
-
-            results["pred_choice"].append(pred_choice)
-            results["true_choice"].append(true_choice)
-
-        self.results_df = pd.DataFrame(results)
-        self.results_df["score"] = self.results_df.apply(
-            lambda row: get_round_score(row.pred_choice, row.true_choice), axis=1
-        )
+        pred_codes = self.backtest(history, n)
+        self.round_scores = get_round_scores(pred_codes, history[:n])
 
     def update_score(self) -> None:
-        if self.results_df is None:
+        if self.round_scores is None:
             logger.debug(f"Model {self.name} has no results. Setting score to -1.")
             self.score = -1
         else:
-            round_scores = self.results_df.score.values
+            round_scores = self.round_scores
             logger.debug(f"Round scores: {round_scores}")
             n = len(round_scores)
             index = np.arange(1, n+1)[::-1]
@@ -96,104 +172,142 @@ class PreviousChoiceModel(RPSModel):
         name = "Previous Choice"
         super().__init__(name, min_datapoints=min_datapoints, max_datapoints=max_datapoints)
 
-    def predict(self, history_df: pd.DataFrame) -> PlayerChoice:
-        if len(history_df) < self.min_datapoints:
+    def predict(self, history: np.ndarray) -> PlayerChoice:
+        if len(history) < self.min_datapoints:
             logger.info(f"Returning random prediction for {self.name}")
             return random_prediction()
         else:
-            previous_choice = PlayerChoice[history_df.iloc[0].player1_choice]
+            previous_choice = decode_choice(history[0])
             prediction = beats(previous_choice)
             return prediction
 
+    def _backtest(self, history: np.ndarray, n: int) -> np.ndarray:
+        # beats(previous_choice)
+        return (history[1:n+1] - 1) % 3
+
 
 class BeatsPreviousChoiceModel(RPSModel):
     def __init__(self, min_datapoints: int = 1, max_datapoints: int = 7) -> None:
         name = "Beats Previous Choice"
         super().__init__(name, min_datapoints=min_datapoints, max_datapoints=max_datapoints)
 
-    def predict(self, history_df: pd.DataFrame) -> PlayerChoice:
-        if len(history_df) < self.min_datapoints:
+    def predict(self, history: np.ndarray) -> PlayerChoice:
+        if len(history) < self.min_datapoints:
             logger.info(f"Returning random prediction for {self.name}")
             return random_prediction()
         else:
-            previous_choice = PlayerChoice[history_df.iloc[0].player1_choice]
+            previous_choice = decode_choice(history[0])
             next_choice = beats(previous_choice)
             prediction = beats(next_choice)
             return prediction
 
+    def _backtest(self, history: np.ndarray, n: int) -> np.ndarray:
+        # beats(beats(previous_choice))
+        return (history[1:n+1] - 2) % 3
+
 
 class LosesToPreviousChoiceModel(RPSModel):
     def __init__(self, min_datapoints: int = 1, max_datapoints: int = 7) -> None:
         name = "Loses To Previous Choice"
         super().__init__(name, min_datapoints=min_datapoints, max_datapoints=max_datapoints)
 
-    def predict(self, history_df: pd.DataFrame) -> PlayerChoice:
-        if len(history_df) < self.min_datapoints:
+    def predict(self, history: np.ndarray) -> PlayerChoice:
+        if len(history) < self.min_datapoints:
             logger.info(f"Returning random prediction for {self.name}")
             return random_prediction()
         else:
-            previous_choice = PlayerChoice[history_df.iloc[0].player1_choice]
+            previous_choice = decode_choice(history[0])
             next_choice = loses_to(previous_choice)
             prediction = beats(next_choice)
             return prediction
 
+    def _backtest(self, history: np.ndarray, n: int) -> np.ndarray:
+        # beats(loses_to(previous_choice)) is the previous choice
+        return history[1:n+1].copy()
+
 
 class MostFrequentChoiceModel(RPSModel):
     def __init__(self, min_datapoints: int = 1, max_datapoints: int = 7) -> None:
         name = "Most Frequent Choice"
         super().__init__(name, min_datapoints=min_datapoints, max_datapoints=max_datapoints)
 
-    def predict(self, history_df: pd.DataFrame) -> PlayerChoice:
-        if len(history_df) < self.min_datapoints:
+    def predict(self, history: np.ndarray) -> PlayerChoice:
+        if len(history) < self.min_datapoints:
             logger.info(f"Returning random prediction for {self.name}")
             return random_prediction()
         else:
-            choice_counts = history_df.player1_choice.value_counts()
-            most_frequent_choice = PlayerChoice[choice_counts.index[0]]
+            most_frequent_choice = decode_choice(ranked_choices(history)[0])
             prediction = beats(most_frequent_choice)
             return prediction
 
+    def _backtest(self, history: np.ndarray, n: int) -> np.ndarray:
+        counts, first_seen = window_choice_stats(history, n)
+        # Highest count wins; ties go to the most recently seen choice
+        most_frequent = np.argmax(counts * (2*n + 1) - first_seen, axis=0)
+        return ((most_frequent - 1) % 3).astype(CHOICE_DTYPE)
+
 
 class LeastFrequentChoiceModel(RPSModel):
     def __init__(self, min_datapoints: int = 1, max_datapoints: int = 10) -> None:
         name = "Least Frequent Choice"
         super().__init__(name, min_datapoints=min_datapoints, max_datapoints=max_datapoints)
 
-    def predict(self, history_df: pd.DataFrame) -> PlayerChoice:
-        if len(history_df) < self.min_datapoints:
+    def predict(self, history: np.ndarray) -> PlayerChoice:
+        if len(history) < self.min_datapoints:
             logger.info(f"Returning random prediction for {self.name}")
             return random_prediction()
         else:
-            choice_counts = history_df.player1_choice.value_counts()
-            least_frequent_choice = PlayerChoice[choice_counts.index[-1]]
+            least_frequent_choice = decode_choice(ranked_choices(history)[-1])
             prediction = beats(least_frequent_choice)
             return prediction
 
+    def _backtest(self, history: np.ndarray, n: int) -> np.ndarray:
+        counts, first_seen = window_choice_stats(history, n)
+        # Lowest non-zero count wins; ties go to the least recently seen choice
+        keys = np.where(counts > 0, counts * (2*n + 1) - first_seen, np.iinfo(np.int64).max)
+        least_frequent = np.argmin(keys, axis=0)
+        return ((least_frequent - 1) % 3).astype(CHOICE_DTYPE)
+
 
 class RandomModel(RPSModel):
     def __init__(self, min_datapoints: int = 1, max_datapoints: int = 10) -> None:
         name = "Random"
         super().__init__(name, min_datapoints=min_datapoints, max_datapoints=max_datapoints)
 
-    def predict(self, history_df: pd.DataFrame) -> PlayerChoice:
+    def predict(self, history: np.ndarray) -> PlayerChoice:
         return random_prediction()
 
+    def _backtest(self, history: np.ndarray, n: int) -> np.ndarray:
+        return random_codes(n)
+
+
+def get_round_history(game_id: int, n: int = 10) -> dict:
+    """Columns of the last `n` rounds of a game, most recent first, as ``{column name: np.ndarray}``"""
+    return fetch_arrays(get_engine(DATABASE_URI), ROUND_HISTORY, game_id=int(game_id), n=int(n))
+
 
-def get_round_history(game_id: int, n: int = 10) -> pd.DataFrame:
-    sql = f"SELECT * FROM rounds WHERE game_id = {game_id} ORDER BY timestamp DESC LIMIT {n}"
-    df = pd.read_sql(sql, con=db_client.engine)
-    return df
+def get_choice_history(game_id: int, n: int = 10, storage: Optional[GameStorage] = None) -> np.ndarray:
+    """Player 1 choice codes of the last `n` rounds of a game, most recent first
+
+    Read from `storage`, or from the database at `DATABASE_URI` if not given.
+    """
+    if storage is None:
+        storage = DatabaseClient(DATABASE_URI)
+    return storage.select_choice_history(game_id, n)
 
 
 def random_prediction() -> PlayerChoice:
     return random.choice(PLAYER_CHOICES)
 
 
-def get_prediction(game_id: int, n: int = 12) -> PlayerChoice:
-    round_history_df = get_round_history(game_id, n=2*n)
+def random_codes(n: int) -> np.ndarray:
+    """Choice codes of `n` random predictions"""
+    return np.array(random.choices(range(len(PLAYER_CHOICES)), k=n), dtype=CHOICE_DTYPE)
+
 
-    # TODO: don't instantiate new models for each prediction cycle
-    models = [
+def default_models() -> list:
+    """Creates the ensemble of models used by the LEARN strategy"""
+    return [
         PreviousChoiceModel(min_datapoints=1, max_datapoints=5),
         BeatsPreviousChoiceModel(min_datapoints=1, max_datapoints=5),
         LosesToPreviousChoiceModel(min_datapoints=1, max_datapoints=5),
@@ -202,9 +316,28 @@ def get_prediction(game_id: int, n: int = 12) -> PlayerChoice:
         RandomModel(min_datapoints=1, max_datapoints=12)
     ]
 
+
+def predict_from_history(history: np.ndarray, models: Optional[list] = None) -> PlayerChoice:
+    """Backtests each model on the round history and predicts with the best one
+
+    Parameters
+    ----------
+    history : np.ndarray
+        Player 1 choice codes, most recent round first
+    models : list, optional
+        Models to choose from. Defaults to `default_models()`
+
+    Returns
+    -------
+    PlayerChoice
+        The choice predicted to beat player 1's next choice
+    """
+    if models is None:
+        models = default_models()
+
     for model in models:
         logger.debug(f"Updating {model.name}")
-        model.update_results(round_history_df)
+        model.update_results(history)
         model.update_score()
         logger.debug(f"{model.name} score is {model.score:0.3f}")
 
@@ -213,8 +346,148 @@ def get_prediction(game_id: int, n: int = 12) -> PlayerChoice:
 
     best_idx = np.argmax(model_scores)
     best_model = models[best_idx]
-    prediction = best_model.predict(round_history_df)
+    prediction = best_model.predict(history)
     logger.info(f"Best model: {best_model.name} (index {best_idx}) predicts {prediction}")
 
     # Use prediction for the best prediction
     return prediction
+
+
+def get_prediction(game_id: int, n: int = 12, storage: Optional[GameStorage] = None) -> PlayerChoice:
+    """Stateless prediction that rebuilds every model from stored rounds
+
+    Rounds are read from `storage`, or from the database at `DATABASE_URI`
+    if not given. `EnsemblePredictor` gives the same predictions
+    incrementally and should be preferred when predicting round after round.
+    """
+    history = get_choice_history(game_id, n=2*n, storage=storage)
+    return predict_from_history(history)
+
+
+class _ModelTracker:
+    """Running backtest state for one model in an `EnsemblePredictor`
+
+    The model score is a weighted sum of the last `size` backtest scores, where
+    the score of age ``i`` (0 is the most recent) has weight ``(size - i)**2``.
+    The sums ``A = sum(s*w**2)``, ``B = sum(s*w)`` and ``C = sum(s)`` let the
+    weighted sum be shifted by one round in O(1), since
+    ``(w - 1)**2 = w**2 - 2*w + 1``.
+    """
+
+    def __init__(self, model: RPSModel, size: int) -> None:
+        self.model = model
+        self.size = size
+        self.round_scores = deque(maxlen=size)
+        self.sum_sq = 0
+        self.sum_lin = 0
+        self.sum_const = 0
+
+    @classmethod
+    def from_history(cls, model: RPSModel, history: np.ndarray, size: int) -> "_ModelTracker":
+        """Backtests a model on `size` rounds of a most-recent-first history in one vectorized pass"""
+        tracker = cls(model, size)
+        round_scores = get_round_scores(model.backtest(history, size), history[:size])
+        weights = np.arange(size, 0, -1)
+        tracker.round_scores.extend(round_scores[::-1].tolist())
+        tracker.sum_sq = int(np.sum(round_scores * weights ** 2))
+        tracker.sum_lin = int(np.sum(round_scores * weights))
+        tracker.sum_const = int(np.sum(round_scores))
+        return tracker
+
+    def update(self, window: np.ndarray, code: int) -> None:
+        """Scores the model's prediction from `window` (most recent first) against choice `code`"""
+        pred_choice = self.model.predict(window)
+        round_score = (int(code) - pred_choice.value + 1) % 3 - 1
+
+        # Age every stored score by one round; the oldest score's weight drops to 0
+        self.sum_sq += self.sum_const - 2 * self.sum_lin
+        self.sum_lin -= self.sum_const
+        if len(self.round_scores) == self.size:
+            self.sum_const -= self.round_scores[0]
+        self.round_scores.append(round_score)
+
+        self.sum_sq += round_score * self.size ** 2
+        self.sum_lin += round_score * self.size
+        self.sum_const += round_score
+
+    @property
+    def score(self) -> float:
+        n = self.size
+        return self.sum_sq / (n * (n + 1) * (2 * n + 1) // 6)
+
+
+class EnsemblePredictor:
+    """Incremental version of `get_prediction`
+
+    Keeps the last ``2*n`` player 1 choices in a `RoundHistory` along with
+    running backtest scores for each model, and is updated with one round at a
+    time via `update`. `predict` is O(number of models) and does not touch the
+    database.
+
+    For deterministic models the predictions match `predict_from_history` on
+    the same history. `RandomModel` is scored on one random prediction per
+    round instead of being re-sampled on every call.
+
+    Parameters
+    ----------
+    models : list, optional
+        Models to choose from. Defaults to `default_models()`
+    n : int
+        Half the number of rounds of history to consider, as in `get_prediction`
+    """
+
+    def __init__(self, models: Optional[list] = None, n: int = 12) -> None:
+        self.models = default_models() if models is None else models
+        self.n = n
+        self.history = RoundHistory(2*n)
+        self.trackers = [None] * len(self.models)
+
+    def update(self, choice: PlayerChoice) -> None:
+        """Adds player 1's choice for the latest round"""
+        self.update_code(choice.value)
+
+    def update_code(self, code: int) -> None:
+        """Same as `update`, but takes a choice code"""
+        n_rounds = min(len(self.history) + 1, self.history.capacity)
+        stale = []
+        for idx, model in enumerate(self.models):
+            size = self._backtest_size(model, n_rounds)
+            tracker = self.trackers[idx]
+            if tracker is not None and tracker.size == size:
+                tracker.update(self.history.recent(size), code)
+            else:
+                stale.append((idx, size))
+
+        self.history.append(code)
+        for idx, size in stale:
+            self.trackers[idx] = self._build_tracker(self.models[idx], size)
+
+    def update_many(self, codes: np.ndarray) -> None:
+        """Adds several rounds of choice codes, oldest first"""
+        for code in codes:
+            self.update_code(code)
+
+    @staticmethod
+    def _backtest_size(model: RPSModel, n_rounds: int) -> int:
+        """Number of backtest rounds, as computed in `RPSModel.update_results`"""
+        if n_rounds < 2*model.min_datapoints:
+            return 0
+        return min(n_rounds // 2, model.max_datapoints)
+
+    def _build_tracker(self, model: RPSModel, size: int) -> Optional[_ModelTracker]:
+        """Backtests a model from scratch; only needed while the history is filling up"""
+        if size == 0:
+            return None
+        return _ModelTracker.from_history(model, self.history.recent(2*size), size)
+
+    def scores(self) -> list:
+        return [-1 if t is None else t.score for t in self.trackers]
+
+    def predict(self) -> PlayerChoice:
+        """Predicts the choice that beats player 1's next choice"""
+        model_scores = self.scores()
+        best_idx = int(np.argmax(model_scores))
+        best_model = self.models[best_idx]
+        prediction = best_model.predict(self.history.recent())
+        logger.info(f"Best model: {best_model.name} (index {best_idx}) predicts {prediction}")
+        return prediction
@@ -0,0 +1,102 @@
+"""Drawing and displaying frames in the game window"""
+from collections import OrderedDict
+import logging
+
+import cv2
+import numpy as np
+
+from rps import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+class TextLayer:
+    """Text rasterized once and blended onto frames of a given shape
+
+    The text is rendered into an alpha mask over the band of rows it covers.
+    Drawing it is two saturating cv2 operations on that band (scale by
+    ``1 - alpha``, then add the premultiplied color), which is cheaper than
+    re-rasterizing the text and keeps its anti-aliasing.
+    """
+
+    def __init__(self, text: str, org: tuple, font_scale: float, color: tuple, thickness: int,
+                 frame_shape: tuple) -> None:
+        height, width = frame_shape[:2]
+        (_, text_height), baseline = cv2.getTextSize(text, constants.font, font_scale, thickness)
+        top = max(org[1] - text_height - thickness, 0)
+        bottom = min(org[1] + baseline + thickness, height)
+        self.rows = slice(top, bottom)
+
+        alpha = np.zeros((bottom - top, width), dtype=np.uint8)
+        cv2.putText(alpha, text, (org[0], org[1] - top), constants.font, font_scale, 255, thickness,
+                    constants.font_line_type)
+        self.inv_alpha = cv2.merge([255 - alpha] * 3)
+        premultiplied = np.asarray(color, dtype=np.float32) * alpha[..., None] / 255
+        self.premultiplied = np.rint(premultiplied).astype(np.uint8)
+
+    def draw(self, img: np.array) -> None:
+        band = img[self.rows]
+        cv2.multiply(band, self.inv_alpha, dst=band, scale=1 / 255)
+        cv2.add(band, self.premultiplied, dst=band)
+
+
+class Renderer:
+    """Draws text on frames and shows them in the game window
+
+    The window is created once and sized to `window_size`; frames are shown
+    at their native resolution and scaled by the window rather than resized
+    on the CPU. Text that doesn't change between frames (instructions,
+    outcomes) is drawn from cached `TextLayer`s.
+
+    Parameters
+    ----------
+    window_name : str
+        Title of the window
+    window_size : tuple
+        Initial (width, height) of the window
+    max_cached_layers : int
+        Maximum number of text layers to keep
+    """
+
+    def __init__(self, window_name: str = constants.WINDOW_NAME, window_size: tuple = constants.IMAGE_SIZE,
+                 max_cached_layers: int = 32) -> None:
+        self.window_name = window_name
+        self.window_size = window_size
+        self.max_cached_layers = max_cached_layers
+        self._layers = OrderedDict()
+        self._window_created = False
+
+    def text(self, img: np.array, text: str, org: tuple, font_scale: float, color: tuple, thickness: int,
+             cache: bool = True) -> None:
+        """Draws text on an image, like `cv2.putText`
+
+        Set `cache` to False for text that changes from frame to frame.
+        """
+        if not cache:
+            cv2.putText(img, text, org, constants.font, font_scale, color, thickness, constants.font_line_type)
+            return
+
+        key = (text, org, font_scale, color, thickness, img.shape)
+        layer = self._layers.get(key)
+        if layer is None:
+            layer = TextLayer(text, org, font_scale, color, thickness, img.shape)
+            self._layers[key] = layer
+            if len(self._layers) > self.max_cached_layers:
+                self._layers.popitem(last=False)
+        else:
+            self._layers.move_to_end(key)
+        layer.draw(img)
+
+    def show(self, img: np.array) -> None:
+        """Shows an image in the window, creating the window on first use"""
+        if not self._window_created:
+            cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
+            cv2.resizeWindow(self.window_name, *self.window_size)
+            self._window_created = True
+        cv2.imshow(self.window_name, img)
+
+    def close(self) -> None:
+        if self._window_created:
+            cv2.destroyWindow(self.window_name)
+            self._window_created = False
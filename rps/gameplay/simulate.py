@@ -0,0 +1,392 @@
+"""Headless machine-vs-machine simulations
+
+Runs many games between simulated players without any video, display or
+database access, and aggregates the results in memory. Players whose choices
+do not depend on the game so far (e.g. `RandomBot`) generate a whole game in
+one vectorized call, at millions of rounds per second; adaptive players
+such as `LearnBot` are stepped one round at a time, so any game with a
+LEARN player runs at about ten thousand rounds per second (use
+``--processes`` to play games in parallel). Outcomes are always resolved in
+one array expression.
+
+Example
+-------
+    python -m rps.gameplay.simulate --player1 SHIFT --player2 LEARN --games 100 --rounds 1000
+"""
+from abc import ABC, abstractmethod
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import logging
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import insert
+
+from rps.codes import CHOICE_DTYPE, CHOICES_BY_CODE
+from rps.constants import PlayerType, PlayerStrategy, RoundOutcome
+from rps.database.aggregates import backfill_aggregates
+from rps.database.client import DatabaseClient
+from rps.database.models import Game, GameStats, Round
+from rps.gameplay.models import EnsemblePredictor
+
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES_BY_VALUE = {outcome.value: outcome for outcome in RoundOutcome}
+
+
+def determine_round_outcomes(choices1: np.ndarray, choices2: np.ndarray) -> np.ndarray:
+    """Vectorized `RPSRound.determine_round_outcome`
+
+    Parameters
+    ----------
+    choices1 : np.ndarray
+        Player 1's choice codes
+    choices2 : np.ndarray
+        Player 2's choice codes
+
+    Returns
+    -------
+    np.ndarray
+        `RoundOutcome` values from player 1's perspective (1 for a WIN, 0 for a
+        DRAW, -1 for a LOSS). Player 1 wins when ``choice1 == beats(choice2)``,
+        i.e. when ``(choice2 - choice1) % 3 == 1``.
+    """
+    diff = choices2.astype(np.int16) - choices1
+    return ((diff + 1) % 3 - 1).astype(np.int8)
+
+
+class Bot(ABC):
+    """A simulated player
+
+    Bots implement `choose` and `observe`, which are called once per round.
+    Bots whose choices don't depend on the game so far derive from
+    `NonAdaptiveBot` instead and generate a whole game at once.
+    """
+    name: str = "Bot"
+    strategy: str = ""
+
+    def reset(self, rng: np.random.Generator) -> None:
+        """Prepares the bot for a new game"""
+        self.rng = rng
+
+    @abstractmethod
+    def choose(self) -> int:
+        pass
+
+    def observe(self, own_code: int, opponent_code: int) -> None:
+        pass
+
+
+class NonAdaptiveBot(Bot):
+    """A simulated player whose choices don't depend on the opponent's; implements `choose_many`"""
+
+    @abstractmethod
+    def choose_many(self, n_rounds: int) -> np.ndarray:
+        pass
+
+    def choose(self) -> int:
+        return int(self.choose_many(1)[0])
+
+
+class RandomBot(NonAdaptiveBot):
+    """Plays each choice with fixed probabilities (uniform by default)"""
+    name = "Random"
+    strategy = PlayerStrategy.RANDOM.name
+
+    def __init__(self, probs: Optional[Sequence[float]] = None) -> None:
+        self.probs = probs
+
+    def choose_many(self, n_rounds: int) -> np.ndarray:
+        return self.rng.choice(len(CHOICES_BY_CODE), size=n_rounds, p=self.probs).astype(CHOICE_DTYPE)
+
+
+class CycleBot(NonAdaptiveBot):
+    """Repeats a fixed sequence of choice codes, starting at a random offset"""
+    name = "Cycle"
+    strategy = "CYCLE"
+
+    def __init__(self, sequence: Sequence[int] = (1, 0, 2)) -> None:
+        self.sequence = np.asarray(sequence, dtype=CHOICE_DTYPE)
+
+    def choose_many(self, n_rounds: int) -> np.ndarray:
+        offset = self.rng.integers(len(self.sequence))
+        return self.sequence[(offset + np.arange(n_rounds)) % len(self.sequence)]
+
+
+class ShiftBot(NonAdaptiveBot):
+    """Human-like player that tends to stay on or rotate through its previous choice
+
+    Each round the choice code moves by 0, +1 or -1 (mod 3) with probabilities
+    `probs`, so a game is a cumulative sum of random shifts.
+    """
+    name = "Shift"
+    strategy = "SHIFT"
+
+    def __init__(self, probs: Sequence[float] = (0.5, 0.3, 0.2)) -> None:
+        self.probs = probs
+
+    def choose_many(self, n_rounds: int) -> np.ndarray:
+        shifts = self.rng.choice([0, 1, -1], size=n_rounds, p=self.probs)
+        shifts[0] = self.rng.integers(len(CHOICES_BY_CODE))
+        return (np.cumsum(shifts) % 3).astype(CHOICE_DTYPE)
+
+
+class LearnBot(Bot):
+    """The LEARN strategy; predicts the opponent's next choice with an `EnsemblePredictor`"""
+    name = "Learn"
+    strategy = PlayerStrategy.LEARN.name
+
+    def __init__(self, n: int = 12) -> None:
+        self.n = n
+
+    def reset(self, rng: np.random.Generator) -> None:
+        super().reset(rng)
+        self.predictor = EnsemblePredictor(n=self.n)
+
+    def choose(self) -> int:
+        return self.predictor.predict().value
+
+    def observe(self, own_code: int, opponent_code: int) -> None:
+        self.predictor.update_code(opponent_code)
+
+
+BOTS = {
+    PlayerStrategy.RANDOM.name: RandomBot,
+    PlayerStrategy.LEARN.name: LearnBot,
+    CycleBot.strategy: CycleBot,
+    ShiftBot.strategy: ShiftBot,
+}
+
+
+@dataclass
+class GameResult:
+    """Outcome of one simulated game
+
+    `choices1`, `choices2` and `outcomes` are only kept when the simulation
+    is run with ``keep_rounds=True``.
+    """
+    player1: str
+    player2: str
+    win_count: int
+    loss_count: int
+    draw_count: int
+    choices1: Optional[np.ndarray] = field(default=None, repr=False)
+    choices2: Optional[np.ndarray] = field(default=None, repr=False)
+    outcomes: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def rounds(self) -> int:
+        return self.win_count + self.loss_count + self.draw_count
+
+    @property
+    def win_pct(self) -> float:
+        """Player 1 winning percentage over decisive rounds, as in `GameStats`"""
+        if self.win_count == 0:
+            return 0.0
+        return self.win_count / (self.win_count + self.loss_count)
+
+
+@contextmanager
+def _quiet_model_logging() -> Iterator[None]:
+    """The models log every prediction; silence them for the duration of a simulation"""
+    model_logger = logging.getLogger("rps.gameplay.models")
+    level = model_logger.level
+    model_logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        model_logger.setLevel(level)
+
+
+def play_game(bot1: Bot, bot2: Bot, n_rounds: int, seed=None, keep_rounds: bool = False) -> GameResult:
+    """Plays one headless game of `n_rounds` rounds between two bots"""
+    rng = np.random.default_rng(seed)
+    bot1.reset(rng)
+    bot2.reset(rng)
+
+    if isinstance(bot1, NonAdaptiveBot) and isinstance(bot2, NonAdaptiveBot):
+        choices1 = bot1.choose_many(n_rounds)
+        choices2 = bot2.choose_many(n_rounds)
+    else:
+        choices1 = np.empty(n_rounds, dtype=CHOICE_DTYPE)
+        choices2 = np.empty(n_rounds, dtype=CHOICE_DTYPE)
+        # Pre-generate the choices of a non-adaptive opponent
+        fixed1 = bot1.choose_many(n_rounds) if isinstance(bot1, NonAdaptiveBot) else None
+        fixed2 = bot2.choose_many(n_rounds) if isinstance(bot2, NonAdaptiveBot) else None
+        with _quiet_model_logging():
+            for i in range(n_rounds):
+                code1 = bot1.choose() if fixed1 is None else fixed1[i]
+                code2 = bot2.choose() if fixed2 is None else fixed2[i]
+                bot1.observe(code1, code2)
+                bot2.observe(code2, code1)
+                choices1[i] = code1
+                choices2[i] = code2
+
+    outcomes = determine_round_outcomes(choices1, choices2)
+    counts = np.bincount(outcomes + 1, minlength=3)
+    result = GameResult(
+        player1=bot1.strategy,
+        player2=bot2.strategy,
+        win_count=int(counts[RoundOutcome.WIN.value + 1]),
+        loss_count=int(counts[RoundOutcome.LOSS.value + 1]),
+        draw_count=int(counts[RoundOutcome.DRAW.value + 1])
+    )
+    if keep_rounds:
+        result.choices1 = choices1
+        result.choices2 = choices2
+        result.outcomes = outcomes
+    return result
+
+
+def _play_games(bot1: Bot, bot2: Bot, n_rounds: int, seeds: list, keep_rounds: bool) -> list:
+    """Plays one game per seed; module-level so it can run in a process pool"""
+    return [play_game(bot1, bot2, n_rounds, seed=seed, keep_rounds=keep_rounds) for seed in seeds]
+
+
+def simulate(
+        bot1: Bot,
+        bot2: Bot,
+        n_games: int,
+        n_rounds: int,
+        seed: Optional[int] = None,
+        processes: Optional[int] = None,
+        keep_rounds: bool = False
+) -> list:
+    """Plays many headless games between two bots
+
+    Parameters
+    ----------
+    bot1 : Bot
+        Player 1 (the "human" side, whose choices the LEARN strategy predicts)
+    bot2 : Bot
+        Player 2
+    n_games : int
+        Number of games to play
+    n_rounds : int
+        Number of rounds per game
+    seed : int, optional
+        Seed for reproducible games. Each game gets its own child seed
+    processes : int, optional
+        Number of worker processes. Games are played in this process if not set
+    keep_rounds : bool
+        Whether to keep the per-round choices and outcomes of every game
+
+    Returns
+    -------
+    list
+        One `GameResult` per game
+    """
+    seeds = np.random.SeedSequence(seed).spawn(n_games)
+    if not processes or processes <= 1:
+        return _play_games(bot1, bot2, n_rounds, seeds, keep_rounds)
+
+    chunks = [seeds[i::processes] for i in range(processes) if seeds[i::processes]]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_play_games, bot1, bot2, n_rounds, chunk, keep_rounds)
+                   for chunk in chunks]
+        return [result for future in futures for result in future.result()]
+
+
+def summarize(results: list) -> dict:
+    """Aggregates game results into total counts and player 1's overall winning percentage"""
+    wins = sum(r.win_count for r in results)
+    losses = sum(r.loss_count for r in results)
+    draws = sum(r.draw_count for r in results)
+    return {
+        "games": len(results),
+        "rounds": wins + losses + draws,
+        "win_count": wins,
+        "loss_count": losses,
+        "draw_count": draws,
+        "win_pct": 0.0 if wins == 0 else wins / (wins + losses)
+    }
+
+
+def save_results(results: list, db_client: DatabaseClient) -> None:
+    """Bulk-inserts simulated games into the database in a single transaction
+
+    Games are stored with their stats, rounds and the aggregates derived
+    from the rounds, so only results that kept their rounds
+    (``keep_rounds=True``) can be saved; others are skipped, with a warning.
+    Rounds are timestamped a microsecond apart, in the order they were played.
+    """
+    choice_names = np.array([choice.name for choice in CHOICES_BY_CODE])
+    outcome_names = {value: outcome.name for value, outcome in OUTCOMES_BY_VALUE.items()}
+    start = datetime.now()
+    n_saved = 0  # Rounds saved so far, to offset the timestamps by
+
+    saved = [result for result in results if result.outcomes is not None]
+    if len(saved) < len(results):
+        logger.warning(f"Not saving {len(results) - len(saved)} games whose rounds weren't kept")
+
+    game_ids = []
+    with db_client.engine.begin() as conn:
+        for result in saved:
+            game_id = conn.execute(insert(Game.__table__).values(
+                player1_name=result.player1,
+                player1_type=PlayerType.MACHINE.name,
+                player1_strategy=result.player1,
+                player2_name=result.player2,
+                player2_type=PlayerType.MACHINE.name,
+                player2_strategy=result.player2
+            )).inserted_primary_key[0]
+            conn.execute(insert(GameStats.__table__).values(
+                game_id=game_id,
+                win_count=result.win_count,
+                loss_count=result.loss_count,
+                draw_count=result.draw_count,
+                win_pct=result.win_pct
+            ))
+            if len(result.outcomes) == 0:
+                continue
+            conn.execute(insert(Round.__table__), [
+                {
+                    "game_id": game_id,
+                    "timestamp": start + timedelta(microseconds=n_saved + i),
+                    "player1_choice": p1,
+                    "player2_choice": p2,
+                    "outcome": outcome_names[outcome]
+                }
+                for i, (p1, p2, outcome) in enumerate(zip(choice_names[result.choices1].tolist(),
+                                                          choice_names[result.choices2].tolist(),
+                                                          result.outcomes.tolist()))
+            ])
+            n_saved += len(result.outcomes)
+            game_ids.append(game_id)
+        backfill_aggregates(conn, game_ids)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Simulate machine-vs-machine Rock, Paper, Scissors games",
+        epilog="Games with a LEARN player are played one round at a time, at about ten thousand rounds per "
+               "second; other matchups are vectorized.")
+    parser.add_argument("--player1", choices=sorted(BOTS), default=ShiftBot.strategy)
+    parser.add_argument("--player2", choices=sorted(BOTS), default=PlayerStrategy.LEARN.name)
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--save", metavar="DATABASE_URI", default=None,
+                        help="Store games and rounds in this database")
+    args = parser.parse_args()
+
+    start = datetime.now()
+    results = simulate(BOTS[args.player1](), BOTS[args.player2](), args.games, args.rounds,
+                       seed=args.seed, processes=args.processes, keep_rounds=args.save is not None)
+    elapsed = (datetime.now() - start).total_seconds()
+
+    summary = summarize(results)
+    print(f"{args.player1} vs {args.player2}: {summary}")
+    print(f"{summary['rounds'] / max(elapsed, 1e-9):,.0f} rounds/sec")
+
+    if args.save is not None:
+        save_results(results, DatabaseClient(args.save))
+
+
+if __name__ == "__main__":
+    main()
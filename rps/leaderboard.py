@@ -0,0 +1,149 @@
+"""This file handles the bokeh leaderboard page, with statistics across all games
+
+Serve it next to the game dashboard with
+    bokeh serve rps rps/leaderboard.py
+
+All plots are read from per-game summaries (see `rps.database.analytics`), so
+they stay quick however many rounds have been played. Every session of the
+server shares one set of results, which is refreshed when games or rounds are added.
+"""
+
+import logging
+
+from bokeh.io import curdoc
+from bokeh.layouts import column, row
+from bokeh.models import ColumnDataSource, DataTable, DateFormatter, HoverTool, NumberFormatter, TableColumn
+from bokeh.plotting import figure
+from bokeh.transform import stack
+
+from rps.constants import (DATABASE_URI, LEADERBOARD_MAX_TIME_BUCKETS, LEADERBOARD_MIN_ROUNDS,
+                           LEADERBOARD_REFRESH_INTERVAL, LEADERBOARD_SIZE)
+from rps.database.analytics import choice_distribution, leaderboard, strategy_performance
+from rps.database.aggregates import CHOICE_NAMES
+from rps.database.cache import get_cache
+from rps.database.client import DatabaseClient
+from rps.database.queries import SUMMARY_VERSION
+
+
+logger = logging.getLogger(__name__)
+
+# Colors of the choices (fill colors of the game dashboard's choice boxes)
+CHOICE_COLORS = {
+    "PAPER": "#ece7f2",
+    "ROCK": "#9ebcda",
+    "SCISSORS": "#8856a7"
+}
+
+
+def get_data() -> tuple[dict, dict, dict]:
+    """Gets the leaderboard, per-strategy performance and choices over time
+
+    Results are cached for all sessions of this server until a game or a
+    round is added, and must not be modified.
+
+    Returns
+    -------
+    tuple[dict, dict, dict]
+        Column arrays for the leaderboard table, the strategy plot and the
+        choices-over-time plot
+    """
+    with db_client.engine.connect() as connection:
+        version = tuple(connection.execute(SUMMARY_VERSION).one())
+
+    def load() -> tuple[dict, dict, dict]:
+        return (leaderboard(db_client.engine, LEADERBOARD_SIZE, LEADERBOARD_MIN_ROUNDS),
+                strategy_performance(db_client.engine),
+                choice_distribution(db_client.engine, LEADERBOARD_MAX_TIME_BUCKETS))
+
+    return leaderboard_cache.get(("leaderboard",) + version, load)
+
+
+# Database, and query results shared with the other sessions of this server
+db_client = DatabaseClient(database_uri=DATABASE_URI)
+leaderboard_cache = get_cache("dashboard")
+
+# Set up initial data
+leaderboard_data, strategy_data, choices_data = get_data()
+leaderboard_source = ColumnDataSource(data=leaderboard_data)
+strategy_source = ColumnDataSource(data=strategy_data)
+choices_source = ColumnDataSource(data=choices_data)
+
+# ----------------------------
+# Set up leaderboard table
+#
+pct_formatter = NumberFormatter(format="0.0%")
+leaderboard_table = DataTable(source=leaderboard_source, width=1100, height=600, index_position=None, columns=[
+    TableColumn(field="rank", title="#", width=40),
+    TableColumn(field="game_id", title="Game", width=70),
+    TableColumn(field="created_time", title="Played", formatter=DateFormatter(format="%Y-%m-%d %H:%M")),
+    TableColumn(field="player1_name", title="Player 1"),
+    TableColumn(field="player2_name", title="Player 2"),
+    TableColumn(field="player2_strategy", title="Strategy"),
+    TableColumn(field="rounds_count", title="Rounds", width=70),
+    TableColumn(field="win_count", title="Wins", width=70),
+    TableColumn(field="loss_count", title="Losses", width=70),
+    TableColumn(field="draw_count", title="Draws", width=70),
+    TableColumn(field="win_pct", title="Win Pct.", formatter=pct_formatter, width=80),
+])
+
+# ----------------------------
+# Set up per-strategy performance plot
+#
+STRATEGY_TOOLTIPS = [("Strategy", "@strategy"), ("Games", "@games_count"), ("Rounds", "@rounds_count"),
+                     ("Player 1 Win Pct.", "@win_pct{0.0%}")]
+
+strategy_plot = figure(x_range=list(strategy_data["strategy"]), height=450, width=900, y_range=(0, 1),
+                       title="Player 1 Win Fraction by Computer Strategy", tools="hover",
+                       tooltips=STRATEGY_TOOLTIPS, y_axis_label="Win Fraction", toolbar_location=None,
+                       margin=(20, 20, 20, 20))
+strategy_plot.vbar(x="strategy", top="win_pct", source=strategy_source, width=0.8, fill_alpha=0.6)
+
+# ----------------------------
+# Set up human choices over time plot
+#
+share_names = [f"{name}_share" for name in CHOICE_NAMES]
+choices_plot = figure(x_axis_type="datetime", height=450, width=2000, y_range=(0, 1),
+                      title="Human Choices Over Time", tools="xpan,xwheel_zoom,reset",
+                      active_scroll="xwheel_zoom", y_axis_label="Share of Rounds", toolbar_location="above",
+                      margin=(20, 20, 20, 20))
+for i, name in enumerate(CHOICE_NAMES):
+    # Each choice's share is stacked on top of the previous choices' shares
+    choices_plot.quad(left="start", right="end", bottom=stack(*share_names[:i]), top=stack(*share_names[:i + 1]),
+                      source=choices_source, fill_color=CHOICE_COLORS[name], line_color="white",
+                      legend_label=name.title())
+choices_plot.add_tools(HoverTool(tooltips=[("From", "@start{%F %H:%M}"), ("Rounds", "@rounds_count")] +
+                                 [(name.title(), f"@{name}_share{{0.0%}}") for name in CHOICE_NAMES],
+                                 formatters={"@start": "datetime"}))
+choices_plot.legend.location = "top_left"
+
+for p in [strategy_plot, choices_plot]:
+    p.toolbar.logo = None
+    p.axis.axis_label_text_font_style = "bold"
+    p.axis.axis_label_text_font_size = "18pt"
+    p.axis.major_label_text_font_size = "16pt"
+    p.title.align = "center"
+    p.title.text_color = "navy"
+    p.title.text_font_size = "24pt"
+
+
+# Set up callbacks
+def update_data() -> None:
+    """Replaces the displayed data if games or rounds were added since the last update"""
+    global leaderboard_data
+    data = get_data()
+    if data[0] is leaderboard_data:
+        return  # Same cached results as last time
+    leaderboard_data, strategy_data, choices_data = data
+    leaderboard_source.data = dict(leaderboard_data)
+    strategy_plot.x_range.factors = list(strategy_data["strategy"])
+    strategy_source.data = dict(strategy_data)
+    choices_source.data = dict(choices_data)
+    logger.debug("Updated leaderboard")
+
+
+# Set up layouts and add to document
+final_col = column(row(leaderboard_table, strategy_plot), choices_plot)
+
+curdoc().title = "Rock, Paper, Scissors Leaderboard"
+curdoc().add_periodic_callback(update_data, LEADERBOARD_REFRESH_INTERVAL * 1000)
+curdoc().add_root(final_col)
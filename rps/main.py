@@ -4,17 +4,24 @@ To conform to `bokeh serve` signature, this file needs to be named `main.py`.
 It will be launched when `bokeh serve` is executed.
 """
 
+from functools import partial
 import logging
+from typing import Optional
 
+from bokeh.events import RangesUpdate, Reset
 from bokeh.io import curdoc
 from bokeh.layouts import column, row
 from bokeh.models import ColumnDataSource, NumericInput
 from bokeh.plotting import figure
 import numpy as np
-import pandas as pd
 
+from rps.database.cache import get_cache, get_series
 from rps.database.client import DatabaseClient
-from rps.constants import DATABASE_URI
+from rps.database.notify import get_listener
+from rps.database.queries import GAME_OUTCOME_COUNTS, ROUND_UPDATES, fetch_arrays
+from rps.downsample import downsample
+from rps.constants import (DASHBOARD_DOWNSAMPLING, DASHBOARD_FALLBACK_POLL_INTERVAL, DASHBOARD_MAX_POINTS,
+                           DASHBOARD_POLL_INTERVAL, DASHBOARD_RECENT_ROUNDS, DATABASE_URI, ROUND_NOTIFY_ADDRESS)
 
 
 logger = logging.getLogger(__name__)
@@ -42,67 +49,119 @@ P2_OUTCOME_COLORS = {
 }
 
 
-def get_data(game_id: int) -> pd.DataFrame:
-    """Gets data from the database to display game history
+def get_data(game_id: int, after_round: int = 0, until_round: Optional[int] = None) -> tuple[dict, dict, dict]:
+    """Gets the rounds of a game played after round `after_round` from the database
+
+    By default this is the game's whole history. Given the last round already
+    displayed, it is only what changed since, read from the per-round
+    aggregates (see `rps.database.aggregates`), so a refresh costs as much as
+    the number of new rounds rather than the length of the game.
+
+    Results are cached for all sessions of this server by game and range of
+    rounds, so sessions showing the same game share one query and must not
+    modify the returned data.
 
     Parameters
     ----------
     game_id : int
         The game ID for which to retrieve data
+    after_round : int
+        Number of the last round already displayed, counting from 1; 0 for all rounds
+    until_round : int, optional
+        Number of the last round to get; by default, the last round stored
 
     Returns
     -------
-    pd.DataFrame
-        Game statistics to be used in visualizations
+    tuple[dict, dict, dict]
+        Game statistics to be used in visualizations, as column arrays for the
+        win percentage plot, the outcome counts after the last new round (no
+        rows if there are no new rounds) and the most recent new rounds' choices
     """
-    # Data to use in the human win percentage plot
-    win_pct_df = pd.read_sql(f"SELECT outcome FROM rounds WHERE game_id = {game_id}",
-                             con=db_client.engine)
-    win_pct_df["win_count"] = (win_pct_df.outcome == "WIN").cumsum()
-    win_pct_df["loss_count"] = (win_pct_df.outcome == "LOSS").cumsum()
-    win_pct_df["draw_count"] = (win_pct_df.outcome == "DRAW").cumsum()
-    win_pct_df["win_pct"] = win_pct_df.win_count / (win_pct_df.win_count + win_pct_df.loss_count)
-    win_pct_df["win_pct"].fillna(0.0)
-    win_pct_df["round"] = np.arange(len(win_pct_df)) + 1
-
-    # Data to use in the counts of rounds, wins, losses, and draws
-    outcome_df = pd.read_sql("SELECT win_count, loss_count, draw_count, "
-                             "win_count+loss_count+draw_count AS games_count "
-                             f"FROM game_stats WHERE game_id = {game_id}",
-                             con=db_client.engine)
-    outcome_df["x"] = 0
-    outcome_df["y"] = 0
-
-    # Data to use in display of last 10 human and computer choices
-    choices_df = pd.read_sql("SELECT timestamp, player1_choice AS p1, player2_choice AS p2, "
-                             f"outcome FROM rounds WHERE game_id = {game_id} "
-                             "ORDER BY timestamp DESC LIMIT 10",
-                             con=db_client.engine)
+    game_id = int(game_id)
+    after_round = int(after_round)
+    if until_round is None:
+        until_round = sum(fetch_arrays(db_client.engine, GAME_OUTCOME_COUNTS, game_id=game_id)["games_count"])
+    until_round = int(until_round)
+    return dashboard_cache.get(("get_data", game_id, after_round, until_round),
+                               lambda: _load_data(game_id, after_round, until_round))
 
-    choices_df["p1_color"] = choices_df.p1.apply(lambda x: CHOICE_COLORS[x])
-    choices_df["p2_color"] = choices_df.p2.apply(lambda x: CHOICE_COLORS[x])
 
-    choices_df["p1_line_color"] = choices_df.outcome.apply(lambda x: P1_OUTCOME_COLORS[x])
-    choices_df["p2_line_color"] = choices_df.outcome.apply(lambda x: P2_OUTCOME_COLORS[x])
-
-    choices_df = choices_df.sort_values("timestamp", ascending=True)
-    choices_df["x"] = np.arange(len(choices_df))
-    choices_df["y"] = np.zeros(len(choices_df))
-
-    return win_pct_df, outcome_df, choices_df
+def _load_data(game_id: int, after_round: int, until_round: int) -> tuple[dict, dict, dict]:
+    """Reads rounds `after_round` + 1 to `until_round` of a game; see `get_data`"""
+    rounds = fetch_arrays(db_client.engine, ROUND_UPDATES, game_id=game_id, after_round=after_round,
+                          until_round=until_round)
+    n_rounds = len(rounds["round_number"])
 
+    # Data to use in the human win percentage plot
+    win_pct_data = {"round": rounds["round_number"]}
+    win_pct_data.update({name: rounds[name] for name in ("win_count", "loss_count", "draw_count", "win_pct")})
 
-# Database
+    # Data to use in the counts of rounds, wins, losses, and draws
+    outcome_data = {"games_count": rounds["round_number"][-1:]}
+    outcome_data.update({name: rounds[name][-1:] for name in ("win_count", "loss_count", "draw_count")})
+    if n_rounds == 0 and after_round == 0:
+        outcome_data = {name: np.zeros(1, dtype=int) for name in outcome_data}  # A game without rounds
+    outcome_data["x"] = np.zeros(len(outcome_data["games_count"]))
+    outcome_data["y"] = np.zeros(len(outcome_data["games_count"]))
+
+    # Data to use in display of recent human and computer choices, oldest first
+    recent = slice(max(n_rounds - DASHBOARD_RECENT_ROUNDS, 0), n_rounds)
+    choices_data = {name: rounds[name][recent] for name in ("p1", "p2", "outcome")}
+    choices_data["p1_color"] = [CHOICE_COLORS[x] for x in choices_data["p1"]]
+    choices_data["p2_color"] = [CHOICE_COLORS[x] for x in choices_data["p2"]]
+    choices_data["p1_line_color"] = [P1_OUTCOME_COLORS[x] for x in choices_data["outcome"]]
+    choices_data["p2_line_color"] = [P2_OUTCOME_COLORS[x] for x in choices_data["outcome"]]
+    choices_data["x"] = rounds["round_number"][recent]
+    choices_data["y"] = np.zeros(len(choices_data["p1"]))
+
+    return win_pct_data, outcome_data, choices_data
+
+
+# Database, and query results shared with the other sessions of this server
 db_client = DatabaseClient(database_uri=DATABASE_URI)
+dashboard_cache = get_cache("dashboard")
 
 # Get the most recent game ID to start--can be changed interactively in the display
 most_recent_game = db_client.select_most_recent_game()
 
 # Set up initial data
-win_pct_df, outcome_df, choices_df = get_data(most_recent_game.game_id)
-win_pct_source = ColumnDataSource(data=win_pct_df)
-outcome_source = ColumnDataSource(data=outcome_df)
-choices_source = ColumnDataSource(data=choices_df)
+win_pct_source = ColumnDataSource()
+outcome_source = ColumnDataSource()
+choices_source = ColumnDataSource()
+
+# Game, its win percentage series, the last round displayed and the visible range of rounds (None
+# for all rounds); every browser session runs this module, so this is per session
+displayed_game_id = None
+series = None
+last_round = 0
+view_range = None
+
+
+def render_win_pct() -> None:
+    """Shows the visible range of the win percentage series, downsampled to `DASHBOARD_MAX_POINTS` points"""
+    rounds, win_pct = series.arrays()
+    indices = downsample(rounds, win_pct, DASHBOARD_MAX_POINTS, *(view_range or (None, None)),
+                         method=DASHBOARD_DOWNSAMPLING)
+    win_pct_source.data = {"round": rounds[indices], "win_pct": win_pct[indices]}
+
+
+def load_game(game_id: int) -> None:
+    """Replaces the displayed data with a game's"""
+    global displayed_game_id, series, last_round, view_range
+    displayed_game_id = int(game_id)
+    series = get_series(db_client.engine, displayed_game_id)
+    last_round = series.update()
+    # The plot shows the cached series, so only the recent rounds are read for the other plots
+    _, outcome_data, choices_data = get_data(displayed_game_id, max(last_round - DASHBOARD_RECENT_ROUNDS, 0),
+                                             last_round)
+    # Copies, because streaming and patching modify the sources' columns in place
+    outcome_source.data = {name: values.copy() for name, values in outcome_data.items()}
+    choices_source.data = {name: values.copy() for name, values in choices_data.items()}
+    view_range = None
+    render_win_pct()
+
+
+load_game(most_recent_game.game_id)
 
 # ----------------------------
 # Set up Winning Fraction plot
@@ -206,14 +265,61 @@ def update_data_on_game_id_change(attrname, old, new) -> None:
     update_data()
 
 
-def update_data() -> None:
-    # Get the current Game ID values
-    win_pct_df, outcome_df, choices_df = get_data(game_id_input.value)
-    win_pct_source.data = win_pct_df
-    outcome_source.data = outcome_df
-    choices_source.data = choices_df
-    logger.debug("Updated data")
+def update_data(latest_round: Optional[int] = None) -> None:
+    """Streams the rounds played since the last update, up to `latest_round`, or loads a newly selected game"""
+    global last_round
+    # Keep showing the current game while the game ID input is cleared
+    if game_id_input.value is not None and int(game_id_input.value) != displayed_game_id:
+        load_game(game_id_input.value)
+        logger.debug("Loaded game")
+        return
+    if latest_round is not None and latest_round <= last_round:
+        return
+    latest_round = series.update()
+    if latest_round <= last_round:
+        return
+
+    win_pct_data, outcome_data, choices_data = get_data(displayed_game_id, last_round, latest_round)
+    if view_range is None and latest_round <= DASHBOARD_MAX_POINTS:
+        # Every round is shown, so only the new rounds are sent to the browser
+        win_pct_source.stream({name: win_pct_data[name] for name in ("round", "win_pct")})
+    else:
+        render_win_pct()  # Downsampled, so the new rounds can change which points are shown
+    outcome_source.patch({name: [(0, values.tolist()[0])] for name, values in outcome_data.items()})
+    choices_source.stream(choices_data, rollover=DASHBOARD_RECENT_ROUNDS)
+    logger.debug(f"Streamed {latest_round - last_round} new rounds")
+    last_round = latest_round
+
+
+def update_view_range(event: RangesUpdate) -> None:
+    """Downsamples the win percentage series again for the range of rounds panned or zoomed to"""
+    global view_range
+    rounds, _ = series.arrays()
+    if len(rounds) == 0 or (event.x0 <= rounds[0] and event.x1 >= rounds[-1]):
+        view_range = None
+    else:
+        view_range = (event.x0, event.x1)
+    render_win_pct()
+
+
+def reset_view_range(event: Reset) -> None:
+    """Shows the whole win percentage series again"""
+    global view_range
+    view_range = None
+    render_win_pct()
+
+
+def on_round_stored(game_id: int, round_number: int) -> None:
+    """Schedules an update when rounds of the displayed game are stored
+
+    Called on the round listener's thread, which all sessions of this server share.
+    """
+    if game_id == displayed_game_id and round_number > last_round:
+        document.add_next_tick_callback(partial(update_data, round_number))
+
 
+wp_plot.on_event(RangesUpdate, update_view_range)
+wp_plot.on_event(Reset, reset_view_range)
 
 # Set up widgets
 game_id_input = NumericInput(title="Game ID", value=most_recent_game.game_id)
@@ -226,6 +332,15 @@ outcome_row = row(games_plot, wins_plot, losses_plot, draws_plot)
 plot_col = column(outcome_row, c1, c2, win_pct_row)
 final_row = row(inputs_col, plot_col)
 
-curdoc().title = "Rock, Paper, Scissors!"
-curdoc().add_periodic_callback(update_data, 3000)
-curdoc().add_root(final_row)
+document = curdoc()
+document.title = "Rock, Paper, Scissors!"
+
+# Update as soon as rounds are stored if this server gets round notifications, and poll otherwise
+listener = None if ROUND_NOTIFY_ADDRESS is None else get_listener(ROUND_NOTIFY_ADDRESS)
+if listener is None:
+    document.add_periodic_callback(update_data, DASHBOARD_POLL_INTERVAL * 1000)
+else:
+    listener.subscribe(on_round_stored)
+    document.on_session_destroyed(lambda session_context: listener.unsubscribe(on_round_stored))
+    document.add_periodic_callback(update_data, DASHBOARD_FALLBACK_POLL_INTERVAL * 1000)
+document.add_root(final_row)
@@ -5,8 +5,11 @@ def play(player1: Player, player2: Player, game_id: int = None) -> None:
     game = RPSGame(player1, player2, game_id=game_id)
     play_another_round = True
 
-    while play_another_round:
-        play_another_round = game.play_round()
+    try:
+        while play_another_round:
+            play_another_round = game.play_round()
+    finally:
+        game.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from rps.codes import CHOICES_BY_CODE
+from rps.constants import PlayerChoice
+from rps.database.aggregates import backfill_aggregates
+from rps.database.client import DatabaseClient
+from rps.database.models import Game, Round
+from rps.gameplay.simulate import determine_round_outcomes, OUTCOMES_BY_VALUE
+
+
+def _add_random_game(client: DatabaseClient, n_rounds: int, batch_sizes: list, seed: int) -> tuple:
+    """Adds a game of random rounds in batches and returns its id and the players' choice codes"""
+    game = Game(player1_name="player1", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="player2", player2_type="MACHINE", player2_strategy="RANDOM")
+    client.insert_game(game)
+    choices = np.random.default_rng(seed).integers(0, len(PlayerChoice), size=(2, n_rounds))
+    outcomes = determine_round_outcomes(choices[0], choices[1])
+    rounds = [Round(timestamp=datetime(2024, 1, 1) + timedelta(seconds=i),
+                    player1_choice=CHOICES_BY_CODE[choices[0, i]].name,
+                    player2_choice=CHOICES_BY_CODE[choices[1, i]].name,
+                    outcome=OUTCOMES_BY_VALUE[outcomes[i]].name) for i in range(n_rounds)]
+    start = 0
+    for batch_size in batch_sizes:
+        if batch_size == 1:
+            client.add_round_by_game_id(rounds[start], game.game_id)
+        else:
+            client.add_rounds_by_game_id(rounds[start:start + batch_size], game.game_id)
+        start += batch_size
+    return game.game_id, choices, outcomes
+
+
+def _aggregates(client: DatabaseClient, game_id: int) -> tuple:
+    return (client.select_choice_counts(game_id), client.select_transition_counts(game_id),
+            client.select_round_stats(game_id))
+
+
+def test_incremental_aggregates_match_rounds(tmp_path):
+    client = DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=None)
+    game_id, choices, outcomes = _add_random_game(client, 50, [1, 1, 7, 20, 21], seed=0)
+    _add_random_game(client, 10, [10], seed=1)  # Another game, which must not leak in
+
+    choice_counts, transition_counts, round_stats = _aggregates(client, game_id)
+    for player in range(2):
+        assert choice_counts[player].tolist() == np.bincount(choices[player], minlength=3).tolist()
+        expected = np.zeros((3, 3), dtype=int)
+        np.add.at(expected, (choices[player, :-1], choices[player, 1:]), 1)
+        assert transition_counts[player].tolist() == expected.tolist()
+
+    wins = np.cumsum(outcomes == 1)
+    losses = np.cumsum(outcomes == -1)
+    assert round_stats["round_number"].tolist() == list(range(1, 51))
+    assert round_stats["win_count"].tolist() == wins.tolist()
+    assert round_stats["draw_count"].tolist() == np.cumsum(outcomes == 0).tolist()
+    assert np.allclose(round_stats["win_pct"],
+                       np.divide(wins, wins + losses, out=np.zeros(50), where=wins + losses > 0))
+    game_stats = client.select_game(game_id).game_stats
+    assert round_stats["win_pct"][-1] == game_stats.win_pct
+
+    delta = client.select_round_stats(game_id, after_round=45)
+    assert delta["round_number"].tolist() == [46, 47, 48, 49, 50]
+
+    # Rebuilding from the rounds gives the same aggregates
+    with client.engine.begin() as connection:
+        assert backfill_aggregates(connection, [game_id]) == 1
+    rebuilt = _aggregates(client, game_id)
+    assert np.array_equal(rebuilt[0], choice_counts)
+    assert np.array_equal(rebuilt[1], transition_counts)
+    for name, values in round_stats.items():
+        assert np.allclose(rebuilt[2][name], values)
+    client.close()
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from rps.database.analytics import choice_distribution, leaderboard, strategy_performance
+from rps.database.client import DatabaseClient
+from rps.database.models import Game, Round
+from rps.database.queries import SUMMARY_VERSION
+from rps.gameplay.simulate import CycleBot, RandomBot, save_results, simulate
+
+
+def _add_human_game(client: DatabaseClient, created_time: datetime, choices: list, outcomes: list) -> int:
+    game = Game(created_time=created_time, player1_name="Human", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="Computer", player2_type="MACHINE", player2_strategy="LEARN")
+    client.insert_game(game)
+    client.add_rounds_by_game_id([Round(timestamp=created_time, player1_choice=choice, player2_choice="ROCK",
+                                        outcome=outcome) for choice, outcome in zip(choices, outcomes)],
+                                 game.game_id)
+    return game.game_id
+
+
+def test_cross_game_summaries(tmp_path):
+    client = DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=None)
+    start = datetime(2024, 1, 1, 12)
+    good = _add_human_game(client, start, ["PAPER", "PAPER", "ROCK"], ["WIN", "WIN", "DRAW"])
+    bad = _add_human_game(client, start + timedelta(days=3), ["SCISSORS", "ROCK"], ["LOSS", "DRAW"])
+    save_results(simulate(RandomBot(), CycleBot(), n_games=3, n_rounds=50, seed=0, keep_rounds=True), client)
+
+    board = leaderboard(client.engine, n=10, min_rounds=2)
+    assert board["game_id"][0] == good and board["win_pct"][0] == 1.0
+    assert board["game_id"][-1] == bad
+    assert board["rank"].tolist() == list(range(1, 6))
+    assert len(leaderboard(client.engine, n=10, min_rounds=4)["game_id"]) == 3
+
+    performance = strategy_performance(client.engine)
+    assert performance["strategy"].tolist() == ["CYCLE", "LEARN"]
+    assert performance["games_count"].tolist() == [3, 2]
+    assert performance["rounds_count"].tolist() == [150, 5]
+    assert np.isclose(performance["win_pct"][1], 2 / 3)
+
+    # Only human players' choices, one daily bucket per game
+    distribution = choice_distribution(client.engine, max_buckets=10)
+    assert distribution["rounds_count"].tolist() == [3, 2]
+    assert distribution["PAPER"].tolist() == [2, 0]
+    assert distribution["SCISSORS_share"].tolist() == [0.0, 0.5]
+    assert (distribution["end"] - distribution["start"] == np.timedelta64(1, "D")).all()
+    assert len(choice_distribution(client.engine, max_buckets=1)["start"]) == 1
+
+    with client.engine.connect() as connection:
+        assert tuple(connection.execute(SUMMARY_VERSION).one()) == (5, 155)
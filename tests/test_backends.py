@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from rps.constants import PLAYER_CHOICES
+from rps.gameplay.backends import FramePreprocessor, OnnxBackend
+
+
+def test_frame_preprocessor_reuses_buffers():
+    preprocess = FramePreprocessor(size=32)
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    frame[:, :, 0] = 255  # Blue in BGR
+
+    model_input = preprocess(frame)
+    assert model_input.shape == (1, 3, 32, 32)
+    assert model_input.dtype == np.float32
+    assert np.all(model_input[0, 2] == 1.0) and np.all(model_input[0, :2] == 0.0)  # Blue in RGB
+    assert preprocess(frame) is model_input
+
+
+def _save_classifier(path: str, batch_dim=1) -> None:
+    """Saves a tiny ONNX classifier: softmax of the channel means, with classes in reverse choice order"""
+    import onnx
+    from onnx import TensorProto, helper
+
+    graph = helper.make_graph(
+        [helper.make_node("GlobalAveragePool", ["images"], ["pooled"]),
+         helper.make_node("Flatten", ["pooled"], ["flat"]),
+         helper.make_node("Softmax", ["flat"], ["output0"], axis=1)],
+        "classifier",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [batch_dim, 3, 32, 32])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, [batch_dim, 3])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    names = {i: c.name.lower() for i, c in enumerate(reversed(PLAYER_CHOICES))}
+    helper.set_model_props(model, {"names": str(names)})
+    onnx.save(model, path)
+
+
+def test_onnx_backend_class_order(tmp_path):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    onnx_path = str(tmp_path / "classifier.onnx")
+    _save_classifier(onnx_path)
+
+    backend = OnnxBackend(onnx_path, providers=["CPUExecutionProvider"])
+    frame = np.zeros((32, 32, 3), dtype=np.uint8)
+    frame[:, :, 2] = 255  # Red in BGR is the first model channel, i.e. the last choice
+    probs = backend.predict_probs(frame)
+    assert probs.shape == (len(PLAYER_CHOICES),)
+    assert np.argmax(probs) == len(PLAYER_CHOICES) - 1
+    assert probs.sum() == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("batch_dim", [1, "batch"])
+def test_onnx_backend_batch_matches_single_frames(tmp_path, batch_dim):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    onnx_path = str(tmp_path / "classifier.onnx")
+    _save_classifier(onnx_path, batch_dim)
+
+    backend = OnnxBackend(onnx_path, providers=["CPUExecutionProvider"])
+    assert backend.dynamic_batch == (batch_dim == "batch")
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, size=(48, 64, 3), dtype=np.uint8) for _ in range(5)]
+    batch_probs = backend.predict_probs_batch(frames)
+    assert batch_probs.shape == (5, len(PLAYER_CHOICES))
+    for frame, probs in zip(frames, batch_probs):
+        np.testing.assert_allclose(probs, backend.predict_probs(frame), rtol=1e-5)
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from rps.database import bulk
+from rps.database.client import DatabaseClient
+from rps.database.engine import create_engine
+from rps.database.models import Base, Game, Round
+
+
+def _fill_database(database_uri: str) -> None:
+    client = DatabaseClient(database_uri, notify_address=None)
+    start = datetime(2024, 1, 1)
+    for game_index in range(3):
+        game = Game(player1_name="Human", player1_type="HUMAN", player1_strategy="HUMAN",
+                    player2_name="Computer", player2_type="MACHINE", player2_strategy="LEARN")
+        client.insert_game(game)
+        rounds = [Round(timestamp=start + timedelta(seconds=i), player1_choice=choice,
+                        player2_choice="ROCK", outcome=outcome)
+                  for i, (choice, outcome) in enumerate([("PAPER", "WIN"), ("ROCK", "DRAW"),
+                                                         ("SCISSORS", "LOSS")] * (game_index + 1))]
+        client.add_rounds_by_game_id(rounds, game.game_id)
+    client.close()
+
+
+def _table_rows(engine) -> dict:
+    with engine.connect() as connection:
+        return {name: connection.execute(select(Base.metadata.tables[name])).all() for name in bulk.TABLES}
+
+
+@pytest.mark.parametrize("fmt", bulk.FORMATS)
+def test_export_import_round_trip(tmp_path, fmt):
+    if fmt != "npz":
+        pytest.importorskip("pyarrow")
+    source_uri = f"sqlite:///{tmp_path / 'source.db'}"
+    _fill_database(source_uri)
+    source = create_engine(source_uri)
+
+    export_dir = str(tmp_path / "export")
+    counts = bulk.export_database(source, export_dir, fmt, chunk_size=4)
+    assert counts == {"games": 3, "game_stats": 3, "rounds": 18}
+
+    target = create_engine(f"sqlite:///{tmp_path / 'target.db'}")
+    assert bulk.import_database(target, export_dir, chunk_size=4) == counts
+    assert _table_rows(target) == _table_rows(source)
+
+
+def test_choices_exported_as_codes(tmp_path):
+    database_uri = f"sqlite:///{tmp_path / 'rps.db'}"
+    _fill_database(database_uri)
+    chunks = list(bulk.iter_table_chunks(create_engine(database_uri), Base.metadata.tables["rounds"], 4))
+    assert [len(chunk["round_id"]) for chunk in chunks] == [4, 4, 4, 4, 2]
+    assert chunks[0]["player1_choice"].dtype == bulk.CODE_DTYPE
+    assert chunks[0]["player1_choice"][:3].tolist() == [0, 1, 2]  # PAPER, ROCK, SCISSORS
+    assert chunks[0]["outcome"][:3].tolist() == [1, 0, -1]  # WIN, DRAW, LOSS
@@ -0,0 +1,82 @@
+from datetime import datetime
+import threading
+import time
+
+import pytest
+
+from rps.database.cache import QueryCache, RoundSeries, get_series
+from rps.database.client import DatabaseClient
+from rps.database.models import Game, Round
+
+
+def test_concurrent_misses_share_one_load():
+    cache = QueryCache()
+    calls = []
+    started = threading.Event()
+
+    def load() -> list:
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return [1, 2, 3]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("key", load))) for _ in range(8)]
+    threads[0].start()
+    started.wait(timeout=5)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert (cache.misses, cache.hits) == (1, 7)
+
+
+def test_eviction_and_expiry():
+    cache = QueryCache(max_entries=2, ttl=60.0)
+    for key in "abc":
+        cache.get(key, lambda key=key: key.upper())
+    assert len(cache) == 2
+    assert cache.get("a", lambda: "reloaded") == "reloaded"  # Least recently used, so evicted
+
+    cache = QueryCache(ttl=0.0)
+    cache.get("a", lambda: 1)
+    assert cache.get("a", lambda: 2) == 2
+
+
+def test_failed_loads_are_not_cached():
+    cache = QueryCache()
+
+    def fail() -> None:
+        raise RuntimeError("database is down")
+
+    with pytest.raises(RuntimeError):
+        cache.get("key", fail)
+    assert cache.get("key", lambda: 1) == 1
+
+
+def test_round_series_reads_only_new_rounds(tmp_path):
+    client = DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=None)
+    game = Game(player1_name="player1", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="player2", player2_type="MACHINE", player2_strategy="RANDOM")
+    client.insert_game(game)
+    outcomes = ["WIN", "LOSS", "WIN", "DRAW", "WIN"] * 3
+    rounds = [Round(timestamp=datetime(2024, 1, 1), player1_choice="ROCK", player2_choice="PAPER", outcome=outcome)
+              for outcome in outcomes]
+
+    series = RoundSeries(client.engine, game.game_id, capacity=4)
+    assert series.update() == 0
+    client.add_rounds_by_game_id(rounds[:3], game.game_id)
+    assert series.update() == 3
+    client.add_rounds_by_game_id(rounds[3:], game.game_id)
+    assert series.update() == len(series) == 15  # Grown past the initial capacity
+
+    round_numbers, win_pct = series.arrays()
+    stats = client.select_round_stats(game.game_id)
+    assert round_numbers.tolist() == list(range(1, 16))
+    assert win_pct.tolist() == stats["win_pct"].tolist()
+    with pytest.raises(ValueError):
+        win_pct[0] = 0.0
+    assert get_series(client.engine, game.game_id) is get_series(client.engine, game.game_id)
@@ -0,0 +1,25 @@
+import cv2
+import numpy as np
+
+from rps.gameplay.capture import VideoStream
+
+
+def test_video_stream_reads_latest_frames(tmp_path):
+    video_path = str(tmp_path / "video.avi")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for i in range(20):
+        writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+    writer.release()
+
+    with VideoStream(video_path) as stream:
+        frame = stream.read()
+        assert frame.shape == (48, 64, 3)
+        # Frames are never returned twice; reads end once the source is exhausted
+        buffers = set()
+        while frame is not None:
+            buffers.add(id(frame))
+            frame = stream.read(timeout=5)
+        assert not stream.running
+        assert stream.frames_read == 20
+        assert len(buffers) <= 3  # Frames are read into reused buffers
+    assert stream.cap is None
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import numpy as np
+
+from rps.constants import QUIT, PlayerChoice
+from rps.gameplay import classify
+from rps.gameplay.classify import AsyncClassifier, PredictionSmoother
+
+
+def test_async_classifier_drops_frames_while_busy():
+    def slow_predict(frame: np.ndarray) -> np.ndarray:
+        time.sleep(0.05)
+        return np.array([frame[0, 0], 0.0, 0.0])
+
+    with AsyncClassifier(predict_fn=slow_predict, max_rate=None) as classifier:
+        frame = np.zeros((2, 2))
+        for i in range(10):
+            frame[:] = i  # Submitted frames are copied, so the caller may reuse its buffer
+            classifier.submit(frame)
+        deadline = time.time() + 5
+        while classifier.latest() is None and time.time() < deadline:
+            time.sleep(0.01)
+
+    assert classifier.latest()[0] in range(10)
+    metrics = classifier.metrics
+    assert metrics["frames_submitted"] == 10
+    assert metrics["frames_processed"] + metrics["frames_dropped"] == 10
+    assert metrics["frames_dropped"] > 0
+
+
+def test_async_classifier_discards_results_from_before_reset():
+    predicting = threading.Event()
+    release = threading.Event()
+
+    def blocking_predict(frame: np.ndarray) -> np.ndarray:
+        predicting.set()
+        release.wait(timeout=5)
+        return np.array([frame[0, 0], 0.0, 0.0])
+
+    with AsyncClassifier(predict_fn=blocking_predict, max_rate=None) as classifier:
+        classifier.submit(np.ones((2, 2)))
+        assert predicting.wait(timeout=5)
+        classifier.reset()  # A new round starts while the old frame is being classified
+        release.set()
+        deadline = time.time() + 5
+        while classifier.frames_processed == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        assert classifier.latest() is None
+
+        predicting.clear()
+        classifier.submit(np.full((2, 2), 2.0))
+        deadline = time.time() + 5
+        while classifier.latest() is None and time.time() < deadline:
+            time.sleep(0.01)
+        assert classifier.latest()[0] == 2.0
+
+
+def test_prediction_smoother():
+    smoother = PredictionSmoother(window=3, method="mean", min_confidence=0.6, stable_frames=2)
+    smoother.update(np.array([0.1, 0.8, 0.1]))
+    assert smoother.choice == PlayerChoice.ROCK
+    assert not smoother.is_stable
+
+    # A single blurred frame doesn't flip the smoothed choice
+    smoother.update(np.array([0.1, 0.4, 0.5]))
+    assert smoother.choice == PlayerChoice.ROCK
+    assert smoother.is_stable
+    assert abs(smoother.confidence - 0.6) < 1e-6
+
+    # Low-confidence frames gate the choice
+    smoother.update(np.array([0.4, 0.2, 0.4]))
+    smoother.update(np.array([0.4, 0.2, 0.4]))
+    assert smoother.choice is None
+    assert not smoother.is_stable
+
+
+class _FakeStream:
+    running = True
+
+    def read(self, timeout: float = None) -> np.ndarray:
+        return np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+class _RecordingRenderer:
+    """Records the text drawn on each frame shown"""
+
+    def __init__(self) -> None:
+        self.frames = [[]]
+
+    def text(self, img: np.ndarray, text: str, *args, **kwargs) -> None:
+        self.frames[-1].append(text)
+
+    def show(self, img: np.ndarray) -> None:
+        self.frames.append([])
+
+
+def test_low_confidence_selection_is_refused_with_a_message(monkeypatch):
+    monkeypatch.setattr(classify, "predict_probs", lambda frame: np.array([0.4, 0.3, 0.3]))
+    keys = iter([32, 255, ord("q")])  # SPACE, no key, then quit
+    monkeypatch.setattr(classify.cv2, "waitKey", lambda delay: next(keys))
+    renderer = _RecordingRenderer()
+
+    img, value = classify.get_choice_from_video(_FakeStream(), smoother=PredictionSmoother(min_confidence=0.6),
+                                                renderer=renderer)
+
+    assert (img, value) == (None, QUIT)
+    shown = [" ".join(texts) for texts in renderer.frames[:-1]]
+    assert len(shown) == 3
+    assert "Low confidence" not in shown[0]  # Drawn before SPACE was pressed
+    assert "Low confidence" in shown[1] and "Low confidence" in shown[2]
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+import threading
+
+from rps.database.client import DatabaseClient
+from rps.database.models import Game, Round
+
+
+def _new_game() -> Game:
+    return Game(player1_name="player1", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="player2", player2_type="MACHINE", player2_strategy="RANDOM")
+
+
+def test_iter_rounds_pages_through_all_rounds(tmp_path):
+    client = DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=None)
+    games = [_new_game(), _new_game()]
+    for game in games:
+        client.insert_game(game)
+    start = datetime(2024, 1, 1)
+    # Repeated timestamps, and round ids out of timestamp order
+    offsets = [5, 3, 3, 0, 3, 1, 4]
+    client.add_rounds_by_game_id([Round(timestamp=start + timedelta(seconds=offset), player1_choice="ROCK",
+                                        player2_choice="PAPER", outcome="LOSS") for offset in offsets],
+                                 games[0].game_id)
+    client.add_rounds_by_game_id([Round(timestamp=start, player1_choice="PAPER", player2_choice="PAPER",
+                                        outcome="DRAW")], games[1].game_id)
+    game_ids = [game.game_id for game in games]
+    game_id = game_ids[0]
+
+    expected = sorted(r.round_id for r in client.select_rounds_by_game_id(game_id))
+    for page_size in (1, 2, 3, 100):
+        rounds = list(client.iter_rounds(game_id, page_size=page_size))
+        assert [r.round_id for r in rounds] == expected
+
+        rows = list(client.iter_rounds(game_id, order_by="timestamp", page_size=page_size, as_tuples=True))
+        assert [(row.timestamp, row.round_id) for row in rows] == \
+            sorted((r.timestamp, r.round_id) for r in rounds)
+
+    assert len(list(client.iter_rounds(page_size=2))) == len(offsets) + 1
+    assert [g.game_id for g in client.iter_games(page_size=1)] == game_ids
+    client.close()
+
+
+def test_clients_share_engine(tmp_path):
+    database_uri = f"sqlite:///{tmp_path / 'rps.db'}"
+    client1 = DatabaseClient(database_uri, notify_address=None)
+    client2 = DatabaseClient(database_uri, notify_address=None)
+    assert client1.engine is client2.engine
+
+    game = _new_game()
+    client1.insert_game(game)
+    client2.add_round_to_game(game, Round(timestamp=datetime(2024, 1, 1), player1_choice="ROCK",
+                                          player2_choice="SCISSORS", outcome="WIN"))
+    # Objects stay readable after their session is closed
+    selected = client1.select_game(game.game_id)
+    assert (selected.game_stats.win_count, selected.game_stats.win_pct) == (1, 1.0)
+
+
+def test_in_memory_database_is_shared_between_threads():
+    client = DatabaseClient("sqlite:///:memory:", notify_address=None)
+    game = _new_game()
+    client.insert_game(game)
+
+    rounds = [Round(timestamp=datetime(2024, 1, 1), player1_choice="ROCK", player2_choice="PAPER", outcome="LOSS")]
+    writer = threading.Thread(target=client.add_rounds_by_game_id, args=(rounds, game.game_id))
+    writer.start()
+    writer.join(timeout=5)
+
+    assert [r.outcome for r in client.select_rounds_by_game_id(game.game_id)] == ["LOSS"]
+    assert client.select_game(game.game_id).game_stats.loss_count == 1
@@ -9,7 +9,7 @@ from rps.database.models import Game, Round
 logger = logging.getLogger(__name__)
 
 def test_database_client(db_path: str) -> None:
-    client = DatabaseClient(database_uri=db_path)
+    client = DatabaseClient(database_uri=db_path, notify_address=None)
     client.create_tables()
 
     rps_game = Game(
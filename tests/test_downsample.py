@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from rps.downsample import downsample, lttb, min_max
+
+
+def test_lttb_keeps_endpoints_and_shape():
+    x = np.arange(10_000)
+    y = np.sin(x / 500)
+    indices = lttb(x, y, 100)
+
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+    assert y[indices].max() > 0.99 and y[indices].min() < -0.99
+
+
+def test_min_max_keeps_spikes():
+    y = np.zeros(10_000)
+    y[1234] = 1.0
+    y[8765] = -1.0
+    indices = min_max(y, 50)
+
+    assert len(indices) <= 50
+    assert np.all(np.diff(indices) > 0)
+    assert 1234 in indices and 8765 in indices
+
+
+def test_short_series_are_not_downsampled():
+    x = np.arange(10)
+    assert downsample(x, x * 2.0, 100).tolist() == list(range(10))
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_visible_range(method):
+    x = np.arange(1, 100_001)
+    y = np.random.default_rng(0).random(len(x))
+    indices = downsample(x, y, 200, x_start=5000.5, x_end=5100.5, method=method)
+
+    # Few enough points in the range to keep them all, plus one outside each end
+    assert x[indices].tolist() == list(range(5000, 5102))
+    indices = downsample(x, y, 200, x_start=20_000, x_end=80_000, method=method)
+    assert len(indices) <= 202
+    assert x[indices[0]] == 19_999 and x[indices[-1]] == 80_001
+
+
+def test_unknown_method():
+    x = np.arange(10)
+    with pytest.raises(ValueError):
+        downsample(x, x, 5, method="median")
@@ -1,5 +1,68 @@
+import queue
+import subprocess
+import sys
+
+import numpy as np
+
+from rps import constants
+from rps.constants import PLAYER_CHOICES, Player, PlayerStrategy, PlayerType
+from rps.database.client import DatabaseClient
+from rps.database.notify import RoundListener
+from rps.database.storage import MemoryStorage
 from rps.gameplay import game
+from rps.gameplay.simulate import determine_round_outcomes
 
 
 def test_RPSGame():
-    pass
\ No newline at end of file
+    storage = MemoryStorage()
+    player1 = Player("Random", PlayerType.MACHINE, PlayerStrategy.RANDOM)
+    player2 = Player("Computer", PlayerType.MACHINE, PlayerStrategy.LEARN)
+    rps_game = game.RPSGame(player1, player2, storage=storage)
+    for _ in range(20):
+        assert rps_game.play_round()
+    rps_game.close()
+
+    game_id = rps_game.db_game.game_id
+    stats = storage.select_game(game_id).game_stats
+    assert (stats.win_count, stats.loss_count, stats.draw_count) == \
+        (rps_game.player1_wins, rps_game.player2_wins, rps_game.draws)
+    assert len(storage.select_choice_history(game_id, n=100)) == 20
+
+    # Resuming the game seeds the predictor from the stored rounds
+    resumed = game.RPSGame(player1, player2, game_id=game_id, storage=storage)
+    assert len(resumed.predictor.history) == min(20, 2 * resumed.predictor.n)
+    resumed.close()
+
+
+def test_determine_round_outcomes_matches_RPSRound():
+    for choice1 in PLAYER_CHOICES:
+        for choice2 in PLAYER_CHOICES:
+            expected = game.RPSRound.determine_round_outcome(choice1, choice2)
+            outcomes = determine_round_outcomes(np.array([choice1.value]), np.array([choice2.value]))
+            assert outcomes[0] == expected.value
+
+
+def test_import_does_not_load_torch():
+    code = ("import sys; import rps.gameplay.game; "
+            "print(any(m in sys.modules for m in ('torch', 'torchvision', 'ultralytics')))")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "False"
+
+
+def test_written_rounds_are_announced_without_waiting_for_a_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "WRITE_BEHIND", True)
+    address = str(tmp_path / "rounds.sock")
+    storage = DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=address)
+    player1 = Player("Random", PlayerType.MACHINE, PlayerStrategy.RANDOM)
+    player2 = Player("Computer", PlayerType.MACHINE, PlayerStrategy.LEARN)
+    rps_game = game.RPSGame(player1, player2, storage=storage)
+    # A writer waiting to fill batches would hold each round for a minute
+    rps_game.round_writer.flush_interval = 60
+
+    notifications = queue.Queue()
+    with RoundListener(address) as listener:
+        listener.subscribe(lambda game_id, round_number: notifications.put(round_number))
+        for round_number in range(1, 4):
+            assert rps_game.play_round()
+            assert notifications.get(timeout=10) == round_number
+        rps_game.close()
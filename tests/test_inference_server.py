@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+
+from rps.gameplay.backends import InferenceBackend, ServerBackend
+from rps.gameplay.inference_server import InferenceServer
+
+
+class MeanBackend(InferenceBackend):
+    """Returns the mean pixel value of each frame, and records batch sizes"""
+
+    def __init__(self) -> None:
+        self.batch_sizes = []
+
+    def predict_probs(self, frame: np.ndarray) -> np.ndarray:
+        return np.array([frame.mean(), 0.0, 0.0])
+
+    def predict_probs_batch(self, frames: list) -> np.ndarray:
+        self.batch_sizes.append(len(frames))
+        return super().predict_probs_batch(frames)
+
+
+def test_inference_server_batches_clients(tmp_path):
+    backend = MeanBackend()
+    address = str(tmp_path / "inference.sock")
+    n_clients, n_frames = 4, 20
+    results = {}
+
+    def run_client(client_id: int) -> None:
+        client = ServerBackend(address, size=8)
+        frame = np.full((16, 24, 3), client_id, dtype=np.uint8)
+        results[client_id] = [client.predict_probs(frame)[0] for _ in range(n_frames)]
+        client.close()
+
+    with InferenceServer(backend, address, max_batch_size=n_clients, max_wait=0.05) as server:
+        threads = [threading.Thread(target=run_client, args=(i,)) for i in range(n_clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+    # Each client gets the result for its own frames
+    assert results == {i: [float(i)] * n_frames for i in range(n_clients)}
+    assert server.metrics["frames_processed"] == n_clients * n_frames
+    assert max(backend.batch_sizes) <= n_clients
+    assert server.metrics["mean_batch_size"] > 1
+
+
+def test_stop_disconnects_idle_clients(tmp_path):
+    address = str(tmp_path / "inference.sock")
+    server = InferenceServer(MeanBackend(), address).start()
+    client = ServerBackend(address, size=8)
+    client.predict_probs(np.zeros((16, 24, 3), dtype=np.uint8))  # Connected, and its receive thread blocked
+
+    stopper = threading.Thread(target=server.stop)
+    stopper.start()
+    stopper.join(timeout=5)
+    assert not stopper.is_alive()
+    assert not any(thread.name == "InferenceServer-client" for thread in threading.enumerate())
+    client.close()
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import inspect, text
+
+from rps.database.client import DatabaseClient
+from rps.database.engine import create_engine
+from rps.database.migrate import AGGREGATE_TABLES, create_missing_indexes, migrate
+from rps.database.models import Game, Round
+
+
+def test_migration_adds_round_index(tmp_path):
+    database_uri = f"sqlite:///{tmp_path / 'rps.db'}"
+    engine = create_engine(database_uri, sqlite_pragmas=None)
+    with engine.begin() as connection:
+        # A rounds table created before the index was added to the model
+        connection.execute(text("CREATE TABLE games (game_id INTEGER PRIMARY KEY)"))
+        connection.execute(text("CREATE TABLE rounds (round_id INTEGER PRIMARY KEY, timestamp DATETIME, "
+                                "player1_choice VARCHAR, player2_choice VARCHAR, outcome VARCHAR, "
+                                "game_id INTEGER REFERENCES games (game_id))"))
+
+    assert create_missing_indexes(engine) == ["ix_rounds_game_id_timestamp"]
+    indexes = inspect(engine).get_indexes("rounds")
+    assert [(index["name"], index["column_names"]) for index in indexes] == \
+        [("ix_rounds_game_id_timestamp", ["game_id", "timestamp"])]
+    assert create_missing_indexes(engine) == []
+
+
+def test_sqlite_pragmas(tmp_path):
+    client = DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=None)
+    with client.engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    client.close()
+
+
+def test_migration_fills_aggregates(tmp_path):
+    database_uri = f"sqlite:///{tmp_path / 'rps.db'}"
+    client = DatabaseClient(database_uri, notify_address=None)
+    game = Game(player1_name="player1", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="player2", player2_type="MACHINE", player2_strategy="RANDOM")
+    client.insert_game(game)
+    client.add_rounds_by_game_id([Round(timestamp=datetime(2024, 1, 1, 0, 0, i), player1_choice=choice,
+                                        player2_choice="ROCK", outcome=outcome)
+                                  for i, (choice, outcome) in enumerate([("ROCK", "DRAW"), ("PAPER", "WIN"),
+                                                                         ("PAPER", "WIN")])],
+                                 game.game_id)
+    expected = client.select_round_stats(game.game_id)
+    # A database from before the aggregate tables existed
+    engine = create_engine(database_uri, sqlite_pragmas=None)
+    with engine.begin() as connection:
+        for table_name in AGGREGATE_TABLES:
+            connection.execute(text(f"DROP TABLE {table_name}"))
+
+    migrate(engine)
+    assert client.select_choice_counts(game.game_id)[0].tolist() == [2, 1, 0]
+    assert client.select_transition_counts(game.game_id)[0].tolist() == [[1, 0, 0], [1, 0, 0], [0, 0, 0]]
+    for name, values in client.select_round_stats(game.game_id).items():
+        assert np.allclose(values, expected[name])
+    engine.dispose()
+    client.close()
@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+
+from rps.codes import encode_choices
+from rps.constants import PLAYER_CHOICES
+from rps.gameplay.history import RoundHistory
+from rps.gameplay.models import EnsemblePredictor, RandomModel, RPSModel, default_models, predict_from_history
+
+
+def deterministic_models() -> list:
+    return [m for m in default_models() if not isinstance(m, RandomModel)]
+
+
+def test_ensemble_predictor_matches_get_prediction():
+    rng = random.Random(1234)
+    n = 12
+
+    for _ in range(5):
+        # Biased choices so that the frequency models get a chance to win
+        weights = [rng.random() for _ in PLAYER_CHOICES]
+        choices = rng.choices(PLAYER_CHOICES, weights=weights, k=60)
+
+        predictor = EnsemblePredictor(models=deterministic_models(), n=n)
+        for i, choice in enumerate(choices):
+            predictor.update(choice)
+
+            # get_round_history returns the most recent rounds first
+            history = encode_choices(choices[max(0, i + 1 - 2*n):i + 1][::-1])
+            models = deterministic_models()
+            expected = predict_from_history(history, models=models)
+
+            assert predictor.scores() == [m.score for m in models]
+            assert predictor.predict() == expected
+
+
+def test_round_history():
+    history = RoundHistory(capacity=4)
+    assert len(history.recent()) == 0
+
+    history.extend([0, 1, 2])
+    assert np.array_equal(history.recent(), [2, 1, 0])
+
+    history.extend([1, 1, 0])
+    assert len(history) == 4
+    assert np.array_equal(history.chronological(), [2, 1, 1, 0])
+    assert np.array_equal(history.recent(2), [0, 1])
+
+
+def test_vectorized_backtest_matches_predict():
+    rng = np.random.default_rng(42)
+    for model in deterministic_models():
+        for n in [1, 2, 5, 12, 40]:
+            history = rng.choice(3, size=2*n + 3, p=rng.dirichlet([1, 1, 1])).astype(np.int8)
+            expected = RPSModel._backtest(model, history, n)  # Per-window predict loop
+            assert np.array_equal(model.backtest(history, n), expected), (model.name, n)
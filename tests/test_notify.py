@@ -0,0 +1,41 @@
+from datetime import datetime
+import queue
+
+from rps import constants
+from rps.database.client import DatabaseClient
+from rps.database.models import Game, Round
+from rps.database.notify import RoundListener, RoundPublisher, notify_address_for
+
+
+def test_rounds_are_announced_to_subscribers(tmp_path):
+    address = str(tmp_path / "rounds.sock")
+    client = DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=address)
+    game = Game(player1_name="player1", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="player2", player2_type="MACHINE", player2_strategy="RANDOM")
+    client.insert_game(game)
+
+    received = [queue.Queue(), queue.Queue()]
+    with RoundListener(address) as listener:
+        for notifications in received:
+            listener.subscribe(lambda game_id, round_number, notifications=notifications:
+                               notifications.put((game_id, round_number)))
+        publisher = RoundPublisher(address)
+        assert publisher.publish(game.game_id, 0)
+        client.add_round_to_game(game, Round(timestamp=datetime(2024, 1, 1), player1_choice="ROCK",
+                                             player2_choice="PAPER", outcome="LOSS"))
+        client.add_rounds_by_game_id([Round(timestamp=datetime(2024, 1, 1), player1_choice="ROCK",
+                                            player2_choice="ROCK", outcome="DRAW") for _ in range(2)], game.game_id)
+        for notifications in received:
+            assert sorted(notifications.get(timeout=5) for _ in range(3)) == \
+                [(game.game_id, 0), (game.game_id, 1), (game.game_id, 3)]
+        publisher.close()
+
+    # Without a listener, nothing is announced and nothing fails
+    assert not publisher.publish(game.game_id, 4)
+    client.add_round_to_game(game, Round(timestamp=datetime(2024, 1, 1), player1_choice="ROCK",
+                                         player2_choice="PAPER", outcome="LOSS"))
+
+
+def test_only_the_dashboards_database_is_announced_by_default(tmp_path):
+    assert DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}").publisher is None
+    assert notify_address_for(constants.DATABASE_URI) == constants.ROUND_NOTIFY_ADDRESS
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+from rps.database.client import DatabaseClient
+from rps.database.models import Game, Round
+from rps.database.queries import GAME_OUTCOME_COUNTS, GAME_OUTCOMES, ROUND_HISTORY, ROUND_UPDATES, fetch_arrays
+
+
+def test_parameterized_queries(tmp_path):
+    client = DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=None)
+    game = Game(player1_name="Human", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="Computer", player2_type="MACHINE", player2_strategy="LEARN")
+    client.insert_game(game)
+    start = datetime(2024, 1, 1)
+    outcomes = ["WIN", "DRAW", "LOSS", "WIN"]
+    client.add_rounds_by_game_id([Round(timestamp=start + timedelta(seconds=i), player1_choice="ROCK",
+                                        player2_choice="PAPER", outcome=outcome)
+                                  for i, outcome in enumerate(outcomes)], game.game_id)
+
+    history = fetch_arrays(client.engine, ROUND_HISTORY, game_id=game.game_id, n=3)
+    assert history["outcome"].tolist() == ["WIN", "LOSS", "DRAW"]
+    assert fetch_arrays(client.engine, GAME_OUTCOMES, game_id=game.game_id)["outcome"].tolist() == outcomes
+    counts = fetch_arrays(client.engine, GAME_OUTCOME_COUNTS, game_id=game.game_id)
+    assert counts["games_count"].tolist() == [4]
+
+    # Only the rounds in the given range, with their cumulative stats
+    updates = fetch_arrays(client.engine, ROUND_UPDATES, game_id=game.game_id, after_round=2, until_round=4)
+    assert updates["round_number"].tolist() == [3, 4]
+    assert updates["outcome"].tolist() == ["LOSS", "WIN"]
+    assert updates["win_count"].tolist() == [1, 2]
+
+    # Values are bound, never formatted into the SQL
+    injected = fetch_arrays(client.engine, GAME_OUTCOMES, game_id=f"{game.game_id} OR 1=1")
+    assert len(injected["outcome"]) == 0
@@ -0,0 +1,19 @@
+import cv2
+import numpy as np
+
+from rps import constants
+from rps.gameplay.render import Renderer
+
+
+def test_cached_text_matches_putText():
+    frame = np.random.default_rng(0).integers(0, 256, size=(120, 320, 3), dtype=np.uint8)
+    expected = frame.copy()
+    cv2.putText(expected, "Press SPACE", (10, 100), constants.font, 1, (0, 255, 255), 2, constants.font_line_type)
+
+    renderer = Renderer()
+    for _ in range(2):  # The second draw uses the cached layer
+        img = frame.copy()
+        renderer.text(img, "Press SPACE", (10, 100), 1, (0, 255, 255), 2)
+        # Anti-aliased edges are blended slightly differently than putText
+        assert np.abs(img.astype(int) - expected).max() <= 2
+    assert len(renderer._layers) == 1
@@ -0,0 +1,32 @@
+from rps.database.client import DatabaseClient
+from rps.gameplay.simulate import CycleBot, LearnBot, RandomBot, play_game, save_results, simulate, summarize
+
+
+def test_play_game_counts():
+    result = play_game(RandomBot(), RandomBot(), n_rounds=1000, seed=0, keep_rounds=True)
+    assert result.rounds == 1000
+    assert len(result.outcomes) == 1000
+    assert result.win_count == (result.outcomes == 1).sum()
+
+
+def test_learn_beats_cycle():
+    results = simulate(CycleBot(), LearnBot(), n_games=2, n_rounds=200, seed=0)
+    summary = summarize(results)
+    assert summary["rounds"] == 400
+    assert summary["win_pct"] < 0.1
+
+
+def test_saved_rounds_are_in_timestamp_order(tmp_path):
+    client = DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=None)
+    save_results(simulate(RandomBot(), CycleBot(), n_games=2, n_rounds=20, seed=0, keep_rounds=True), client)
+
+    rounds = list(client.iter_rounds(order_by="timestamp", as_tuples=True))
+    assert [r.round_id for r in rounds] == sorted(r.round_id for r in rounds)
+    timestamps = [r.timestamp for r in rounds]
+    assert len(set(timestamps)) == len(timestamps) == 40
+
+
+def test_games_without_rounds_are_not_saved(tmp_path):
+    client = DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=None)
+    save_results(simulate(RandomBot(), CycleBot(), n_games=2, n_rounds=20, seed=0), client)
+    assert client.select_all_games() == []
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from rps.database.client import DatabaseClient
+from rps.database.models import Game, Round
+from rps.database.storage import MemoryStorage
+
+
+@pytest.fixture(params=["sql", "memory"])
+def storage(request, tmp_path):
+    if request.param == "sql":
+        return DatabaseClient(f"sqlite:///{tmp_path / 'rps.db'}", notify_address=None)
+    return MemoryStorage()
+
+
+def _new_game() -> Game:
+    return Game(player1_name="Human", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="Computer", player2_type="MACHINE", player2_strategy="LEARN")
+
+
+def test_storage_backends(storage):
+    games = [_new_game(), _new_game()]
+    for game in games:
+        storage.insert_game(game)
+    assert storage.select_most_recent_game().game_id == games[1].game_id
+
+    start = datetime(2024, 1, 1)
+    choices = ["ROCK", "PAPER", "SCISSORS", "ROCK"]
+    outcomes = ["WIN", "LOSS", "DRAW", "WIN"]
+    for i, (choice, outcome) in enumerate(zip(choices, outcomes)):
+        storage.add_round_to_game(games[0], Round(timestamp=start + timedelta(seconds=i), player1_choice=choice,
+                                                  player2_choice="ROCK", outcome=outcome))
+
+    assert storage.select_choice_history(games[0].game_id, n=3).tolist() == [1, 2, 0]  # ROCK, SCISSORS, PAPER
+    assert storage.select_choice_history(games[0].game_id, n=10).tolist() == [1, 2, 0, 1]
+    assert len(storage.select_choice_history(games[1].game_id, n=10)) == 0
+
+    stats = storage.select_game(games[0].game_id).game_stats
+    assert (stats.win_count, stats.loss_count, stats.draw_count) == (2, 1, 1)
+    assert stats.win_pct == pytest.approx(2 / 3)
+    storage.close()
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+import time
+
+from rps.database.client import DatabaseClient
+from rps.database.models import Game, Round
+from rps.database.writer import RoundWriter
+
+
+def test_round_writer_batches_rounds(tmp_path):
+    database_uri = f"sqlite:///{tmp_path / 'rps.db'}"
+    client = DatabaseClient(database_uri, notify_address=None)
+    game = Game(player1_name="player1", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="player2", player2_type="MACHINE", player2_strategy="RANDOM")
+    client.insert_game(game)
+    game_id = game.game_id
+    client.close()
+
+    start = datetime.now()
+    outcomes = ["WIN", "WIN", "LOSS", "DRAW", "WIN"]
+    writer = RoundWriter(game_id, database_uri, batch_size=2, flush_interval=60, notify_address=None)
+    for i, outcome in enumerate(outcomes):
+        # Queued before the writer starts, as a backlog
+        writer.add(Round(timestamp=start + timedelta(seconds=i), player1_choice="ROCK",
+                         player2_choice="PAPER", outcome=outcome))
+    with writer:
+        writer.flush()
+        assert writer.rounds_written == len(outcomes)
+        assert writer.batches_written == 3  # Two full batches, and the remainder
+
+    client = DatabaseClient(database_uri, notify_address=None)
+    rounds = client.select_rounds_by_game_id(game_id)
+    assert [r.outcome for r in rounds] == outcomes
+    stats = client.select_game(game_id).game_stats
+    assert (stats.win_count, stats.loss_count, stats.draw_count) == (3, 1, 1)
+    assert stats.win_pct == 0.75
+    client.close()
+
+
+def _failing_writes(monkeypatch, n_failures: int) -> None:
+    """Makes the next `n_failures` writes of any client fail"""
+    add_rounds = DatabaseClient.add_rounds_by_game_id
+    failures = iter(range(n_failures))
+
+    def add_rounds_or_fail(self, rounds: list, game_id: int) -> None:
+        if next(failures, None) is not None:
+            raise OSError("Database unavailable")
+        add_rounds(self, rounds, game_id)
+
+    monkeypatch.setattr(DatabaseClient, "add_rounds_by_game_id", add_rounds_or_fail)
+
+
+def _round(outcome: str) -> Round:
+    return Round(timestamp=datetime.now(), player1_choice="ROCK", player2_choice="PAPER", outcome=outcome)
+
+
+def test_round_writer_retries_failed_writes(tmp_path, monkeypatch):
+    database_uri = f"sqlite:///{tmp_path / 'rps.db'}"
+    client = DatabaseClient(database_uri, notify_address=None)
+    game = Game(player1_name="player1", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="player2", player2_type="MACHINE", player2_strategy="RANDOM")
+    client.insert_game(game)
+    _failing_writes(monkeypatch, 2)
+
+    with RoundWriter(game.game_id, database_uri, retry_interval=0.01, notify_address=None) as writer:
+        writer.add(_round("WIN"))
+        # No more rounds are played, so only the retry timer can write the round
+        deadline = time.monotonic() + 10
+        while writer.rounds_written == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.rounds_written == 1
+    assert [r.outcome for r in client.select_rounds_by_game_id(game.game_id)] == ["WIN"]
+
+
+def test_round_writer_drops_the_oldest_rounds_beyond_max_pending(tmp_path, monkeypatch):
+    database_uri = f"sqlite:///{tmp_path / 'rps.db'}"
+    client = DatabaseClient(database_uri, notify_address=None)
+    game = Game(player1_name="player1", player1_type="HUMAN", player1_strategy="HUMAN",
+                player2_name="player2", player2_type="MACHINE", player2_strategy="RANDOM")
+    client.insert_game(game)
+    _failing_writes(monkeypatch, 1)
+
+    writer = RoundWriter(game.game_id, database_uri, retry_interval=60, max_pending=2, notify_address=None)
+    for outcome in ["WIN", "LOSS", "DRAW", "WIN"]:
+        writer.add(_round(outcome))
+    with writer:
+        writer.flush()  # Fails, keeping the newest two rounds
+        assert writer.rounds_dropped == 2
+        writer.add(_round("LOSS"))
+        writer.flush()
+    assert writer.rounds_written == 3
+    assert [r.outcome for r in client.select_rounds_by_game_id(game.game_id)] == ["DRAW", "WIN", "LOSS"]